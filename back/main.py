@@ -1,7 +1,7 @@
 
 from flask import Flask, request, jsonify, session, send_from_directory
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 import certifi
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
@@ -22,6 +22,29 @@ load_dotenv()
 from flask_socketio import SocketIO, join_room, leave_room, emit
 # --- Additional imports for WhatsApp agent ---
 import urllib.parse
+from farming_response_router import farming_router
+# Metrics implementation shared with the AI backend (appended: this directory's modules take precedence)
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from metrics import REGISTRY, instrument_app
+
+whatsapp_send_seconds = REGISTRY.histogram(
+    'whatsapp_send_duration_seconds', 'Twilio WhatsApp send latency by outcome', ('status',))
+mongo_command_seconds = REGISTRY.histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command latency by command and outcome', ('command', 'status'))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command the driver runs"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name, status='ok')
+
+    def failed(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name, status='error')
 
 # --- Simple WhatsApp function for JotForm integration ---
 def send_whatsapp_alert(phone_number, message):
@@ -48,11 +71,13 @@ def send_whatsapp_alert(phone_number, message):
         # Add AgriGuru branding
         branded_message = f"🌾 *AgriGuru Farming Assistant* 🌾\n\n{message}"
         
-        twilio_message = client.messages.create(
-            body=branded_message,
-            from_=f"whatsapp:{twilio_number}",
-            to=f"whatsapp:{phone_number}"
-        )
+        with whatsapp_send_seconds.time(status='error') as labels:
+            twilio_message = client.messages.create(
+                body=branded_message,
+                from_=f"whatsapp:{twilio_number}",
+                to=f"whatsapp:{phone_number}"
+            )
+            labels['status'] = 'sent'
         
         return {
             "success": True,
@@ -112,6 +137,9 @@ CORS(app, origins=allowed_origins,
      allow_headers=["Content-Type", "Authorization"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
+# Prometheus metrics: per-route latency histograms, in-flight gauge and /metrics
+instrument_app(app)
+
 # --- Initialize SocketIO ---
 socketio = SocketIO(
     app,
@@ -132,7 +160,8 @@ try:
     
     client = MongoClient(
         mongo_uri,
-        serverSelectionTimeoutMS=5000
+        serverSelectionTimeoutMS=5000,
+        event_listeners=[MongoCommandMetrics()]
     )
     
     # Test the connection
@@ -2059,454 +2088,9 @@ def generate_farming_response(user_message, user_name="Farmer"):
     """
     Intelligent farming assistant response generator
     Handles agricultural queries with comprehensive advice
+    (keyword routing and reply templates live in farming_response_router.py)
     """
-    message = user_message.lower()
-    
-    # Weather and climate queries
-    if any(word in message for word in ['weather', 'rain', 'temperature', 'humidity', 'climate', 'forecast', 'मौसम', 'बारिश']):
-        return f"""🌤️ **Weather Advisory for {user_name}**
-
-**Current Farming Weather Guide:**
-• **Today's Conditions**: Check local temperature & humidity
-• **7-Day Forecast**: Plan sowing/harvesting activities  
-• **Rainfall Predictions**: Adjust irrigation schedules
-• **Wind Speed**: Important for spraying operations
-
-**Weather-Based Farming Tips:**
-✅ **Sunny Days**: Ideal for harvesting, land preparation
-✅ **Rainy Season**: Focus on drainage, disease prevention
-✅ **High Humidity**: Avoid fungicide application
-✅ **Windy Conditions**: Postpone spraying activities
-
-**Seasonal Advisory:**
-- **Kharif Season**: Monitor monsoon patterns
-- **Rabi Season**: Watch for frost warnings
-- **Summer**: Implement water conservation
-
-📱 **Next Steps**: Share your location for specific weather updates"""
-
-    # Disease and pest management
-    elif any(word in message for word in ['disease', 'pest', 'fungus', 'bacteria', 'virus', 'spots', 'wilting', 'yellowing', 'insects', 'बीमारी', 'कीट']):
-        return f"""🦠 **Crop Disease & Pest Management for {user_name}**
-
-**Common Crop Problems:**
-
-**🍃 Leaf Issues:**
-• Yellow spots → Bacterial blight (use copper fungicide)
-• Brown patches → Fungal infection (improve air circulation)  
-• Wilting → Root rot or water stress
-
-**🐛 Pest Control:**
-• White flies → Yellow sticky traps + neem oil
-• Aphids → Ladybird beetles (biological control)
-• Caterpillars → Bt spray (organic solution)
-
-**🏥 Emergency Treatment:**
-1. **Immediate**: Remove affected plant parts
-2. **Spray**: Organic neem oil solution
-3. **Improve**: Drainage and plant spacing
-4. **Monitor**: Daily inspection for 1 week
-
-**🛡️ Prevention Strategy:**
-- Crop rotation every season
-- Disease-resistant varieties
-- Proper plant nutrition
-- Regular field monitoring
-
-📸 **Pro Tip**: Take photos and send for specific diagnosis"""
-
-    # Market prices and selling strategies
-    elif any(word in message for word in ['price', 'market', 'sell', 'selling', 'mandi', 'rate', 'cost', 'profit', 'income', 'कीमत', 'बाजार', 'भाव']):
-        return f"""💰 **Market Intelligence for {user_name}**
-
-**Today's Approximate Rates** (₹/Quintal):
-
-**🌾 Cereals:**
-• Rice (Common): ₹2,000-2,500
-• Rice (Basmati): ₹3,500-4,200  
-• Wheat: ₹2,100-2,400
-
-**🥬 Vegetables:**
-• Onion: ₹800-1,500
-• Potato: ₹1,000-1,200
-• Tomato: ₹1,500-2,500
-
-**🌱 Cash Crops:**
-• Cotton: ₹5,800-6,500
-• Sugarcane: ₹280-320/quintal
-
-**📈 Smart Selling Strategy:**
-1. **Compare**: Check 3-4 nearby mandis
-2. **Timing**: Avoid peak harvest rush
-3. **Quality**: Grade your produce properly
-4. **Transport**: Calculate logistics cost
-5. **Storage**: Consider short-term storage for better prices
-
-**💡 Pro Tips:**
-- Join Farmer Producer Organizations (FPOs)
-- Use eNAM portal for transparent pricing
-- Negotiate collectively with other farmers
-
-📊 **Want current rates?** Share your crop + location"""
-
-    # Fertilizer and nutrition management
-    elif any(word in message for word in ['fertilizer', 'fertiliser', 'nutrition', 'NPK', 'urea', 'nutrients', 'organic', 'compost', 'manure', 'खाद', 'उर्वरक']):
-        return f"""🌱 **Fertilizer & Nutrition Guide for {user_name}**
-
-**Essential Plant Nutrients:**
-
-**🟢 Primary Nutrients:**
-• **Nitrogen (N)**: Leaf growth, green color (use urea/CAN)
-• **Phosphorus (P)**: Root development, flowering (DAP/SSP)
-• **Potassium (K)**: Disease resistance, fruit quality (MOP)
-
-**🟡 Secondary Nutrients:**
-• Calcium, Magnesium, Sulfur (Gypsum, Dolomite)
-
-**🔵 Micronutrients:**
-• Zinc, Iron, Boron, Manganese (Foliar spray)
-
-**📅 Application Schedule:**
-
-**Stage 1 - Pre-Sowing:**
-- Apply 25% nitrogen + full phosphorus + full potassium
-- Add 5-10 tonnes FYM/compost per hectare
-
-**Stage 2 - Vegetative Growth:**
-- Apply 50% remaining nitrogen
-- Foliar spray of micronutrients
-
-**Stage 3 - Flowering/Fruiting:**
-- Apply remaining 25% nitrogen
-- Potassium boost for fruit development
-
-**🌿 Organic Options:**
-• Vermicompost: 3-5 tonnes/hectare
-• Neem cake: Dual benefit (nutrition + pest control)
-• Green manuring: Dhaincha, Sunhemp
-
-**⚠️ Important**: Always do soil testing before fertilizer application"""
-
-    # Irrigation and water management
-    elif any(word in message for word in ['irrigation', 'water', 'watering', 'drip', 'sprinkler', 'drought', 'pump', 'well', 'सिंचाई', 'पानी']):
-        return f"""💧 **Water Management for {user_name}**
-
-**🚿 Efficient Irrigation Methods:**
-
-**💎 Drip Irrigation** (Best for water saving):
-• 40-60% water savings
-• Suitable for: Fruits, vegetables, cotton
-• Investment: ₹40,000-60,000/hectare
-• Government subsidy: 55% for small farmers
-
-**🌧️ Sprinkler Irrigation**:
-• 30-40% water savings  
-• Good for: Cereals, pulses, fodder crops
-• Even water distribution
-
-**🌊 Traditional Methods**:
-• Furrow irrigation: Row crops like sugarcane
-• Basin irrigation: Fruit trees
-• Border irrigation: Wheat, rice
-
-**⏰ Irrigation Scheduling:**
-
-**🌅 Best Time**: Early morning (5-8 AM)
-**🌅 Alternative**: Late evening (6-8 PM)
-**❌ Avoid**: Midday irrigation (water loss)
-
-**💡 Water Conservation Tips:**
-1. **Mulching**: Reduce evaporation by 50%
-2. **Rainwater Harvesting**: Store monsoon water
-3. **Drip + Mulch**: Maximum water efficiency
-4. **Soil moisture meters**: Precision irrigation
-
-**🚨 Water Stress Signs:**
-- Leaf curling during day
-- Reduced growth rate
-- Early flowering
-- Wilting in morning
-
-**💰 Cost-Effective**: Start with mulching + improved furrow method"""
-
-    # Seeds and variety selection
-    elif any(word in message for word in ['seed', 'seeds', 'variety', 'varieties', 'hybrid', 'planting', 'sowing', 'germination', 'बीज', 'किस्म']):
-        return f"""🌾 **Seeds & Varieties Guide for {user_name}**
-
-**🎯 Seed Selection Criteria:**
-
-**✅ Quality Checklist:**
-• Certified seed label (ISI mark)
-• 85%+ germination rate
-• Disease-free varieties
-• Adapted to local climate
-
-**🏆 Recommended High-Yield Varieties:**
-
-**🌾 Rice:**
-• **Basmati**: Pusa Basmati 1509, 1121
-• **Non-Basmati**: Swarna, IR-64, Samba Mahsuri
-
-**🌾 Wheat:**
-• **Irrigated**: HD-2967, PBW-343, WH-147
-• **Rain-fed**: Lok-1, Sujata
-
-**🌽 Maize:**
-• **Hybrid**: Pioneer, Dekalb varieties
-• **Composite**: Suwan, Kisan
-
-**🥬 Vegetables:**
-• **Tomato**: Arka Rakshak, Pusa Ruby
-• **Onion**: Agrifound varieties
-• **Cabbage**: Golden Acre, Pride of India
-
-**📋 Seed Treatment (Essential):**
-
-**Before Sowing:**
-1. **Germination Test**: 100 seeds in wet cloth
-2. **Fungicide Treatment**: Thiram/Captan
-3. **Bio-fertilizer**: Rhizobium for legumes
-
-**🌱 Sowing Guidelines:**
-• **Depth**: 2-3 times seed diameter
-• **Spacing**: Follow variety recommendations  
-• **Time**: Early morning for better emergence
-• **Soil**: Well-prepared, moisture adequate
-
-**💾 Storage Tips:**
-- Cool, dry place (moisture <12%)
-- Use cloth/gunny bags
-- Add neem leaves for pest control
-
-🔬 **Want variety recommendations?** Share your crop + region"""
-
-    # Government schemes and subsidies
-    elif any(word in message for word in ['subsidy', 'scheme', 'schemes', 'government', 'govt', 'loan', 'insurance', 'MSP', 'योजना', 'सब्सिडी', 'सरकार']):
-        return f"""🏛️ **Government Support for {user_name}**
-
-**💰 Major Central Schemes:**
-
-**🎯 PM-KISAN Samman Nidhi:**
-• ₹6,000/year direct benefit transfer
-• All landholding farmers eligible
-• Apply: pmkisan.gov.in
-
-**🛡️ Pradhan Mantri Fasal Bima Yojana:**
-• Comprehensive crop insurance
-• Premium: 2% for Kharif, 1.5% for Rabi
-• Coverage: Natural calamities, pest attacks
-
-**💳 Kisan Credit Card (KCC):**
-• Easy agricultural loans
-• Low interest rates (7% for timely repayment)
-• Flexible repayment options
-
-**🌱 Equipment Subsidies:**
-• **Tractors**: 25-50% subsidy
-• **Drip Irrigation**: 55% for small farmers
-• **Solar Pumps**: 60% central subsidy
-• **Farm Machinery**: 40-50% under various schemes
-
-**📱 Digital Initiatives:**
-• **eNAM**: National Agriculture Market
-• **Kisan Suvidha**: Weather, prices, dealers info
-• **Crop Insurance App**: Claim settlements
-
-**📋 Application Process:**
-1. **Visit**: Nearest Agriculture Office/KVK
-2. **Documents**: Aadhaar, Land records, Bank details
-3. **Online**: Most schemes have online portals
-4. **CSC Centers**: Common Service Centers
-
-**🆘 Helplines:**
-• Kisan Call Center: **1800-180-1551**
-• PM-KISAN Helpline: **155261**
-
-**💡 Pro Tip**: Contact your local Agricultural Extension Officer (AEO) for personalized guidance
-
-📄 **Need specific scheme info?** Share your state + requirement"""
-
-    # Soil testing and health management
-    elif any(word in message for word in ['soil', 'testing', 'pH', 'health', 'nutrients', 'organic matter', 'erosion', 'मिट्टी', 'भूमि']):
-        return f"""🌍 **Soil Health Management for {user_name}**
-
-**🔬 Why Soil Testing is Crucial:**
-• Know exact nutrient status
-• Avoid fertilizer wastage
-• Improve crop yield by 15-20%
-• Prevent soil degradation
-
-**📊 Key Testing Parameters:**
-
-**🎯 Basic Tests:**
-• **pH Level**: 6.0-7.5 (ideal for most crops)
-• **Electrical Conductivity**: Salinity check
-• **Organic Carbon**: Should be >0.5%
-
-**🧪 Nutrient Analysis:**
-• **NPK**: Primary nutrients
-• **Secondary**: Ca, Mg, S
-• **Micronutrients**: Zn, Fe, Mn, Cu, B
-
-**🆓 Free Testing Options:**
-• **Soil Health Cards**: Government provides free
-• **KVK Labs**: Krishi Vigyan Kendras
-• **Agricultural Universities**: Subsidized rates
-
-**💚 Soil Health Improvement:**
-
-**📈 Increase Organic Matter:**
-1. **Farmyard Manure**: 10-15 tonnes/hectare
-2. **Compost**: Well-decomposed organic matter
-3. **Green Manuring**: Dhaincha, Sunhemp, Cluster bean
-4. **Crop Residue**: Incorporate after harvest
-
-**⚖️ pH Correction:**
-• **Acidic Soil** (pH <6): Add lime/dolomite
-• **Alkaline Soil** (pH >8): Add gypsum/sulfur
-
-**🛡️ Prevent Soil Erosion:**
-• Contour farming on slopes
-• Cover crops during off-season
-• Windbreaks/shelter belts
-• Avoid excessive tillage
-
-**🌱 Soil Health Indicators:**
-✅ **Good Soil**: Dark color, earthworms present, good water infiltration
-❌ **Poor Soil**: Light color, compacted, poor drainage
-
-**📞 Contact for Testing:**
-- District Collector Office
-- Nearest KVK: kvk.icar.gov.in
-- Agricultural University labs
-
-🔍 **Quick Test**: Jar test for soil texture at home"""
-
-    # Organic farming and sustainable practices
-    elif any(word in message for word in ['organic', 'natural', 'sustainable', 'chemical free', 'bio', 'environment', 'जैविक', 'प्राकृतिक']):
-        return f"""🌿 **Organic Farming Guide for {user_name}**
-
-**🎯 Organic Farming Benefits:**
-• Premium prices (20-30% higher)
-• Reduced input costs
-• Better soil health
-• Safe food production
-• Environmental conservation
-
-**📜 Certification Process:**
-• **Duration**: 3-year conversion period
-• **Agencies**: NPOP certified bodies
-• **Cost**: ₹15,000-25,000 for group certification
-• **Inspection**: Annual third-party audit
-
-**🌱 Organic Inputs:**
-
-**🍃 Organic Fertilizers:**
-• **Vermicompost**: 3-5 tonnes/hectare
-• **FYM**: 10-15 tonnes/hectare  
-• **Compost**: 5-8 tonnes/hectare
-• **Green Manure**: Leguminous crops
-
-**🦠 Organic Pest Control:**
-• **Neem Oil**: Broad spectrum bio-pesticide
-• **Trichoderma**: Fungal disease control
-• **NPV**: Caterpillar control (biological)
-• **Pheromone Traps**: Pest monitoring
-
-**🐛 Beneficial Insects:**
-• **Ladybird Beetle**: Aphid control
-• **Parasitic Wasps**: Natural pest control
-• **Spiders**: General predators
-
-**📈 Soil Building (3-Year Plan):**
-
-**Year 1**: Heavy organic matter addition
-**Year 2**: Crop rotation with legumes  
-**Year 3**: Balanced organic system
-
-**💰 Economics:**
-• **Initial Investment**: Higher (30-40%)
-• **Break-even**: Year 2-3
-• **Long-term**: 25-30% higher profits
-
-**🛒 Market Linkages:**
-• Organic stores and supermarkets
-• Direct to consumer sales
-• Export opportunities (higher prices)
-• Online platforms
-
-**🎓 Training Available:**
-• KVK programs
-• NABARD schemes
-• NGO training centers
-
-**📋 Record Keeping** (Essential):
-- Input usage log
-- Pest/disease management
-- Harvest records
-- Sales documentation
-
-🌱 **Ready to Start?** Begin with small area (1-2 acres)"""
-
-    # General farming and crop management
-    else:
-        return f"""🌾 **AgriGuru - Your Personal Farming Assistant**
-
-**Hello {user_name}! 👋**
-
-I'm here to help you with all your farming needs. Ask me about:
-
-**🌤️ Weather & Climate Planning**
-📞 *"What's the weather forecast for next week?"*
-
-**🦠 Disease & Pest Solutions**
-📞 *"My tomato plants have yellow spots"*
-
-**💰 Market Intelligence**
-📞 *"Current wheat prices in my area"*
-
-**🌱 Fertilizer & Nutrition**
-📞 *"Best fertilizer for cotton flowering stage"*
-
-**💧 Irrigation & Water Management**
-📞 *"How to save water with drip irrigation?"*
-
-**🌾 Seeds & Varieties**
-📞 *"Which rice variety for my region?"*
-
-**🏛️ Government Schemes**
-📞 *"Subsidies available for farm equipment"*
-
-**🌍 Soil Testing & Health**
-📞 *"How to improve soil fertility naturally?"*
-
-**🌿 Organic Farming**
-📞 *"Steps to start organic farming"*
-
-**🚨 Quick Emergency Help:**
-
-**📱 Immediate Support:**
-• Kisan Call Center: **1800-180-1551**
-• Kisan Suvidha App: Weather + Market
-• eNAM Portal: Transparent pricing
-
-**🏥 Expert Consultation:**
-• Local KVK: Krishi Vigyan Kendra
-• Agricultural University
-• Progressive farmers in your area
-
-**💡 Today's Farming Tip:**
-Monitor your crops daily - early detection prevents major losses!
-
-**🎯 Popular Queries:**
-• "Organic pest control for vegetables"
-• "Government subsidy for solar pump"  
-• "Best time to apply fertilizer"
-• "How to increase crop yield naturally"
-
-💬 **Ask me anything!** I'm here 24/7 to help improve your farming success.
-
-🌟 **Remember**: Good farming = Timely action + Right knowledge"""
+    return farming_router.respond(user_message, user_name)
 
 @app.route('/api/jotform/webhook', methods=['POST'])
 def jotform_webhook():
@@ -0,0 +1,494 @@
+"""
+Pre-rendered Knowledge-Base Answers
+===================================
+
+Every answer AgriBotAI can give from the knowledge base: crop guides,
+seasonal planning, fertilizer, pest management and the general welcome.
+Answers are keyed by ``(topic, crop, language)``. A crop guide is rendered
+the first time it is asked for and then kept. Startup therefore does not
+load every crop from the knowledge store, and each later answer is one
+dictionary lookup with no LLM call.
+
+Templates exist for English and Hindi only. Marathi (also Devanagari)
+gets the Hindi answer. Every other language gets the English answer.
+This is not silent: the first fallback for each language is logged,
+``get_stats`` counts the answers served per fallback (shown in
+``/api/model-info``), and each response's analysis carries both the
+detected ``language`` and the ``answer_language`` actually used.
+Crop guides take localized names, figures and tips from the ``localized``
+block of each crop in the knowledge store. Fields without a translation
+fall back to English.
+"""
+
+import logging
+import re
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = 'english'
+# Languages without templates, answered in a templated language written in the same script
+FALLBACK_LANGUAGES = {'marathi': 'hindi'}
+
+# Headings used by the crop guide, per language
+CROP_GUIDE_LABELS = {
+    'english': {
+        'title': "🌾 **{name} Cultivation Guide by Annapurna**",
+        'varieties': "**🌱 Recommended Varieties:**",
+        'seasons': "**📅 Sowing & Harvest Seasons:**",
+        'season_line': "\n• **{season}:** Sow in {sowing}, harvest in {harvest}",
+        'fertilizer': "**🧪 Fertilizer Recommendation:**",
+        'npk': "• NPK: {N}:{P}:{K} {unit}",
+        'water': "**💧 Water Requirement:**",
+        'water_line': "• Total: {water}",
+        'economics': "**💰 Economics:**",
+        'cost_line': "• Investment: {cost}",
+        'yield_line': "• Expected yield: {yield}",
+        'profit_line': "• Potential profit: {profit}",
+        'tips': "**💡 Annapurna Pro Tips:**",
+        'footer': "📱 Need more specific help? Ask Annapurna about pest control, soil preparation, or market prices!"
+    },
+    'hindi': {
+        'title': "🌾 **अन्नपूर्णा द्वारा {name} की खेती गाइड**",
+        'varieties': "**🌱 अनुशंसित किस्में:**",
+        'seasons': "**📅 बुवाई और कटाई का समय:**",
+        'season_line': "\n• **{season}:** बुवाई {sowing}, कटाई {harvest}",
+        'fertilizer': "**🧪 खाद की सिफारिश:**",
+        'npk': "• NPK: {N}:{P}:{K} {unit}",
+        'water': "**💧 पानी की आवश्यकता:**",
+        'water_line': "• कुल: {water}",
+        'economics': "**💰 लागत और मुनाफा:**",
+        'cost_line': "• लागत: {cost}",
+        'yield_line': "• अपेक्षित उपज: {yield}",
+        'profit_line': "• संभावित मुनाफा: {profit}",
+        'tips': "**💡 अन्नपूर्णा की खास सलाह:**",
+        'footer': "📱 और जानकारी चाहिए? अन्नपूर्णा से कीट नियंत्रण, मिट्टी की तैयारी या मंडी भाव के बारे में पूछें!"
+    }
+}
+
+SEASON_NAMES = {
+    'hindi': {'kharif': 'खरीफ', 'rabi': 'रबी', 'zaid': 'ज़ायद'}
+}
+
+MONTH_NAMES = {
+    'hindi': {
+        'January': 'जनवरी', 'February': 'फरवरी', 'March': 'मार्च', 'April': 'अप्रैल',
+        'May': 'मई', 'June': 'जून', 'July': 'जुलाई', 'August': 'अगस्त',
+        'September': 'सितंबर', 'October': 'अक्टूबर', 'November': 'नवंबर', 'December': 'दिसंबर'
+    }
+}
+
+UNIT_NAMES = {
+    'hindi': {'kg/hectare': 'किग्रा/हेक्टेयर'}
+}
+
+MONTH_PATTERN = re.compile(r'\b(' + '|'.join(MONTH_NAMES['hindi']) + r')\b')
+
+# Fixed answers, per topic and language
+STATIC_ANSWERS = {
+    'seasonal': {
+        'english': """🌾 **Seasonal Crop Planning by Annapurna**
+
+**🌧️ Current Season Recommendations:**
+
+**Kharif Season (June-October):**
+• **Rice:** High profit potential, good water availability
+• **Cotton:** Excellent for commercial farming
+• **Maize:** Fast growing, dual purpose crop
+• **Sugarcane:** Long-term investment crop
+
+**❄️ Rabi Season (November-April):**
+• **Wheat:** Staple crop, reliable income
+• **Mustard:** Oilseed crop, good market demand
+• **Gram/Chickpea:** Pulse crop, soil improvement
+• **Barley:** Drought tolerant option
+
+**☀️ Zaid Season (April-June):**
+• **Watermelon:** High value fruit crop
+• **Fodder crops:** For livestock
+• **Green gram:** Quick harvest pulse
+
+**💡 Crop Selection Tips:**
+• Consider local climate and soil type
+• Check water availability
+• Analyze market demand and prices
+• Plan crop rotation for soil health
+• Consider government support schemes
+
+**📊 Profitability Ranking (Current Market):**
+1. Cotton (highest profit potential)
+2. Rice (stable returns)
+3. Wheat (reliable income)
+4. Maize (moderate returns)
+
+Ask Annapurna about specific crops for detailed cultivation guidance!""",
+        'hindi': """🌾 **अन्नपूर्णा द्वारा मौसमी फसल योजना**
+
+**🌧️ मौसम के अनुसार सुझाव:**
+
+**खरीफ मौसम (जून-अक्टूबर):**
+• **धान:** अधिक मुनाफे की संभावना, पानी की अच्छी उपलब्धता
+• **कपास:** व्यावसायिक खेती के लिए उत्तम
+• **मक्का:** जल्दी तैयार होने वाली, दोहरे उपयोग की फसल
+• **गन्ना:** लंबी अवधि के निवेश की फसल
+
+**❄️ रबी मौसम (नवंबर-अप्रैल):**
+• **गेहूं:** मुख्य फसल, भरोसेमंद आमदनी
+• **सरसों:** तिलहन फसल, बाज़ार में अच्छी मांग
+• **चना:** दलहन फसल, मिट्टी की उर्वरता बढ़ाती है
+• **जौ:** सूखा सहने वाला विकल्प
+
+**☀️ ज़ायद मौसम (अप्रैल-जून):**
+• **तरबूज:** अधिक मूल्य वाली फल फसल
+• **चारा फसलें:** पशुओं के लिए
+• **मूंग:** जल्दी कटने वाली दलहन
+
+**💡 फसल चुनने के सुझाव:**
+• स्थानीय जलवायु और मिट्टी का ध्यान रखें
+• पानी की उपलब्धता जांचें
+• बाज़ार की मांग और भाव देखें
+• मिट्टी की सेहत के लिए फसल चक्र अपनाएं
+• सरकारी योजनाओं का लाभ लें
+
+**📊 मुनाफे के अनुसार क्रम (वर्तमान बाज़ार):**
+1. कपास (सबसे अधिक मुनाफा)
+2. धान (स्थिर आमदनी)
+3. गेहूं (भरोसेमंद आमदनी)
+4. मक्का (मध्यम आमदनी)
+
+किसी फसल की विस्तृत जानकारी के लिए अन्नपूर्णा से पूछें!"""
+    },
+    'fertilizer': {
+        'english': """🧪 **Annaprna Fertilizer Management Guide**
+
+**📊 Soil Testing First:**
+• Get soil tested every 2-3 years
+• Test for pH, NPK, organic carbon, micronutrients
+• Cost: ₹50-200 per sample
+
+**🌾 Crop-wise NPK Requirements (kg/hectare):**
+```
+Crop          N     P₂O₅   K₂O
+Rice         120    60     40
+Wheat        120    80     60  
+Cotton       120    60     60
+Maize        120    60     40
+```
+
+**⏰ Application Timing:**
+• **Basal (at sowing):** 100% P&K + 25% N
+• **First split (30 days):** 50% remaining N
+• **Second split (60 days):** 25% remaining N
+
+**🌿 Organic Alternatives:**
+• FYM: 10-15 tonnes/hectare
+• Vermicompost: 3-5 tonnes/hectare
+• Green manure: Dhaincha, sunhemp
+
+**💰 Cost Optimization Tips:**
+• Buy from authorized dealers
+• Use soil test recommendations
+• Combine organic + inorganic
+• Check government subsidies
+
+**⚠️ Annapurna Warning:** Over-fertilization reduces yield and pollutes environment!""",
+        'hindi': """🧪 **अन्नपूर्णा खाद प्रबंधन गाइड**
+
+**📊 पहले मिट्टी की जांच:**
+• हर 2-3 साल में मिट्टी की जांच कराएं
+• pH, NPK, जैविक कार्बन और सूक्ष्म पोषक तत्वों की जांच
+• खर्च: ₹50-200 प्रति नमूना
+
+**🌾 फसल अनुसार NPK आवश्यकता (किग्रा/हेक्टेयर):**
+```
+फसल          N     P₂O₅   K₂O
+धान          120    60     40
+गेहूं          120    80     60
+कपास         120    60     60
+मक्का         120    60     40
+```
+
+**⏰ खाद डालने का समय:**
+• **बुवाई के समय (बेसल):** 100% P और K + 25% N
+• **पहली किस्त (30 दिन):** शेष N का 50%
+• **दूसरी किस्त (60 दिन):** शेष N का 25%
+
+**🌿 जैविक विकल्प:**
+• गोबर की खाद: 10-15 टन/हेक्टेयर
+• वर्मीकम्पोस्ट: 3-5 टन/हेक्टेयर
+• हरी खाद: ढैंचा, सनई
+
+**💰 खर्च बचाने के सुझाव:**
+• अधिकृत विक्रेता से ही खरीदें
+• मिट्टी जांच की सिफारिश के अनुसार डालें
+• जैविक और रासायनिक खाद मिलाकर उपयोग करें
+• सरकारी सब्सिडी की जानकारी लें
+
+**⚠️ अन्नपूर्णा चेतावनी:** ज़रूरत से ज़्यादा खाद उपज घटाती है और पर्यावरण को नुकसान पहुंचाती है!"""
+    },
+    'pest': {
+        'english': """🐛 **AgriBot Integrated Pest Management (IPM)**
+
+**🔍 Prevention First:**
+• Regular field monitoring (weekly)
+• Maintain field cleanliness
+• Use resistant varieties
+• Proper crop rotation
+
+**🌿 Biological Control:**
+• **Beneficial insects:** Ladybirds, lacewings, spiders
+• **Biopesticides:** Neem oil, Bt formulations
+• **Pheromone traps:** For monitoring and mass trapping
+
+**⚗️ Chemical Control (Last Resort):**
+• Use only when economic threshold crossed
+• Rotate different chemical groups
+• Follow label instructions strictly
+• Observe pre-harvest interval
+
+**🚨 Common Issues & Solutions:**
+• **Aphids:** Yellow sticky traps + neem oil
+• **Bollworm:** Pheromone traps + Bt spray
+• **Fungal diseases:** Proper spacing + fungicide spray
+
+**⚠️ Safety Measures:**
+• Wear protective equipment
+• Don't spray during flowering
+• Store pesticides safely
+
+**💡 Annapurna Tip:** Early detection and prevention are better than cure!""",
+        'hindi': """🐛 **अन्नपूर्णा समेकित कीट प्रबंधन (IPM)**
+
+**🔍 पहले बचाव:**
+• हर हफ्ते खेत की निगरानी करें
+• खेत को साफ रखें
+• रोग-प्रतिरोधी किस्में लगाएं
+• सही फसल चक्र अपनाएं
+
+**🌿 जैविक नियंत्रण:**
+• **मित्र कीट:** लेडीबर्ड, लेसविंग, मकड़ी
+• **जैव कीटनाशक:** नीम तेल, Bt आधारित दवाएं
+• **फेरोमोन ट्रैप:** निगरानी और बड़े पैमाने पर कीट पकड़ने के लिए
+
+**⚗️ रासायनिक नियंत्रण (अंतिम उपाय):**
+• केवल आर्थिक क्षति स्तर पार होने पर ही उपयोग करें
+• अलग-अलग रसायन समूह बदल-बदल कर उपयोग करें
+• लेबल के निर्देशों का सख्ती से पालन करें
+• कटाई से पहले की प्रतीक्षा अवधि का ध्यान रखें
+
+**🚨 आम समस्याएं और समाधान:**
+• **माहू (एफिड):** पीले चिपचिपे ट्रैप + नीम तेल
+• **सुंडी (बॉलवर्म):** फेरोमोन ट्रैप + Bt स्प्रे
+• **फफूंद रोग:** सही दूरी पर बुवाई + फफूंदनाशक स्प्रे
+
+**⚠️ सुरक्षा उपाय:**
+• सुरक्षा उपकरण पहनें
+• फूल आने के समय छिड़काव न करें
+• कीटनाशकों को सुरक्षित जगह रखें
+
+**💡 अन्नपूर्णा सलाह:** समय पर पहचान और बचाव इलाज से बेहतर है!"""
+    },
+    'general': {
+        'english': """🤖 **Welcome to Annapurna - Your AI Farming Assistant!**
+
+I'm Annapurna, powered by advanced knowledge systems to help farmers succeed! 🌾
+
+**🎯 What I Can Help You With:**
+
+**🌱 Crop Guidance:**
+• Variety selection for your region
+• Sowing and harvesting schedules
+• Yield optimization techniques
+
+**🧪 Input Management:**
+• Fertilizer recommendations (NPK)
+• Soil health improvement
+• Organic farming methods
+
+**🐛 Plant Protection:**
+• Pest and disease identification
+• Integrated pest management (IPM)
+• Organic control methods
+
+**💧 Water Management:**
+• Irrigation scheduling
+• Water conservation techniques
+• Drip irrigation guidance
+
+**💰 Farm Economics:**
+• Cost analysis and budgeting
+• Profit calculation
+• Market insights
+
+**📝 Example Questions:**
+• "How to grow rice in kharif season?"
+• "NPK fertilizer for wheat crop"
+• "How to control cotton bollworm?"
+• "Best crops for this season"
+• "Drip irrigation cost for tomatoes"
+
+**💡 Pro Tip:** Be specific about your location, crop, and farm size for better advice!
+
+Ask me anything about farming - I'm here to help you grow better crops! 🚜
+
+*Jai Kisan! Jai Vigyan!* 🌾""",
+        'hindi': """🤖 **अन्नपूर्णा में आपका स्वागत है - आपकी AI खेती सहायक!**
+
+मैं अन्नपूर्णा हूं, किसानों की सफलता में मदद के लिए यहां हूं! 🌾
+
+**🎯 मैं इनमें आपकी मदद कर सकती हूं:**
+
+**🌱 फसल मार्गदर्शन:**
+• आपके क्षेत्र के लिए किस्म का चुनाव
+• बुवाई और कटाई का समय
+• उपज बढ़ाने के तरीके
+
+**🧪 खाद और पोषण:**
+• खाद की सिफारिश (NPK)
+• मिट्टी की सेहत सुधारना
+• जैविक खेती के तरीके
+
+**🐛 फसल सुरक्षा:**
+• कीट और रोग की पहचान
+• समेकित कीट प्रबंधन (IPM)
+• जैविक नियंत्रण के तरीके
+
+**💧 जल प्रबंधन:**
+• सिंचाई का समय
+• पानी बचाने के तरीके
+• ड्रिप सिंचाई की जानकारी
+
+**💰 खेती का हिसाब:**
+• लागत और बजट
+• मुनाफे की गणना
+• बाज़ार की जानकारी
+
+**📝 उदाहरण प्रश्न:**
+• "खरीफ में धान कैसे उगाएं?"
+• "गेहूं के लिए NPK खाद"
+• "कपास की सुंडी कैसे रोकें?"
+• "इस मौसम के लिए सबसे अच्छी फसलें"
+• "टमाटर में ड्रिप सिंचाई का खर्च"
+
+**💡 सलाह:** बेहतर सलाह के लिए अपना स्थान, फसल और खेत का आकार बताएं!
+
+खेती से जुड़ा कोई भी सवाल पूछें - मैं बेहतर फसल उगाने में आपकी मदद के लिए यहां हूं! 🚜
+
+*जय किसान! जय विज्ञान!* 🌾"""
+    }
+}
+
+
+def _localize(text: str, language: str) -> str:
+    """Translate month names inside a value such as 'June-July'"""
+    months = MONTH_NAMES.get(language)
+    if not months:
+        return text
+    return MONTH_PATTERN.sub(lambda match: months[match.group(1)], text)
+
+
+def render_crop_guide(crop: str, crop_data: Mapping[str, Any], language: str = DEFAULT_LANGUAGE) -> str:
+    """Render the full cultivation guide for one crop"""
+    labels = CROP_GUIDE_LABELS.get(language, CROP_GUIDE_LABELS[DEFAULT_LANGUAGE])
+    localized = (crop_data.get('localized') or {}).get(language) or {}
+    seasons = SEASON_NAMES.get(language, {})
+
+    def field(name):
+        return localized.get(name) or crop_data[name]
+
+    fertilizer = dict(crop_data['fertilizer'])
+    fertilizer['unit'] = UNIT_NAMES.get(language, {}).get(fertilizer['unit'], fertilizer['unit'])
+
+    advice = f"""{labels['title'].format(name=localized.get('name') or crop.title())}
+
+{labels['varieties']}
+{', '.join(crop_data['varieties'])}
+
+{labels['seasons']}"""
+
+    for season, timing in crop_data['seasons'].items():
+        advice += labels['season_line'].format(
+            season=seasons.get(season) or season.title(),
+            sowing=_localize(timing['sowing'], language),
+            harvest=_localize(timing['harvest'], language)
+        )
+
+    advice += f"""
+
+{labels['fertilizer']}
+{labels['npk'].format(**fertilizer)}
+
+{labels['water']}
+{labels['water_line'].format(water=field('water'))}
+
+{labels['economics']}
+{labels['cost_line'].format(cost=field('cost'))}
+{labels['yield_line'].format(**{'yield': field('yield')})}
+{labels['profit_line'].format(profit=field('profit'))}
+
+{labels['tips']}"""
+
+    for tip in field('tips'):
+        advice += f"\n• {tip}"
+
+    advice += f"\n\n{labels['footer']}"
+    return advice
+
+
+class AnswerCatalog:
+    """Knowledge-base answers: fixed topics up front, crop guides rendered on first use"""
+
+    def __init__(self, crop_data: Mapping[str, Mapping[str, Any]],
+                 languages: Optional[Iterable[str]] = None):
+        self.languages = tuple(languages or CROP_GUIDE_LABELS)
+        self._crop_data = crop_data
+        self._static = MappingProxyType({
+            (topic, language): variants.get(language) or variants[DEFAULT_LANGUAGE]
+            for topic, variants in STATIC_ANSWERS.items() for language in self.languages
+        })
+        self._crop_guides: Dict[tuple, str] = {}
+        self._fallbacks: Dict[str, int] = {}  # requested language -> answers served in its fallback
+        self._lock = threading.Lock()
+
+    def language_for(self, language: str) -> str:
+        """The templated language an answer in ``language`` is served in"""
+        if language in self.languages:
+            return language
+        fallback = FALLBACK_LANGUAGES.get(language)
+        return fallback if fallback in self.languages else DEFAULT_LANGUAGE
+
+    def get(self, topic: str, crop: Optional[str] = None, language: str = DEFAULT_LANGUAGE) -> str:
+        """Look up an answer in ``language`` (or its fallback), rendering a crop guide once"""
+        served = self.language_for(language)
+        if served != language:
+            self._record_fallback(language, served)
+        language = served
+        if topic != 'crop':
+            return self._static[(topic, language)]
+        key = (crop, language)
+        answer = self._crop_guides.get(key)
+        if answer is None:
+            answer = render_crop_guide(crop, self._crop_data[crop], language)
+            with self._lock:
+                answer = self._crop_guides.setdefault(key, answer)
+        return answer
+
+    def _record_fallback(self, requested: str, served: str):
+        with self._lock:
+            count = self._fallbacks.get(requested, 0)
+            self._fallbacks[requested] = count + 1
+        if not count:
+            logger.warning(f"🌐 No {requested} answer templates - answering in {served}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Template languages, answers rendered, and answers served in a fallback language"""
+        with self._lock:
+            fallbacks = {language: {'served_in': self.language_for(language), 'answers': count}
+                         for language, count in sorted(self._fallbacks.items())}
+        return {'languages': list(self.languages), 'rendered_answers': len(self), 'fallbacks': fallbacks}
+
+    def __len__(self):
+        """Answers rendered so far"""
+        return len(self._static) + len(self._crop_guides)
@@ -0,0 +1,112 @@
+"""
+Circuit Breaker for Upstream AI Calls
+=====================================
+
+Stops sending requests to an upstream service (Groq) after repeated
+failures, so callers can go straight to the knowledge-base fallback instead
+of waiting on network timeouts during an outage. After ``reset_timeout``
+seconds a single trial request is let through (half-open); its result
+closes or re-opens the circuit. A trial that never reports back (its caller
+died or forgot) expires after another ``reset_timeout``, so the breaker
+cannot stay half-open forever. A caller that cuts its own call short
+reports ``record_abandoned``, which frees the trial without counting for
+or against the upstream.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure circuit breaker"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'abandoned': 0, 'times_opened': 0}
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be made now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == HALF_OPEN and self._trial_in_flight and now - self._trial_started_at >= self.reset_timeout:
+                logger.warning(f"⚡ Circuit '{self.name}' trial never reported back; allowing a new one")
+                self._trial_in_flight = False
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started_at = now
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        """Record a successful call and close the circuit"""
+        with self._lock:
+            self.stats['successes'] += 1
+            self._consecutive_failures = 0
+            if self._state != CLOSED:
+                logger.info(f"✅ Circuit '{self.name}' closed")
+            self._state = CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit past the threshold"""
+        with self._lock:
+            self.stats['failures'] += 1
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.stats['times_opened'] += 1
+                    logger.warning(
+                        f"⚡ Circuit '{self.name}' opened after {self._consecutive_failures} "
+                        f"consecutive failures; retrying in {self.reset_timeout}s"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """Record a call the caller gave up on (e.g. its own deadline passed); says nothing about the upstream"""
+        with self._lock:
+            self.stats['abandoned'] += 1
+            self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get breaker state and counters"""
+        state = self.state
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                **self.stats
+            }
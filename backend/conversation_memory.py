@@ -0,0 +1,179 @@
+"""
+Per-Session Conversation Memory
+===============================
+
+Bounded conversation stores for the Groq chat bot and the knowledge-base
+engine. Each session keeps a ring buffer of its most recent turns plus an
+optional short summary of the turns that fell off the buffer. Sessions are
+evicted when idle for too long or when the store exceeds its session cap
+(least recently used first), so memory stays bounded in long-running
+processes.
+
+Environment (``ConversationStore.from_env``):
+
+- ``CHAT_MEMORY_MAX_TURNS``: turns kept per session (default 6)
+- ``CHAT_MEMORY_MAX_SESSIONS``: sessions kept (default 1000)
+- ``CHAT_MEMORY_IDLE_SECONDS``: idle time before a session is dropped (default 1800)
+- ``CHAT_MEMORY_SUMMARIZE``: summarize turns that fall off the buffer (default true)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+from prompt_builder import estimate_tokens
+
+
+def extractive_summary(summary: str, turn: Dict[str, Any], max_chars: int) -> str:
+    """Fold an evicted turn into the running summary.
+
+    Keeps a short note of what the farmer asked, newest last, and trims the
+    oldest notes once the summary exceeds ``max_chars``.
+    """
+    question = ' '.join(turn['user_message'].split())
+    if len(question) > 120:
+        question = question[:117] + '...'
+    notes = [note for note in summary.split('\n') if note] + [f"- Asked: {question}"]
+    while notes and len('\n'.join(notes)) > max_chars:
+        notes.pop(0)
+    return '\n'.join(notes)
+
+
+class SessionMemory:
+    """Ring buffer of recent turns for a single session"""
+
+    def __init__(self, max_turns: int, max_turn_chars: int,
+                 summarizer: Optional[Callable] = None, max_summary_chars: int = 600):
+        self.turns = deque(maxlen=max_turns)
+        self.max_turn_chars = max_turn_chars
+        self.summarizer = summarizer
+        self.max_summary_chars = max_summary_chars
+        self.summary = ''
+        self.last_active = time.monotonic()
+
+    def add_turn(self, turn: Dict[str, Any]):
+        """Append a turn, summarizing the one pushed out of the buffer"""
+        if len(self.turns) == self.turns.maxlen and self.summarizer:
+            self.summary = self.summarizer(self.summary, self.turns[0], self.max_summary_chars)
+        turn['user_message'] = turn['user_message'][:self.max_turn_chars]
+        turn['agribot_response'] = turn['agribot_response'][:self.max_turn_chars]
+        self.turns.append(turn)
+        self.last_active = time.monotonic()
+
+
+class ConversationStore:
+    """Thread-safe collection of bounded per-session memories"""
+
+    def __init__(self, max_turns: int = 6, max_sessions: int = 1000, idle_seconds: int = 1800,
+                 max_turn_chars: int = 2000, summarize: bool = True):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_turn_chars = max_turn_chars
+        self.summarizer = extractive_summary if summarize else None
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ConversationStore':
+        return cls(
+            max_turns=int(os.getenv('CHAT_MEMORY_MAX_TURNS', 6)),
+            max_sessions=int(os.getenv('CHAT_MEMORY_MAX_SESSIONS', 1000)),
+            idle_seconds=int(os.getenv('CHAT_MEMORY_IDLE_SECONDS', 1800)),
+            summarize=os.getenv('CHAT_MEMORY_SUMMARIZE', 'true').lower() == 'true'
+        )
+
+    def _evict_idle(self, now: float):
+        """Drop sessions idle longer than ``idle_seconds`` (caller holds the lock)"""
+        # Sessions are kept in LRU order, so idle ones are at the front
+        while self._sessions:
+            session_id, memory = next(iter(self._sessions.items()))
+            if now - memory.last_active < self.idle_seconds:
+                break
+            del self._sessions[session_id]
+
+    def add_turn(self, session_id: str, user_message: str, agribot_response: str, **metadata):
+        """Record one question/answer turn for a session"""
+        turn = {
+            'user_message': user_message,
+            'agribot_response': agribot_response,
+            'timestamp': datetime.now().isoformat(),
+            **metadata
+        }
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = SessionMemory(self.max_turns, self.max_turn_chars, self.summarizer)
+                self._sessions[session_id] = memory
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            memory.add_turn(turn)
+
+    def get_context_messages(self, session_id: str, token_budget: int) -> List[Dict[str, str]]:
+        """Get the most recent turns as chat messages, within a token budget.
+
+        Turns are taken newest first until the budget is spent and returned in
+        chronological order. The summary of older turns is included first
+        when it still fits.
+        """
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                return []
+            if time.monotonic() - memory.last_active >= self.idle_seconds:
+                del self._sessions[session_id]
+                return []
+            turns = list(memory.turns)
+            summary = memory.summary
+
+        messages = []
+        remaining = token_budget
+        for turn in reversed(turns):
+            pair = [
+                {"role": "user", "content": turn['user_message']},
+                {"role": "assistant", "content": turn['agribot_response']}
+            ]
+            cost = estimate_tokens(pair[0]['content']) + estimate_tokens(pair[1]['content'])
+            if cost > remaining:
+                break
+            messages = pair + messages
+            remaining -= cost
+
+        if summary:
+            summary_message = {"role": "system", "content": f"Earlier in this conversation:\n{summary}"}
+            if estimate_tokens(summary_message['content']) <= remaining:
+                messages.insert(0, summary_message)
+        return messages
+
+    def get_history(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get recent turns for a session"""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            return list(memory.turns)[-limit:] if memory else []
+
+    def clear(self, session_id: Optional[str] = None):
+        """Clear one session, or every session when no id is given"""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store size information"""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            return {
+                'active_sessions': len(self._sessions),
+                'total_turns': sum(len(memory.turns) for memory in self._sessions.values()),
+                'max_turns_per_session': self.max_turns,
+                'max_sessions': self.max_sessions,
+                'idle_eviction_seconds': self.idle_seconds
+            }
@@ -0,0 +1,120 @@
+"""
+Batched Counters
+================
+
+Accumulates high-frequency counter bumps (product views and inquiries) in
+memory and flushes them in batches, so a page view costs no catalog lock
+and no store write.
+
+Counts are kept in shards, each a dict guarded by its own lock. Threads
+are assigned shards round-robin, so concurrent requests rarely contend.
+Every increment is counted exactly once: a flush swaps each shard's dict
+out under that shard's lock. A background thread flushes every
+``interval`` seconds. It hands the merged deltas (``{key: {field: n}}``)
+to the ``flush`` callback in one call, e.g. one catalog update and one
+store increment per product that changed. ``pending()`` returns the
+not-yet-flushed counts, so a response can show an up-to-date total.
+
+Environment:
+
+- ``COUNTER_FLUSH_INTERVAL``: seconds between flushes (default 5)
+"""
+
+import itertools
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Deltas = Dict[str, Dict[str, int]]
+
+
+class CounterBuffer:
+    """Sharded in-memory counters with periodic batched flushing"""
+
+    def __init__(self, flush: Callable[[Deltas], None], interval: float = 5.0, shards: int = 16):
+        self._flush_callback = flush
+        self.interval = interval
+        self._shards: List[Deltas] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._local = threading.local()
+        self._next_shard = itertools.count()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'flushes': 0, 'keys_flushed': 0}
+
+    @classmethod
+    def from_env(cls, flush: Callable[[Deltas], None]) -> 'CounterBuffer':
+        return cls(flush, interval=float(os.getenv('COUNTER_FLUSH_INTERVAL', 5)))
+
+    def start(self) -> 'CounterBuffer':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+            self._thread.start()
+        return self
+
+    def _shard(self) -> int:
+        try:
+            return self._local.shard
+        except AttributeError:
+            self._local.shard = next(self._next_shard) % len(self._shards)
+            return self._local.shard
+
+    def add(self, key: str, field: str, amount: int = 1):
+        shard = self._shard()
+        with self._locks[shard]:
+            counts = self._shards[shard].setdefault(key, {})
+            counts[field] = counts.get(field, 0) + amount
+
+    def pending(self, key: str) -> Dict[str, int]:
+        """Counts for ``key`` not flushed yet"""
+        totals: Dict[str, int] = {}
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                counts = shard.get(key)
+                if counts:
+                    for field, amount in counts.items():
+                        totals[field] = totals.get(field, 0) + amount
+        return totals
+
+    def flush(self) -> int:
+        """Hand all accumulated counts to the flush callback; returns the number of keys"""
+        with self._flush_lock:
+            merged: Deltas = {}
+            for index, lock in enumerate(self._locks):
+                with lock:
+                    shard, self._shards[index] = self._shards[index], {}
+                for key, counts in shard.items():
+                    target = merged.setdefault(key, {})
+                    for field, amount in counts.items():
+                        target[field] = target.get(field, 0) + amount
+            if merged:
+                try:
+                    self._flush_callback(merged)
+                except Exception:
+                    # Put the counts back for the next flush
+                    for key, counts in merged.items():
+                        for field, amount in counts.items():
+                            self.add(key, field, amount)
+                    raise
+                self._stats['flushes'] += 1
+                self._stats['keys_flushed'] += len(merged)
+            return len(merged)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Counter flush failed: {e}")
+
+    def close(self):
+        """Stop the flush thread and flush what is left"""
+        self._stop.set()
+        self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'interval_seconds': self.interval, **self._stats}
@@ -0,0 +1,429 @@
+"""
+Durable Marketplace Store
+=========================
+
+Persists marketplace listings and contract applications across restarts,
+and shares them between gunicorn workers, while reads stay in memory.
+
+The store is a SQLite database in WAL mode with two tables:
+
+- ``records``: the current state of each record, which is the compacted
+  snapshot that startup recovery loads in one sequential scan;
+- ``journal``: an append-only change log (``seq``, collection, id, data).
+
+Writes go through a single writer thread that group-commits them. Every
+record queued while the previous transaction was syncing goes into the
+next transaction, so concurrent requests share one fsync. A caller waits
+for its commit (``put(...).wait()``) before it answers, so an
+acknowledged write survives a crash. Counters such as views can skip the
+wait (write-behind). ``put_many`` queues a set of records (a bulk
+import) that is committed in a single transaction.
+
+Each worker keeps its own in-memory copy (the catalog indexes). It follows
+the journal to apply other workers' writes: ``sync()`` checks
+``PRAGMA data_version``, which costs microseconds when nothing changed.
+The journal is pruned to the last ``journal_retention`` entries. A worker
+that falls further behind reloads from ``records``.
+
+Counter fields (views, inquiries) belong to the store. Workers send
+increments (``add_counts``), and the writer applies them to the stored
+record inside its transaction. A full-record ``put`` keeps the stored
+counter values. Increments from different workers therefore add up instead
+of overwriting each other. The merged record is what goes into the
+journal, so every worker converges on the same counts.
+
+With ``path=None`` the store is memory-only: writes complete immediately
+and nothing survives a restart (the previous behaviour).
+
+Environment:
+
+- ``MARKETPLACE_DB``: database path (default ``data/marketplace.sqlite``; ``off`` for memory-only)
+- ``MARKETPLACE_DB_SYNCHRONOUS``: SQLite ``synchronous`` level, ``FULL`` (default) or ``NORMAL``
+- ``MARKETPLACE_COMMIT_INTERVAL_MS``: how long the writer gathers a batch (default 2)
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'marketplace.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (collection, id));
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+PUT, DELETE, ADD, PUT_MANY = 'put', 'delete', 'add', 'put_many'
+MAX_BATCH = 512
+SYNC_BATCH = 1000
+
+
+class Commit:
+    """Handle for a queued write; ``wait()`` blocks until it is durable"""
+
+    __slots__ = ('_done', 'error')
+
+    def __init__(self, done: bool = False):
+        self._done = threading.Event()
+        self.error: Optional[BaseException] = None
+        if done:
+            self._done.set()
+
+    def _finish(self, error: Optional[BaseException] = None):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = 30.0):
+        if not self._done.wait(timeout):
+            raise TimeoutError('Timed out waiting for the store to commit')
+        if self.error is not None:
+            raise self.error
+
+
+COMMITTED = Commit(done=True)
+
+
+class DurableStore:
+    """Write-ahead-logged record store shared by all workers"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_PATH, synchronous: str = 'FULL',
+                 commit_interval_ms: float = 2.0, journal_retention: int = 10000):
+        self.path = path
+        self.synchronous = synchronous.upper()
+        self.commit_interval = commit_interval_ms / 1000
+        self.journal_retention = journal_retention
+        self._collections: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[str, int] = {}
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._own_seqs: set = set()
+        self._pending_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._last_seq = 0
+        self._data_version = None
+        self._writer: Optional[threading.Thread] = None
+        self._stats = {'commits': 0, 'records_written': 0, 'synced': 0, 'reloads': 0}
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._read_conn = self._connect()
+        self._read_conn.executescript(SCHEMA)
+        self._last_seq = self._read_conn.execute("SELECT COALESCE(MAX(seq), 0) FROM journal").fetchone()[0]
+        self._data_version = self._read_conn.execute("PRAGMA data_version").fetchone()[0]
+        self._write_conn = self._connect()
+        self._write_conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        # Id allocation commits on its own; a later FULL commit makes it durable too
+        self._counter_conn = self._connect()
+        self._counter_conn.execute("PRAGMA synchronous=NORMAL")
+        self._writer = threading.Thread(target=self._write_loop, name='store-writer', daemon=True)
+        self._writer.start()
+        logger.info(f"💾 Marketplace store: {path} (journal seq {self._last_seq})")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @property
+    def persistent(self) -> bool:
+        return self.path is not None
+
+    # --- Collections -----------------------------------------------------
+
+    def register(self, collection: str, apply: Callable[[str, Optional[Dict]], None],
+                 ids: Callable[[], Iterable[str]], counters: Sequence[str] = (),
+                 apply_counts: Optional[Callable[[str, Dict[str, int]], None]] = None) -> int:
+        """Load a collection into memory and follow its changes.
+
+        ``apply(id, record)`` inserts or replaces a record in the in-memory
+        copy (``record`` is None for a delete); ``ids()`` lists the ids it
+        holds. ``counters`` are the store-owned counter fields;
+        ``apply_counts(id, values)`` sets them after this worker's own writes.
+        Returns the number of records recovered.
+        """
+        self._collections[collection] = {'apply': apply, 'ids': ids, 'counters': tuple(counters),
+                                         'apply_counts': apply_counts}
+        if not self.persistent:
+            return 0
+        start = time.perf_counter()
+        with self._sync_lock:
+            rows = self._read_conn.execute(
+                "SELECT id, data FROM records WHERE collection = ? ORDER BY rowid", (collection,)).fetchall()
+        for record_id, data in rows:
+            apply(record_id, json.loads(data))
+        logger.info(f"💾 Recovered {len(rows)} {collection} in {time.perf_counter() - start:.2f}s")
+        return len(rows)
+
+    def put(self, collection: str, record_id: str, record: Dict[str, Any]) -> Commit:
+        """Queue an insert/replace. Call while the record cannot change; ``wait()`` afterwards"""
+        return self._enqueue(collection, record_id, PUT, json.dumps(record, ensure_ascii=False))
+
+    def put_many(self, collection: str, records: Dict[str, Dict[str, Any]]) -> Commit:
+        """Queue inserts/replaces that commit together in one transaction, or not at all"""
+        if not self.persistent:
+            return COMMITTED
+        commit = Commit()
+        with self._pending_lock:
+            for record_id in records:
+                key = (collection, record_id)
+                self._pending[key] = self._pending.get(key, 0) + 1
+        data = [(record_id, json.dumps(record, ensure_ascii=False)) for record_id, record in records.items()]
+        self._queue.put((collection, None, PUT_MANY, data, commit))
+        return commit
+
+    def delete(self, collection: str, record_id: str) -> Commit:
+        return self._enqueue(collection, record_id, DELETE, None)
+
+    def add_counts(self, collection: str, record_id: str, deltas: Dict[str, int]) -> Commit:
+        """Queue increments of counter fields (no-op if the record no longer exists)"""
+        return self._enqueue(collection, record_id, ADD, json.dumps(deltas))
+
+    def _enqueue(self, collection: str, record_id: str, op: str, data: Optional[str]) -> Commit:
+        if not self.persistent:
+            return COMMITTED
+        commit = Commit()
+        # Increments don't supersede other workers' rows, so they don't hold back sync()
+        if op != ADD:
+            with self._pending_lock:
+                key = (collection, record_id)
+                self._pending[key] = self._pending.get(key, 0) + 1
+        self._queue.put((collection, record_id, op, data, commit))
+        return commit
+
+    def allocate(self, name: str, first: int = 1, count: int = 1) -> int:
+        """Next value of a counter shared by all workers (``first`` on first use).
+
+        ``count`` reserves a block of consecutive values; the first is returned.
+        """
+        if not self.persistent:
+            with self._pending_lock:
+                value = self._counters.get(name, first)
+                self._counters[name] = value + count
+            return value
+        with self._counter_lock:
+            conn = self._counter_conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR IGNORE INTO counters VALUES (?, ?)", (name, first - 1))
+                conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (count, name))
+                value = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0] - count + 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    # --- Writer ----------------------------------------------------------
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < MAX_BATCH:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    def _merge_counters(self, conn: sqlite3.Connection, collection: str, record_id: str,
+                        op: str, data: str) -> Optional[str]:
+        """Record to store for a put or increment, with counters taken from (or added to) the stored row"""
+        counters = self._collections.get(collection, {}).get('counters', ())
+        if op == PUT and not counters:
+            return data
+        row = conn.execute("SELECT data FROM records WHERE collection = ? AND id = ?",
+                           (collection, record_id)).fetchone()
+        if row is None:
+            return data if op == PUT else None
+        stored = json.loads(row[0])
+        if op == PUT:
+            record = json.loads(data)
+            record.update({field: stored.get(field, 0) for field in counters})
+        else:
+            record = stored
+            for field, delta in json.loads(data).items():
+                record[field] = record.get(field, 0) + delta
+        return json.dumps(record, ensure_ascii=False)
+
+    def _commit(self, batch: List[Tuple[Optional[str], Optional[str], Optional[str], Any, Commit]]):
+        conn = self._write_conn
+        writes = []
+        for collection, record_id, op, data, _ in batch:
+            if collection is None:
+                continue  # Flush marker
+            if op == PUT_MANY:
+                writes.extend((collection, many_id, PUT, many_data) for many_id, many_data in data)
+            else:
+                writes.append((collection, record_id, op, data))
+        seqs = []
+        error = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for collection, record_id, op, data in writes:
+                if op != DELETE:
+                    data = self._merge_counters(conn, collection, record_id, op, data)
+                    if data is None:
+                        continue  # Increment for a deleted record
+                seqs.append(conn.execute("INSERT INTO journal (collection, id, data) VALUES (?, ?, ?)",
+                                         (collection, record_id, data)).lastrowid)
+                if op == DELETE:
+                    conn.execute("DELETE FROM records WHERE collection = ? AND id = ?", (collection, record_id))
+                else:
+                    conn.execute("INSERT INTO records VALUES (?, ?, ?) "
+                                 "ON CONFLICT (collection, id) DO UPDATE SET data = excluded.data",
+                                 (collection, record_id, data))
+            self._stats['commits'] += 1
+            if self._stats['commits'] % 100 == 0:
+                self._prune_journal(conn)
+            conn.execute("COMMIT")
+            self._stats['records_written'] += len(writes)
+        except Exception as e:
+            error = e
+            seqs = []
+            logger.error(f"❌ Marketplace store commit failed ({len(writes)} records): {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+        with self._pending_lock:
+            # This worker's memory already holds these writes, except merged counters
+            self._own_seqs.update(seqs)
+            for collection, record_id, op, _ in writes:
+                if op == ADD:
+                    continue
+                key = (collection, record_id)
+                if self._pending[key] > 1:
+                    self._pending[key] -= 1
+                else:
+                    del self._pending[key]
+        for *_, commit in batch:
+            commit._finish(error)
+
+    def _prune_journal(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM journal WHERE seq <= (SELECT MAX(seq) FROM journal) - ?",
+                     (self.journal_retention,))
+
+    def flush(self, timeout: Optional[float] = 30.0):
+        """Wait until every queued write has been committed"""
+        if self.persistent:
+            commit = Commit()
+            self._queue.put((None, '', None, None, commit))
+            commit.wait(timeout)
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=30)
+
+    # --- Followers -------------------------------------------------------
+
+    def sync(self) -> int:
+        """Apply other workers' writes from the journal; returns the number of changes applied"""
+        if not self.persistent or not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            version = self._read_conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return 0
+            self._data_version = version
+            applied = 0
+            while True:
+                conn = self._read_conn
+                conn.execute("BEGIN")
+                try:
+                    oldest = conn.execute("SELECT MIN(seq) FROM journal").fetchone()[0]
+                    rows = conn.execute(
+                        "SELECT seq, collection, id, data FROM journal WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (self._last_seq, SYNC_BATCH)).fetchall()
+                finally:
+                    conn.execute("COMMIT")
+                if oldest is not None and oldest > self._last_seq + 1:
+                    return applied + self._reload()
+                with self._pending_lock:
+                    pending = set(self._pending)
+                    own = self._own_seqs
+                    if rows:
+                        # Forget only the seqs this batch covers; later ones are still to come
+                        self._own_seqs = {seq for seq in own if seq > rows[-1][0]}
+                for seq, collection, record_id, data in rows:
+                    self._last_seq = seq
+                    # Skip rows that a still-queued local write will supersede
+                    target = self._collections.get(collection)
+                    if target is None or (collection, record_id) in pending:
+                        continue
+                    if seq in own:
+                        # Our own write: only the store-merged counters may be news to us
+                        if data and target['counters'] and target['apply_counts']:
+                            record = json.loads(data)
+                            target['apply_counts'](record_id, {field: record.get(field, 0)
+                                                               for field in target['counters']})
+                        continue
+                    target['apply'](record_id, json.loads(data) if data else None)
+                    applied += 1
+                if len(rows) < SYNC_BATCH:
+                    break
+            self._stats['synced'] += applied
+            return applied
+        finally:
+            self._sync_lock.release()
+
+    def _reload(self) -> int:
+        """Resynchronize every collection from ``records`` after falling behind the journal"""
+        conn = self._read_conn
+        conn.execute("BEGIN")
+        try:
+            self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM journal").fetchone()[0]
+            rows = conn.execute("SELECT collection, id, data FROM records ORDER BY rowid").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        stored: Dict[str, set] = {}
+        with self._pending_lock:
+            pending = set(self._pending)
+        for collection, record_id, data in rows:
+            if collection in self._collections and (collection, record_id) not in pending:
+                stored.setdefault(collection, set()).add(record_id)
+                self._collections[collection]['apply'](record_id, json.loads(data))
+        for collection, target in self._collections.items():
+            for record_id in set(target['ids']()) - stored.get(collection, set()):
+                if (collection, record_id) not in pending:
+                    target['apply'](record_id, None)
+        self._stats['reloads'] += 1
+        logger.warning(f"⚠️ Marketplace store fell behind the journal; reloaded {len(rows)} records")
+        return len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'persistent': self.persistent,
+            'path': self.path,
+            'journal_seq': self._last_seq,
+            'queued': self._queue.qsize(),
+            **self._stats
+        }
+
+
+def store_from_env() -> DurableStore:
+    """Store configured by ``MARKETPLACE_DB*`` environment variables"""
+    path = os.getenv('MARKETPLACE_DB', DEFAULT_PATH)
+    return DurableStore(
+        path=None if path.lower() in ('', 'off', 'none', 'memory') else path,
+        synchronous=os.getenv('MARKETPLACE_DB_SYNCHRONOUS', 'FULL'),
+        commit_interval_ms=float(os.getenv('MARKETPLACE_COMMIT_INTERVAL_MS', 2)))
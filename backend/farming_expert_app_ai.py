@@ -4,16 +4,45 @@ AgriBot AI Backend with Grok API Integration - Complete Version
 
 import os
 import sys
+import csv
 import json
 import logging
 import asyncio
 import traceback
 import requests
+import threading
+import time
+import uuid
+import atexit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from types import MappingProxyType
 from datetime import datetime
 from typing import Dict, Any, Optional, List
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from dotenv import load_dotenv
+from prompt_builder import PromptBuilder
+from conversation_memory import ConversationStore
+from circuit_breaker import CircuitBreaker
+from response_cache import TTLCache, normalize_query
+from llm_providers import create_provider
+from intent_matcher import IntentMatcher
+from knowledge_store import KnowledgeStore
+from knowledge_retriever import KnowledgeRetriever
+from answer_templates import AnswerCatalog
+from structured_logging import configure_logging, get_logging_stats, redact_fields, request_id_var, ACCESS_LOGGER
+from metrics import REGISTRY, instrument_app
+from request_profiler import init_profiler, propagate, span
+from readiness import FAILED, READY, Readiness
+from product_catalog import NUMERIC_FIELDS, ProductCatalog, paginate, parse_numeric, project, query_fingerprint
+from product_search import ProductSearchIndex
+from geo_index import Gazetteer, GeoIndex, parse_coordinates
+from durable_store import store_from_env
+from image_pipeline import ImagePipeline, PROCESSING as IMAGE_PROCESSING, READY as IMAGE_READY
+from static_media import MediaFiles
+from counter_buffer import CounterBuffer
+import product_bulk
+from price_stats import PriceStats
 
 # Explicitly load .env from backend directory
 env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -28,12 +57,11 @@ print(f"🔑 GROK_API_KEY found: {'Yes' if grok_key else 'No'}")
 if groq_key:
     print(f"🔑 GROQ_API_KEY starts with: {groq_key[:10]}...")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Configure logging (queue-backed, structured, redacted; see structured_logging)
+configure_logging()
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger(ACCESS_LOGGER)
+SLOW_REQUEST_MS = float(os.getenv('LOG_SLOW_REQUEST_MS', 2000))
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -53,6 +81,9 @@ allowed_origins = [
 
 CORS(app, origins=allowed_origins, supports_credentials=True)
 
+# Prometheus metrics: per-route latency histograms, in-flight gauge and /metrics
+instrument_app(app)
+
 # --- Crop Health Analysis Endpoint ---
 from werkzeug.utils import secure_filename
 import tempfile
@@ -74,11 +105,18 @@ except ImportError:
     TORCH_AVAILABLE = False
     logger.info("⚠️ PyTorch not installed - advanced image analysis disabled")
 
+# Warm-up tasks gate /readyz; they start once the app is fully initialized
+readiness = Readiness()
+app.extensions['readiness'] = readiness
+
 # --- Import Real Disease Detection Service ---
 try:
     from updated_multi_crop_service import MultiCropDiseaseService
-    disease_service = MultiCropDiseaseService()
+    # The model loads (and runs once) on the warm-up thread, not at import
+    disease_service = MultiCropDiseaseService(autoload=False)
     disease_service_available = True
+    # Optional: a model that fails to load disables this endpoint, not the whole instance
+    readiness.add_task('disease_model', disease_service.warm_up, required=False)
     logger.info("✅ Real disease detection service loaded successfully!")
 except ImportError as e:
     disease_service = None
@@ -95,6 +133,19 @@ def crop_disease_detection():
             'fallback': 'Using basic image analysis instead'
         }), 503
     
+    model_state = readiness.state('disease_model')
+    if model_state == FAILED:
+        return jsonify({
+            'success': False,
+            'error': 'Disease detection model failed to load. Please try again later.',
+            'fallback': 'Using basic image analysis instead'
+        }), 503
+    if model_state != READY:
+        return jsonify({
+            'success': False,
+            'error': 'Disease detection model is warming up. Please retry shortly.'
+        }), 503, {'Retry-After': '5'}
+    
     if 'image' not in request.files:
         return jsonify({'success': False, 'error': 'No image file provided.'}), 400
         
@@ -228,255 +279,284 @@ def crop_image_analysis():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Script letters per language, and the regional context sent along with each prompt
+LANGUAGE_SCRIPTS = {
+    'hindi': frozenset(['अ', 'आ', 'इ', 'ई', 'उ', 'ऊ', 'ए', 'ऐ', 'ओ', 'औ', 'क', 'ख', 'ग', 'घ', 'च', 'छ', 'ज', 'झ', 'ट', 'ठ', 'ड', 'ढ', 'त', 'थ', 'द', 'ध', 'न', 'प', 'फ', 'ब', 'भ', 'म', 'य', 'र', 'ल', 'व', 'श', 'ष', 'स', 'ह']),
+    'tamil': frozenset(['அ', 'ஆ', 'இ', 'ஈ', 'உ', 'ஊ', 'எ', 'ஏ', 'ஐ', 'ஒ', 'ஓ', 'ஔ', 'க', 'ங', 'ச', 'ஞ', 'ட', 'ண', 'த', 'ந', 'ப', 'ம', 'ய', 'ர', 'ல', 'வ', 'ழ', 'ள', 'ற', 'ன']),
+    'telugu': frozenset(['అ', 'ఆ', 'ఇ', 'ఈ', 'ఉ', 'ఊ', 'ఎ', 'ఏ', 'ఐ', 'ఒ', 'ఓ', 'ఔ', 'క', 'ఖ', 'గ', 'ఘ', 'ఙ', 'చ', 'ఛ', 'జ', 'ఝ', 'ఞ', 'ట', 'ఠ', 'డ', 'ఢ', 'ణ', 'త', 'థ', 'ద', 'ధ', 'న', 'ప', 'ఫ', 'బ', 'భ', 'మ', 'య', 'ర', 'ల', 'వ', 'శ', 'ష', 'స', 'హ']),
+    'punjabi': frozenset(['ਅ', 'ਆ', 'ਇ', 'ਈ', 'ਉ', 'ਊ', 'ਏ', 'ਐ', 'ਓ', 'ਔ', 'ਕ', 'ਖ', 'ਗ', 'ਘ', 'ਙ', 'ਚ', 'ਛ', 'ਜ', 'ਝ', 'ਞ', 'ਟ', 'ਠ', 'ਡ', 'ਢ', 'ਣ', 'ਤ', 'ਥ', 'ਦ', 'ਧ', 'ਨ', 'ਪ', 'ਫ', 'ਬ', 'ਭ', 'ਮ', 'ਯ', 'ਰ', 'ਲ', 'ਵ', 'ਸ਼', 'ਸ', 'ਹ']),
+    'bengali': frozenset(['অ', 'আ', 'ই', 'ঈ', 'উ', 'ঊ', 'ঋ', 'এ', 'ঐ', 'ও', 'ঔ', 'ক', 'খ', 'গ', 'ঘ', 'ঙ', 'চ', 'ছ', 'জ', 'ঝ', 'ঞ', 'ট', 'ঠ', 'ড', 'ঢ', 'ণ', 'ত', 'থ', 'দ', 'ধ', 'ন', 'প', 'ফ', 'ব', 'ভ', 'ম', 'য', 'র', 'ল', 'শ', 'ষ', 'স', 'হ']),
+    'marathi': frozenset(['अ', 'आ', 'इ', 'ई', 'उ', 'ऊ', 'ऋ', 'ए', 'ऐ', 'ओ', 'औ', 'क', 'ख', 'ग', 'घ', 'ङ', 'च', 'छ', 'ज', 'झ', 'ञ', 'ट', 'ठ', 'ड', 'ढ', 'ण', 'त', 'थ', 'द', 'ध', 'न', 'प', 'फ', 'ब', 'भ', 'म', 'य', 'र', 'ल', 'व', 'श', 'ष', 'स', 'ह']),
+    'gujarati': frozenset(['અ', 'આ', 'ઇ', 'ઈ', 'ઉ', 'ઊ', 'ઋ', 'એ', 'ઐ', 'ઓ', 'ઔ', 'ક', 'ખ', 'ગ', 'ઘ', 'ઙ', 'ચ', 'છ', 'જ', 'ઝ', 'ઞ', 'ટ', 'ઠ', 'ડ', 'ઢ', 'ણ', 'ત', 'થ', 'દ', 'ધ', 'ન', 'પ', 'ફ', 'બ', 'ભ', 'મ', 'ય', 'ર', 'લ', 'વ', 'શ', 'ષ', 'સ', 'હ']),
+    'kannada': frozenset(['ಅ', 'ಆ', 'ಇ', 'ಈ', 'ಉ', 'ಊ', 'ಋ', 'ಎ', 'ಏ', 'ಐ', 'ಒ', 'ಓ', 'ಔ', 'ಕ', 'ಖ', 'ಗ', 'ಘ', 'ಙ', 'ಚ', 'ಛ', 'ಜ', 'ಝ', 'ಞ', 'ಟ', 'ಠ', 'ಡ', 'ಢ', 'ಣ', 'ತ', 'ಥ', 'ದ', 'ಧ', 'ನ', 'ಪ', 'ಫ', 'ಬ', 'ಭ', 'ಮ', 'ಯ', 'ರ', 'ಲ', 'ವ', 'ಶ', 'ಷ', 'ಸ', 'ಹ']),
+    'malayalam': frozenset(['അ', 'ആ', 'ഇ', 'ഈ', 'ഉ', 'ഊ', 'ഋ', 'എ', 'ഏ', 'ഐ', 'ഒ', 'ഓ', 'ഔ', 'ക', 'ഖ', 'ഗ', 'ഘ', 'ങ', 'ച', 'ഛ', 'ജ', 'ഝ', 'ഞ', 'ട', 'ഠ', 'ഡ', 'ഢ', 'ണ', 'ത', 'ഥ', 'ദ', 'ധ', 'ന', 'പ', 'ഫ', 'ബ', 'ഭ', 'മ', 'യ', 'ര', 'ല', 'വ', 'ശ', 'ഷ', 'സ', 'ഹ'])
+}
+
+REGIONAL_CONTEXT = {
+    'hindi': 'North India (UP, Bihar, MP, Rajasthan, Haryana)',
+    'punjabi': 'Punjab, Haryana (Wheat Belt)',
+    'tamil': 'Tamil Nadu (Rice, Sugarcane)',
+    'telugu': 'Andhra Pradesh, Telangana (Cotton, Rice)',
+    'bengali': 'West Bengal (Rice, Jute)',
+    'marathi': 'Maharashtra (Cotton, Sugarcane, Onion)',
+    'gujarati': 'Gujarat (Cotton, Groundnut)',
+    'kannada': 'Karnataka (Coffee, Ragi, Cotton)',
+    'malayalam': 'Kerala (Spices, Coconut, Rice)',
+    'english': 'Pan-India'
+}
+
+REGIONAL_CROPS = {
+    'hindi': ['गेहूं (wheat)', 'धान (rice)', 'मक्का (maize)', 'बाजरा (millet)'],
+    'punjabi': ['ਕਣਕ (wheat)', 'ਚੌਲ (rice)', 'ਮੱਕੀ (maize)', 'ਕਪਾਹ (cotton)'],
+    'tamil': ['அரிசி (rice)', 'கரும்பு (sugarcane)', 'மிளகாய் (chili)', 'கொள்ளு (horsegram)'],
+    'telugu': ['వరి (rice)', 'పత్తి (cotton)', 'మిర్చి (chili)', 'మామిడి (mango)'],
+    'bengali': ['ধান (rice)', 'পাট (jute)', 'আলু (potato)', 'সরিষা (mustard)'],
+    'marathi': ['कापूस (cotton)', 'ऊस (sugarcane)', 'कांदा (onion)', 'ज्वारी (sorghum)'],
+    'gujarati': ['કપાસ (cotton)', 'મગફળી (groundnut)', 'બાજરી (millet)', 'તલ (sesame)'],
+    'kannada': ['ಅಕ್ಕಿ (rice)', 'ಕಾಫಿ (coffee)', 'ರಾಗಿ (ragi)', 'ತೆಂಗಿನಕಾಯಿ (coconut)'],
+    'malayalam': ['നെൽ (rice)', 'തേങ്ങ (coconut)', 'കുരുമുളക് (pepper)', 'ഏലം (cardamom)'],
+    'english': ['rice', 'wheat', 'cotton', 'sugarcane']
+}
+
+def detect_language(text: str) -> Dict[str, Any]:
+    """Detect language and regional context from user input (the script with the most letters wins)"""
+    detected_language = 'english'  # default
+    confidence = 0
+    
+    for lang, chars in LANGUAGE_SCRIPTS.items():
+        char_count = sum(1 for char in text if char in chars)
+        if char_count > confidence:
+            confidence = char_count
+            detected_language = lang
+    
+    return {
+        'language': detected_language,
+        'confidence': confidence,
+        'region': REGIONAL_CONTEXT.get(detected_language, 'General'),
+        'common_crops': list(REGIONAL_CROPS.get(detected_language, [])),
+        'is_indian_language': detected_language != 'english',
+        'script_detected': confidence > 0
+    }
+
 class GroqAgriBot:
-    """AgriBot powered by Groq API - FREE & FAST"""
+    """AgriBot powered by Groq API - FREE & FAST (or a local model via LLM_PROVIDER=local)"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, knowledge_store: Optional[KnowledgeStore] = None):
         """Initialize Groq AgriBot"""
-        self.api_key = api_key or os.getenv('GROQ_API_KEY') or os.getenv('GROK_API_KEY')
-        
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY environment variable is required")
-        
-        self.base_url = "https://api.groq.com/openai/v1"
-        self.model = "llama-3.1-8b-instant"  # Fast and free model
-        
-        # Headers for API requests
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        
-        # System prompt for expert farming advice with multilingual support
-        self.system_prompt = """You are Annapurna, an expert agricultural advisor AI specifically designed for Indian farmers and global agriculture. You have deep expertise in:
-
-🌾 AGRICULTURE EXPERTISE:
-- All major crops (cereals, pulses, oilseeds, vegetables, fruits, cash crops)
-- Modern and traditional farming techniques
-- Organic and sustainable agriculture
-- Precision farming and smart agriculture
-- Crop rotation and intercropping
-
-🧪 TECHNICAL KNOWLEDGE:
-- Soil science and fertility management
-- Plant nutrition and fertilizer management
-- Irrigation systems and water management
-- Plant pathology and entomology
-- Agricultural machinery and technology
-
-🌍 REGIONAL EXPERTISE:
-- Climate-specific recommendations
-- Local variety selection
-- Regional pest and disease patterns
-- Market conditions and pricing
-- Government schemes and subsidies
-
-�️ MULTILINGUAL SUPPORT:
-- Respond in the same language as the user's question
-- Support Hindi (हिंदी), English, Punjabi (ਪੰਜਾਬੀ), Tamil (தமிழ்), Telugu (తెలుగు), Bengali (বাংলা), Marathi (मराठी), Gujarati (ગુજરાતી), Kannada (ಕನ್ನಡ), Malayalam (മലയാളം)
-- Use regional farming terminology when appropriate
-- Include local crop names and varieties
-- Understand regional dialects and farming practices
-
-�💡 COMMUNICATION STYLE:
-- Use simple, farmer-friendly language in the user's preferred language
-- Provide practical, actionable advice
-- Include specific numbers (costs, quantities, timing)
-- Be encouraging and supportive
-- Use appropriate emojis for better readability
-- Consider economic viability and local context
-
-🎯 RESPONSE GUIDELINES:
-- Always detect and respond in the user's language
-- Give practical, implementable solutions
-- Consider both modern and traditional methods
-- Include safety warnings when needed
-- Suggest government schemes when applicable
-- Provide region-specific advice when location is mentioned
-- Use local units of measurement (acres, bigha, quintal, etc.)
-- Include local crop varieties and farming practices
-
-🌏 LANGUAGE EXAMPLES:
-- Hindi: "धान की खेती कैसे करें?" → Respond in Hindi with regional context
-- Tamil: "நெல் சாகுபடி எப்படி செய்வது?" → Respond in Tamil with South Indian context
-- Punjabi: "ਕਣਕ ਦੀ ਖੇਤੀ ਕਿਵੇਂ ਕਰੀਏ?" → Respond in Punjabi with Punjab region context
-- English: "How to grow rice?" → Respond in English with pan-Indian context
-
-Remember: You're helping real farmers improve their livelihoods across different regions and languages. Be accurate, practical, culturally sensitive, and linguistically appropriate."""
-
-        self.conversation_history = []
+        # Groq by default; LLM_PROVIDER=local uses an on-premise OpenAI-compatible server
+        self.provider = create_provider(api_key)
+        self.base_url = self.provider.base_url
+        self.model = self.provider.model
+        
+        # Compact, byte-stable system prompt so provider-side prefix caching applies
+        self.prompt_builder = PromptBuilder()
+        self.system_prompt = self.prompt_builder.system_prompt
+
+        # Bounded per-session conversation memory (recent turns are sent back to the model)
+        self.memory = ConversationStore.from_env()
+        self.history_token_budget = int(os.getenv('CHAT_MEMORY_TOKEN_BUDGET', 600))
+
+        # Local BM25 retrieval: top knowledge passages are added to the prompt (0 disables)
+        self.rag_top_k = int(os.getenv('RAG_TOP_K', 3))
+        self.retriever = KnowledgeRetriever(knowledge_store or KnowledgeStore()) if self.rag_top_k else None
+        self.max_tokens = int(os.getenv('GROQ_MAX_TOKENS', 2000))
+
+        # Skip Groq entirely while it is failing instead of waiting on timeouts
+        self.circuit_breaker = CircuitBreaker(
+            self.provider.name,
+            failure_threshold=int(os.getenv('GROQ_BREAKER_FAILURES', 3)),
+            reset_timeout=float(os.getenv('GROQ_BREAKER_RESET_SECONDS', 30))
+        )
+
+        # Latency budget: answer from the knowledge base if Groq is slower than this (0 disables).
+        # A history-less call keeps running and caches its late answer; a call with history can't
+        # be reused, so the budget is also its HTTP timeout
+        self.latency_budget = float(os.getenv('GROQ_LATENCY_BUDGET_SECONDS', 8))
+        max_inflight = int(os.getenv('GROQ_MAX_INFLIGHT', 16))
+        self.executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix='groq')
+        self._inflight_slots = threading.BoundedSemaphore(max_inflight)
+        self.response_cache = TTLCache(
+            max_entries=int(os.getenv('GROQ_CACHE_ENTRIES', 512)),
+            ttl_seconds=float(os.getenv('GROQ_CACHE_TTL_SECONDS', 3600))
+        )
+        self.deadline_misses = 0
+        self._stats_lock = threading.Lock()
         logger.info("✅ Groq AgriBot initialized successfully")
     
     def detect_language(self, text: str) -> Dict[str, Any]:
         """Detect language and regional context from user input"""
-        language_patterns = {
-            'hindi': ['अ', 'आ', 'इ', 'ई', 'उ', 'ऊ', 'ए', 'ऐ', 'ओ', 'औ', 'क', 'ख', 'ग', 'घ', 'च', 'छ', 'ज', 'झ', 'ट', 'ठ', 'ड', 'ढ', 'त', 'थ', 'द', 'ध', 'न', 'प', 'फ', 'ब', 'भ', 'म', 'य', 'र', 'ल', 'व', 'श', 'ष', 'स', 'ह'],
-            'tamil': ['அ', 'ஆ', 'இ', 'ஈ', 'உ', 'ஊ', 'எ', 'ஏ', 'ஐ', 'ஒ', 'ஓ', 'ஔ', 'க', 'ங', 'ச', 'ஞ', 'ட', 'ண', 'த', 'ந', 'ப', 'ம', 'ய', 'ர', 'ல', 'வ', 'ழ', 'ள', 'ற', 'ன'],
-            'telugu': ['అ', 'ఆ', 'ఇ', 'ఈ', 'ఉ', 'ఊ', 'ఎ', 'ఏ', 'ఐ', 'ఒ', 'ఓ', 'ఔ', 'క', 'ఖ', 'గ', 'ఘ', 'ఙ', 'చ', 'ఛ', 'జ', 'ఝ', 'ఞ', 'ట', 'ఠ', 'డ', 'ఢ', 'ణ', 'త', 'థ', 'ద', 'ధ', 'న', 'ప', 'ఫ', 'బ', 'భ', 'మ', 'య', 'ర', 'ల', 'వ', 'శ', 'ష', 'స', 'హ'],
-            'punjabi': ['ਅ', 'ਆ', 'ਇ', 'ਈ', 'ਉ', 'ਊ', 'ਏ', 'ਐ', 'ਓ', 'ਔ', 'ਕ', 'ਖ', 'ਗ', 'ਘ', 'ਙ', 'ਚ', 'ਛ', 'ਜ', 'ਝ', 'ਞ', 'ਟ', 'ਠ', 'ਡ', 'ਢ', 'ਣ', 'ਤ', 'ਥ', 'ਦ', 'ਧ', 'ਨ', 'ਪ', 'ਫ', 'ਬ', 'ਭ', 'ਮ', 'ਯ', 'ਰ', 'ਲ', 'ਵ', 'ਸ਼', 'ਸ', 'ਹ'],
-            'bengali': ['অ', 'আ', 'ই', 'ঈ', 'উ', 'ঊ', 'ঋ', 'এ', 'ঐ', 'ও', 'ঔ', 'ক', 'খ', 'গ', 'ঘ', 'ঙ', 'চ', 'ছ', 'জ', 'ঝ', 'ঞ', 'ট', 'ঠ', 'ড', 'ঢ', 'ণ', 'ত', 'থ', 'দ', 'ধ', 'ন', 'প', 'ফ', 'ব', 'ভ', 'ম', 'য', 'র', 'ল', 'শ', 'ষ', 'স', 'হ'],
-            'marathi': ['अ', 'आ', 'इ', 'ई', 'उ', 'ऊ', 'ऋ', 'ए', 'ऐ', 'ओ', 'औ', 'क', 'ख', 'ग', 'घ', 'ङ', 'च', 'छ', 'ज', 'झ', 'ञ', 'ट', 'ठ', 'ड', 'ढ', 'ण', 'त', 'थ', 'द', 'ध', 'न', 'प', 'फ', 'ब', 'भ', 'म', 'य', 'र', 'ल', 'व', 'श', 'ष', 'स', 'ह'],
-            'gujarati': ['અ', 'આ', 'ઇ', 'ઈ', 'ઉ', 'ઊ', 'ઋ', 'એ', 'ઐ', 'ઓ', 'ઔ', 'ક', 'ખ', 'ગ', 'ઘ', 'ઙ', 'ચ', 'છ', 'જ', 'ઝ', 'ઞ', 'ટ', 'ઠ', 'ડ', 'ઢ', 'ણ', 'ત', 'થ', 'દ', 'ધ', 'ન', 'પ', 'ફ', 'બ', 'ભ', 'મ', 'ય', 'ર', 'લ', 'વ', 'શ', 'ષ', 'સ', 'હ'],
-            'kannada': ['ಅ', 'ಆ', 'ಇ', 'ಈ', 'ಉ', 'ಊ', 'ಋ', 'ಎ', 'ಏ', 'ಐ', 'ಒ', 'ಓ', 'ಔ', 'ಕ', 'ಖ', 'ಗ', 'ಘ', 'ಙ', 'ಚ', 'ಛ', 'ಜ', 'ಝ', 'ಞ', 'ಟ', 'ಠ', 'ಡ', 'ಢ', 'ಣ', 'ತ', 'ಥ', 'ದ', 'ಧ', 'ನ', 'ಪ', 'ಫ', 'ಬ', 'ಭ', 'ಮ', 'ಯ', 'ರ', 'ಲ', 'ವ', 'ಶ', 'ಷ', 'ಸ', 'ಹ'],
-            'malayalam': ['അ', 'ആ', 'ഇ', 'ഈ', 'ഉ', 'ഊ', 'ഋ', 'എ', 'ഏ', 'ഐ', 'ഒ', 'ഓ', 'ഔ', 'ക', 'ഖ', 'ഗ', 'ഘ', 'ങ', 'ച', 'ഛ', 'ജ', 'ഝ', 'ഞ', 'ട', 'ഠ', 'ഡ', 'ഢ', 'ണ', 'ത', 'ഥ', 'ദ', 'ധ', 'ന', 'പ', 'ഫ', 'ബ', 'ഭ', 'മ', 'യ', 'ര', 'ല', 'വ', 'ശ', 'ഷ', 'സ', 'ഹ']
-        }
-        
-        detected_language = 'english'  # default
-        confidence = 0
-        
-        for lang, chars in language_patterns.items():
-            char_count = sum(1 for char in text if char in chars)
-            if char_count > confidence:
-                confidence = char_count
-                detected_language = lang
-        
-        # Regional context mapping
-        regional_context = {
-            'hindi': 'North India (UP, Bihar, MP, Rajasthan, Haryana)',
-            'punjabi': 'Punjab, Haryana (Wheat Belt)',
-            'tamil': 'Tamil Nadu (Rice, Sugarcane)',
-            'telugu': 'Andhra Pradesh, Telangana (Cotton, Rice)',
-            'bengali': 'West Bengal (Rice, Jute)',
-            'marathi': 'Maharashtra (Cotton, Sugarcane, Onion)',
-            'gujarati': 'Gujarat (Cotton, Groundnut)',
-            'kannada': 'Karnataka (Coffee, Ragi, Cotton)',
-            'malayalam': 'Kerala (Spices, Coconut, Rice)',
-            'english': 'Pan-India'
-        }
-        
-        # Common crops by region
-        regional_crops = {
-            'hindi': ['गेहूं (wheat)', 'धान (rice)', 'मक्का (maize)', 'बाजरा (millet)'],
-            'punjabi': ['ਕਣਕ (wheat)', 'ਚੌਲ (rice)', 'ਮੱਕੀ (maize)', 'ਕਪਾਹ (cotton)'],
-            'tamil': ['அரிசி (rice)', 'கரும்பு (sugarcane)', 'மிளகாய் (chili)', 'கொள்ளு (horsegram)'],
-            'telugu': ['వరి (rice)', 'పత్తి (cotton)', 'మిర్చి (chili)', 'మామిడి (mango)'],
-            'bengali': ['ধান (rice)', 'পাট (jute)', 'আলু (potato)', 'সরিষা (mustard)'],
-            'marathi': ['कापूस (cotton)', 'ऊस (sugarcane)', 'कांदा (onion)', 'ज्वारी (sorghum)'],
-            'gujarati': ['કપાસ (cotton)', 'મગફળી (groundnut)', 'બાજરી (millet)', 'તલ (sesame)'],
-            'kannada': ['ಅಕ್ಕಿ (rice)', 'ಕಾಫಿ (coffee)', 'ರಾಗಿ (ragi)', 'ತೆಂಗಿನಕಾಯಿ (coconut)'],
-            'malayalam': ['നെൽ (rice)', 'തേങ്ങ (coconut)', 'കുരുമുളക് (pepper)', 'ഏലം (cardamom)'],
-            'english': ['rice', 'wheat', 'cotton', 'sugarcane']
-        }
+        return detect_language(text)
+    
+    def get_farming_advice(self, user_message: str, context: Dict = None, session_id: str = None) -> Dict[str, Any]:
+        """Get multilingual farming advice using Groq API within the latency budget"""
+        history = self.memory.get_context_messages(session_id, self.history_token_budget) if session_id else []
+        
+        if self.latency_budget <= 0:
+            result = self._request_advice(user_message, context, history)
+        elif not self._inflight_slots.acquire(blocking=False):
+            logger.warning("⏱️ All Groq worker slots busy - skipping API call")
+            result = {
+                'success': False,
+                'error': 'Groq busy',
+                'advice': 'The AI service is busy. Please try again shortly.',
+                'model_type': 'groq_busy',
+                'timestamp': datetime.now().isoformat()
+            }
+        else:
+            # A late answer is only reusable (cached) without history; otherwise stop at the budget
+            deadline = time.monotonic() + self.latency_budget if history else None
+            # propagate() carries the request id and any active profile to the worker thread
+            future = self.executor.submit(propagate(self._request_advice), user_message, context, history, deadline)
+            future.add_done_callback(lambda _: self._inflight_slots.release())
+            try:
+                result = future.result(timeout=self.latency_budget)
+            except FutureTimeout:
+                # A history-less call keeps running and warms the response cache; a call with
+                # history times out at its deadline (or is skipped if it has not started)
+                with self._stats_lock:
+                    self.deadline_misses += 1
+                logger.warning(f"⏱️ Groq exceeded {self.latency_budget}s latency budget - using fallback")
+                result = {
+                    'success': False,
+                    'error': 'Groq latency budget exceeded',
+                    'advice': 'The AI service is taking too long to respond. Please try again.',
+                    'model_type': 'groq_deadline_exceeded',
+                    'timestamp': datetime.now().isoformat()
+                }
         
-        return {
-            'language': detected_language,
-            'confidence': confidence,
-            'region': regional_context.get(detected_language, 'General'),
-            'common_crops': regional_crops.get(detected_language, []),
-            'is_indian_language': detected_language != 'english',
-            'script_detected': confidence > 0
-        }
+        # Store in the session's conversation memory with language info
+        if result.get('success') and session_id:
+            self.memory.add_turn(
+                session_id, user_message, result['advice'],
+                language_detected=result['language_info']['language'],
+                region=result['language_info']['region'],
+                model=self.model
+            )
+        return result
     
-    def get_farming_advice(self, user_message: str, context: Dict = None) -> Dict[str, Any]:
-        """Get multilingual farming advice using Groq API"""
+    def _request_advice(self, user_message: str, context: Dict = None, history: List[Dict] = None,
+                        deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Call the Groq API (answers without history are served from and stored in the cache).
+
+        With a ``deadline`` (``time.monotonic()``), the call is skipped once it
+        has passed and otherwise times out at it; hitting it is not counted
+        as a Groq failure.
+        """
+        cache_key = None if history else normalize_query(user_message)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached:
+                logger.info("⚡ Serving Groq answer from response cache")
+                return {**cached, 'context': context or {}, 'cached': True,
+                        'timestamp': datetime.now().isoformat()}
+        
+        # True while this call holds the breaker's permission and has not reported an outcome
+        breaker_pending = False
         try:
             logger.info(f"🔄 Sending multilingual request to Groq API...")
             
             # Detect language and add context
-            lang_info = self.detect_language(user_message)
-            
-            # Enhanced message with language and regional context
-            enhanced_context = f"""
-LANGUAGE DETECTION RESULTS:
-- Detected Language: {lang_info['language'].title()}
-- Regional Context: {lang_info['region']}
-- Common Regional Crops: {', '.join(lang_info['common_crops'])}
-- Script Confidence: {lang_info['confidence']} characters
-
-USER QUERY: {user_message}
-
-IMPORTANT INSTRUCTIONS:
-1. Respond in the SAME LANGUAGE as the user's question
-2. If user wrote in Hindi, respond completely in Hindi
-3. If user wrote in Tamil, respond completely in Tamil
-4. Include regional farming practices specific to {lang_info['region']}
-5. Use local crop names and varieties from the region
-6. Consider local climate, soil, and farming traditions
-7. Use appropriate regional units (acre, bigha, hectare as per region)
-8. Include government schemes available in that state/region
-
-REGIONAL CONTEXT:
-- Focus on crops common to {lang_info['region']}: {', '.join(lang_info['common_crops'])}
-- Consider local farming practices and traditional knowledge
-- Include region-specific pest and disease management
-- Mention local agricultural universities and research centers if relevant
-"""
+            with span('detect_language'):
+                lang_info = self.detect_language(user_message)
             
-            # Build messages for conversation
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": enhanced_context}
-            ]
+            # Ground the answer in locally retrieved knowledge passages
+            with span('retrieve_passages'):
+                passages = self.retriever.retrieve(user_message, self.rag_top_k) if self.retriever else []
             
-            # Prepare API request
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "max_tokens": 2000,
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "stream": False
-            }
+            # Build compact messages: fixed system prefix + history + per-request user block
+            with span('build_prompt'):
+                prompt = self.prompt_builder.build_messages(user_message, lang_info, history, passages)
+            messages = prompt['messages']
             
             logger.info(f"📡 Making multilingual request to: {self.base_url}/chat/completions")
             logger.info(f"🌐 Detected language: {lang_info['language']} | Region: {lang_info['region']}")
+            logger.info(f"📏 Estimated prompt tokens: {prompt['tokens']['total']}")
             
-            # Make API request
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    logger.info("⏱️ Latency budget spent before the Groq call - skipping it")
+                    return {
+                        'success': False,
+                        'error': 'Groq latency budget exceeded',
+                        'advice': 'The AI service is taking too long to respond. Please try again.',
+                        'model_type': 'groq_deadline_exceeded',
+                        'language_info': lang_info,
+                        'timestamp': datetime.now().isoformat()
+                    }
             
-            logger.info(f"📨 Response status: {response.status_code}")
+            # Ask the breaker only now, so a local error above cannot use up a half-open trial
+            if not self.circuit_breaker.allow_request():
+                logger.warning("⚡ Groq circuit open - skipping API call")
+                return {
+                    'success': False,
+                    'error': 'Groq circuit open',
+                    'advice': 'The AI service is temporarily unavailable. Please try again shortly.',
+                    'model_type': 'groq_circuit_open',
+                    'language_info': lang_info,
+                    'timestamp': datetime.now().isoformat()
+                }
+            breaker_pending = True
             
-            if response.status_code == 200:
-                data = response.json()
-                advice = data['choices'][0]['message']['content']
-                
-                # Store in conversation history with language info
-                self.conversation_history.append({
-                    'user_message': user_message,
-                    'agribot_response': advice,
-                    'language_detected': lang_info['language'],
-                    'region': lang_info['region'],
-                    'timestamp': datetime.now().isoformat(),
-                    'model': 'llama-3.1-8b-instant'
-                })
+            # Make API request through the configured provider
+            response = self.provider.complete(messages, max_tokens=self.max_tokens, temperature=0.7, top_p=0.9,
+                                              timeout=timeout)
+            status_code = response['status_code']
+            
+            logger.info(f"📨 Response status: {status_code}")
+            
+            # 401, 429 and 5xx mean Groq is unusable right now; other codes mean it is reachable
+            breaker_pending = False
+            if status_code in (401, 429) or status_code >= 500:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            
+            if status_code == 200:
+                advice = response['content']
+                self.prompt_builder.record_usage(prompt['tokens']['total'], response['usage'], lang_info['language'])
                 
                 logger.info(f"✅ Multilingual Groq response generated: {len(advice)} characters in {lang_info['language']}")
                 
-                return {
+                result = {
                     'success': True,
                     'advice': advice,
-                    'model_type': 'llama-3.1-8b-instant',
-                    'provider': 'groq',
+                    'model_type': self.model,
+                    'provider': self.provider.name,
                     'language_info': lang_info,
                     'cost': 'free',
                     'context': context or {},
                     'multilingual_support': True,
                     'regional_context': lang_info['region'],
+                    'token_usage': response['usage'],
+                    'tokens_per_second': response['tokens_per_second'],
+                    'sources': [passage['id'] for passage in passages],
                     'timestamp': datetime.now().isoformat()
                 }
+                if cache_key:
+                    self.response_cache.set(cache_key, dict(result))
+                return result
             else:
                 # Error handling same as before
-                error_text = response.text
-                logger.error(f"❌ Groq API error {response.status_code}: {error_text}")
+                error_text = response['error_text']
+                logger.error(f"❌ {self.provider.name} API error {status_code}: {error_text}")
                 
-                if response.status_code == 401:
+                if status_code == 401:
                     error_msg = "Invalid Groq API key. Please check your GROQ_API_KEY in .env file."
-                elif response.status_code == 429:
+                elif status_code == 429:
                     error_msg = "Groq API rate limit exceeded. Please try again later."
-                elif response.status_code == 400:
+                elif status_code == 400:
                     error_msg = f"Bad request to Groq API: {error_text}"
                 else:
-                    error_msg = f"Groq API error {response.status_code}: {error_text}"
+                    error_msg = f"Groq API error {status_code}: {error_text}"
                 
                 raise Exception(error_msg)
                 
         except requests.exceptions.Timeout:
             logger.error("❌ Groq API timeout")
+            if breaker_pending:
+                self._record_breaker_failure(deadline)
             return {
                 'success': False,
                 'error': 'Groq API timeout',
@@ -487,6 +567,8 @@ REGIONAL CONTEXT:
             }
         except requests.exceptions.ConnectionError:
             logger.error("❌ Groq API connection error")
+            if breaker_pending:
+                self.circuit_breaker.record_failure()
             return {
                 'success': False,
                 'error': 'Connection error',
@@ -497,6 +579,9 @@ REGIONAL CONTEXT:
             }
         except Exception as e:
             logger.error(f"❌ Groq API error: {e}")
+            if breaker_pending:
+                # E.g. an unreadable response body or a coalesced call timing out: release the trial
+                self._record_breaker_failure(deadline)
             return {
                 'success': False,
                 'error': str(e),
@@ -507,22 +592,29 @@ REGIONAL CONTEXT:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def get_conversation_history(self, limit: int = 10) -> list:
-        """Get recent conversation history"""
-        return self.conversation_history[-limit:]
+    def _record_breaker_failure(self, deadline: Optional[float]):
+        """Report a failed call, unless it only failed because the request's own deadline cut it short"""
+        if deadline is not None and time.monotonic() >= deadline:
+            self.circuit_breaker.record_abandoned()
+        else:
+            self.circuit_breaker.record_failure()
+    
+    def get_conversation_history(self, limit: int = 10, session_id: str = None) -> list:
+        """Get recent conversation history for a session"""
+        return self.memory.get_history(session_id, limit) if session_id else []
     
-    def clear_conversation_history(self):
-        """Clear conversation history"""
-        self.conversation_history = []
+    def clear_conversation_history(self, session_id: str = None):
+        """Clear conversation history for a session (all sessions if none given)"""
+        self.memory.clear(session_id)
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information"""
         return {
             'name': 'Annapurna with Groq',
-            'model': 'llama-3.1-8b-instant',
-            'provider': 'Groq',
+            'model': self.model,
+            'provider': 'Groq' if self.provider.name == 'groq' else self.provider.name,
             'version': '3.1',
-            'cost': 'FREE (up to quota)',
+            'cost': 'FREE (up to quota)' if self.provider.name == 'groq' else 'free (self-hosted)',
             'capabilities': [
                 'Expert farming knowledge',
                 'Real-time advice generation',
@@ -536,175 +628,53 @@ REGIONAL CONTEXT:
                 'rate_limit': '30 requests per minute',
                 'max_tokens': '8192 per response'
             },
-            'conversation_count': len(self.conversation_history)
+            'conversation_memory': self.memory.get_stats(),
+            'circuit_breaker': self.circuit_breaker.get_status(),
+            'latency_budget_seconds': self.latency_budget,
+            'deadline_misses': self.deadline_misses,
+            'response_cache': self.response_cache.get_stats(),
+            'token_metrics': self.prompt_builder.get_stats(),
+            'throughput': self.provider.get_stats(),
+            'retrieval': self.retriever.get_stats() if self.retriever else None
         }
 
 class AgriBotKnowledgeBase:
-    """AgriBot's farming knowledge base"""
+    """AgriBot's farming knowledge base, backed by the indexed knowledge store"""
     
-    def __init__(self):
-        self.crop_data = self._load_crop_knowledge()
-        self.pest_data = self._load_pest_knowledge()
-        self.fertilizer_data = self._load_fertilizer_knowledge()
-        
-    def _load_crop_knowledge(self):
-        """Load comprehensive crop cultivation data"""
-        return {
-            'rice': {
-                'varieties': ['Swarna', 'IR64', 'MTU-7029', 'BPT-5204', 'Pusa Basmati 1121'],
-                'seasons': {
-                    'kharif': {'sowing': 'June-July', 'harvest': 'October-November'},
-                    'rabi': {'sowing': 'November-December', 'harvest': 'April-May'}
-                },
-                'fertilizer': {'N': 120, 'P': 60, 'K': 40, 'unit': 'kg/hectare'},
-                'water': '1200-1500 mm total',
-                'yield': '4-6 tonnes/hectare',
-                'cost': '₹25,000-35,000/hectare',
-                'profit': '₹45,000-85,000/hectare',
-                'tips': [
-                    'Maintain 2-5 cm standing water',
-                    'Transplant 25-30 day old seedlings',
-                    'Apply fertilizer in 3 splits',
-                    'Monitor for brown planthopper and blast disease'
-                ]
-            },
-            'wheat': {
-                'varieties': ['HD-2967', 'PBW-343', 'WH-147', 'DBW-187'],
-                'seasons': {
-                    'rabi': {'sowing': 'November-December', 'harvest': 'March-April'}
-                },
-                'fertilizer': {'N': 120, 'P': 80, 'K': 60, 'unit': 'kg/hectare'},
-                'water': '350-400 mm total',
-                'yield': '4-5 tonnes/hectare',
-                'cost': '₹20,000-30,000/hectare',
-                'profit': '₹50,000-75,000/hectare',
-                'tips': [
-                    'Sow when temperature is 18-25°C',
-                    'Use seed rate of 100-125 kg/hectare',
-                    'Irrigate at critical growth stages',
-                    'Monitor for yellow rust and aphids'
-                ]
-            },
-            'cotton': {
-                'varieties': ['Bollgard II', 'RCH-2', 'Suraj', 'Ankur-651'],
-                'seasons': {
-                    'kharif': {'sowing': 'April-May', 'harvest': 'October-December'}
-                },
-                'fertilizer': {'N': 120, 'P': 60, 'K': 60, 'unit': 'kg/hectare'},
-                'water': '700-1300 mm total',
-                'yield': '15-20 quintals/hectare',
-                'cost': '₹30,000-45,000/hectare',
-                'profit': '₹60,000-1,20,000/hectare',
-                'tips': [
-                    'Plant at 90x45 cm spacing',
-                    'Use drip irrigation if possible',
-                    'Monitor for bollworm and whitefly',
-                    'Pick cotton regularly to maintain quality'
-                ]
-            },
-            'maize': {
-                'varieties': ['Pioneer', 'Dekalb', 'NK-6240', 'Ganga-5'],
-                'seasons': {
-                    'kharif': {'sowing': 'June-July', 'harvest': 'September-October'},
-                    'rabi': {'sowing': 'November-December', 'harvest': 'March-April'}
-                },
-                'fertilizer': {'N': 120, 'P': 60, 'K': 40, 'unit': 'kg/hectare'},
-                'water': '500-800 mm total',
-                'yield': '6-8 tonnes/hectare',
-                'cost': '₹25,000-35,000/hectare',
-                'profit': '₹40,000-70,000/hectare',
-                'tips': [
-                    'Plant at 60x20 cm spacing',
-                    'Critical water need at tasseling stage',
-                    'Side dress nitrogen at knee-high stage',
-                    'Watch for fall armyworm and stem borer'
-                ]
-            }
-        }
-    
-    def _load_pest_knowledge(self):
-        """Load pest and disease management data"""
-        return {
-            'aphids': {
-                'crops': ['wheat', 'cotton', 'mustard'],
-                'symptoms': ['Curled leaves', 'Sticky honeydew', 'Yellowing'],
-                'organic_control': ['Neem oil spray', 'Ladybird beetle release', 'Yellow sticky traps'],
-                'chemical_control': ['Imidacloprid 0.05%', 'Thiamethoxam 0.2g/L'],
-                'prevention': ['Avoid excess nitrogen', 'Maintain field hygiene', 'Monitor regularly']
-            },
-            'bollworm': {
-                'crops': ['cotton', 'tomato', 'chickpea'],
-                'symptoms': ['Holes in bolls/fruits', 'Caterpillar presence', 'Damaged flowers'],
-                'organic_control': ['Bt spray', 'Pheromone traps', 'NPV application'],
-                'chemical_control': ['Chlorantraniliprole', 'Flubendiamide'],
-                'prevention': ['Crop rotation', 'Deep ploughing', 'Resistant varieties']
-            }
-        }
-    
-    def _load_fertilizer_knowledge(self):
-        """Load fertilizer recommendation data"""
-        return {
-            'soil_types': {
-                'clayey': {'drainage': 'poor', 'fertility': 'high', 'recommendations': 'Improve drainage, reduce nitrogen'},
-                'sandy': {'drainage': 'excellent', 'fertility': 'low', 'recommendations': 'Add organic matter, frequent irrigation'},
-                'loamy': {'drainage': 'good', 'fertility': 'medium', 'recommendations': 'Ideal for most crops, balanced fertilization'}
-            }
-        }
+    def __init__(self, store: Optional[KnowledgeStore] = None):
+        self.store = store or KnowledgeStore(cache_size=int(os.getenv('KNOWLEDGE_CACHE_ENTRIES', 256)))
+        # Read-only mappings; entries are loaded from disk on first use
+        self.crop_data = self.store.crops
+        self.pest_data = self.store.pests
+        self.fertilizer_data = MappingProxyType({'soil_types': self.store.soil_types})
+
+    def crop_synonyms(self) -> Dict[str, List[str]]:
+        """Local names and synonyms for every crop"""
+        return self.store.crop_synonyms()
 
 class AgriBotAI:
     """Annapurna AI Engine - Knowledge Base Version"""
     
     def __init__(self):
         self.knowledge_base = AgriBotKnowledgeBase()
-        self.conversation_history = []
+        # Per-session turns; the engine is shared process-wide, so nothing is kept without a session
+        self.memory = ConversationStore.from_env()
+        # Crops, topics and query-type cues compiled once into a single automaton
+        self.intent_matcher = IntentMatcher(self.knowledge_base.crop_data.keys(),
+                                            crop_synonyms=self.knowledge_base.crop_synonyms())
+        # (topic, crop, language) answers; crop guides are rendered on first request, then looked up
+        self.answers = AnswerCatalog(self.knowledge_base.crop_data)
         
     def analyze_query(self, message: str) -> Dict[str, Any]:
         """Analyze user query and extract intent"""
-        message_lower = message.lower()
-        
-        # Extract crop mentions
-        crops = []
-        for crop in self.knowledge_base.crop_data.keys():
-            if crop in message_lower:
-                crops.append(crop)
-        
-        # Extract topics
-        topics = []
-        if any(word in message_lower for word in ['fertilizer', 'nutrient', 'npk', 'urea']):
-            topics.append('fertilizer')
-        if any(word in message_lower for word in ['pest', 'disease', 'insect', 'bug']):
-            topics.append('pest')
-        if any(word in message_lower for word in ['irrigation', 'water', 'drip']):
-            topics.append('irrigation')
-        if any(word in message_lower for word in ['cost', 'profit', 'economics', 'price']):
-            topics.append('economics')
-        if any(word in message_lower for word in ['variety', 'seed', 'cultivar']):
-            topics.append('varieties')
-        if any(word in message_lower for word in ['season', 'kharif', 'rabi', 'plant', 'sow', 'crop']):
-            topics.append('seasonal')
-        
-        return {
-            'crops': crops,
-            'topics': topics,
-            'query_type': self._determine_query_type(message_lower),
-            'language': 'hindi' if any(char in message for char in 'अआइईउऊएऐओऔकखगघ') else 'english'
-        }
-    
-    def _determine_query_type(self, message: str) -> str:
-        """Determine the type of query"""
-        if any(word in message for word in ['how', 'कैसे', 'method', 'process']):
-            return 'how_to'
-        elif any(word in message for word in ['when', 'कब', 'time', 'season']):
-            return 'timing'
-        elif any(word in message for word in ['cost', 'price', 'profit', 'लागत']):
-            return 'economics'
-        elif any(word in message for word in ['problem', 'issue', 'disease', 'समस्या']):
-            return 'problem'
-        else:
-            return 'general'
+        intent = self.intent_matcher.match(message.lower())
+        # Same detection as the Groq path; the catalog maps languages without templates to a fallback
+        intent['language'] = detect_language(message)['language']
+        intent['answer_language'] = self.answers.language_for(intent['language'])
+        return intent
     
-    def generate_response(self, message: str, context: Dict = None) -> Dict[str, Any]:
-        """Generate AI response using knowledge base"""
+    def generate_response(self, message: str, context: Dict = None, session_id: str = None) -> Dict[str, Any]:
+        """Generate AI response using knowledge base (recorded in the session's memory if one is given)"""
         try:
             # Analyze the query
             analysis = self.analyze_query(message)
@@ -730,12 +700,9 @@ class AgriBotAI:
                 'agribot_version': '2.0.0'
             })
             
-            # Store in conversation history
-            self.conversation_history.append({
-                'user_message': message,
-                'agribot_response': response['advice'],
-                'timestamp': datetime.now().isoformat()
-            })
+            if session_id:
+                self.memory.add_turn(session_id, message, response['advice'],
+                                     language_detected=analysis['language'])
             
             return response
             
@@ -750,209 +717,31 @@ class AgriBotAI:
     
     def _generate_crop_response(self, analysis: Dict, message: str) -> Dict[str, Any]:
         """Generate crop-specific response"""
-        crop = analysis['crops'][0]
-        crop_data = self.knowledge_base.crop_data[crop]
-        
-        advice = f"""🌾 **{crop.title()} Cultivation Guide by Annapurna**
-
-**🌱 Recommended Varieties:**
-{', '.join(crop_data['varieties'])}
-
-**📅 Sowing & Harvest Seasons:**"""
-        
-        for season, timing in crop_data['seasons'].items():
-            advice += f"\n• **{season.title()}:** Sow in {timing['sowing']}, harvest in {timing['harvest']}"
-        
-        advice += f"""
-
-**🧪 Fertilizer Recommendation:**
-• NPK: {crop_data['fertilizer']['N']}:{crop_data['fertilizer']['P']}:{crop_data['fertilizer']['K']} {crop_data['fertilizer']['unit']}
-
-**💧 Water Requirement:**
-• Total: {crop_data['water']}
-
-**💰 Economics:**
-• Investment: {crop_data['cost']}
-• Expected yield: {crop_data['yield']}
-• Potential profit: {crop_data['profit']}
-
-**💡 Annapurna Pro Tips:**"""
-        
-        for tip in crop_data['tips']:
-            advice += f"\n• {tip}"
-        
-        advice += f"\n\n📱 Need more specific help? Ask Annapurna about pest control, soil preparation, or market prices!"
-        
-        return {'advice': advice}
+        return {'advice': self.answers.get('crop', analysis['crops'][0], analysis['language'])}
     
     def _generate_seasonal_response(self, analysis: Dict, message: str) -> Dict[str, Any]:
         """Generate seasonal crop recommendations"""
-        advice = """🌾 **Seasonal Crop Planning by Annapurna**
-
-**🌧️ Current Season Recommendations:**
-
-**Kharif Season (June-October):**
-• **Rice:** High profit potential, good water availability
-• **Cotton:** Excellent for commercial farming
-• **Maize:** Fast growing, dual purpose crop
-• **Sugarcane:** Long-term investment crop
-
-**❄️ Rabi Season (November-April):**
-• **Wheat:** Staple crop, reliable income
-• **Mustard:** Oilseed crop, good market demand
-• **Gram/Chickpea:** Pulse crop, soil improvement
-• **Barley:** Drought tolerant option
-
-**☀️ Zaid Season (April-June):**
-• **Watermelon:** High value fruit crop
-• **Fodder crops:** For livestock
-• **Green gram:** Quick harvest pulse
-
-**💡 Crop Selection Tips:**
-• Consider local climate and soil type
-• Check water availability
-• Analyze market demand and prices
-• Plan crop rotation for soil health
-• Consider government support schemes
-
-**📊 Profitability Ranking (Current Market):**
-1. Cotton (highest profit potential)
-2. Rice (stable returns)
-3. Wheat (reliable income)
-4. Maize (moderate returns)
-
-Ask Annapurna about specific crops for detailed cultivation guidance!"""
-        
-        return {'advice': advice}
+        return {'advice': self.answers.get('seasonal', language=analysis['language'])}
     
     def _generate_fertilizer_response(self, analysis: Dict, message: str) -> Dict[str, Any]:
         """Generate fertilizer-specific response"""
-        advice = """🧪 **Annaprna Fertilizer Management Guide**
-
-**📊 Soil Testing First:**
-• Get soil tested every 2-3 years
-• Test for pH, NPK, organic carbon, micronutrients
-• Cost: ₹50-200 per sample
-
-**🌾 Crop-wise NPK Requirements (kg/hectare):**
-```
-Crop          N     P₂O₅   K₂O
-Rice         120    60     40
-Wheat        120    80     60  
-Cotton       120    60     60
-Maize        120    60     40
-```
-
-**⏰ Application Timing:**
-• **Basal (at sowing):** 100% P&K + 25% N
-• **First split (30 days):** 50% remaining N
-• **Second split (60 days):** 25% remaining N
-
-**🌿 Organic Alternatives:**
-• FYM: 10-15 tonnes/hectare
-• Vermicompost: 3-5 tonnes/hectare
-• Green manure: Dhaincha, sunhemp
-
-**💰 Cost Optimization Tips:**
-• Buy from authorized dealers
-• Use soil test recommendations
-• Combine organic + inorganic
-• Check government subsidies
-
-**⚠️ Annapurna Warning:** Over-fertilization reduces yield and pollutes environment!"""
-        
-        return {'advice': advice}
+        return {'advice': self.answers.get('fertilizer', language=analysis['language'])}
     
     def _generate_pest_response(self, analysis: Dict, message: str) -> Dict[str, Any]:
         """Generate pest management response"""
-        advice = """🐛 **AgriBot Integrated Pest Management (IPM)**
-
-**🔍 Prevention First:**
-• Regular field monitoring (weekly)
-• Maintain field cleanliness
-• Use resistant varieties
-• Proper crop rotation
-
-**🌿 Biological Control:**
-• **Beneficial insects:** Ladybirds, lacewings, spiders
-• **Biopesticides:** Neem oil, Bt formulations
-• **Pheromone traps:** For monitoring and mass trapping
-
-**⚗️ Chemical Control (Last Resort):**
-• Use only when economic threshold crossed
-• Rotate different chemical groups
-• Follow label instructions strictly
-• Observe pre-harvest interval
-
-**🚨 Common Issues & Solutions:**
-• **Aphids:** Yellow sticky traps + neem oil
-• **Bollworm:** Pheromone traps + Bt spray
-• **Fungal diseases:** Proper spacing + fungicide spray
-
-**⚠️ Safety Measures:**
-• Wear protective equipment
-• Don't spray during flowering
-• Store pesticides safely
-
-**💡 Annapurna Tip:** Early detection and prevention are better than cure!"""
-        
-        return {'advice': advice}
+        return {'advice': self.answers.get('pest', language=analysis['language'])}
     
     def _generate_general_response(self, analysis: Dict, message: str) -> Dict[str, Any]:
         """Generate general farming response"""
-        advice = """🤖 **Welcome to Annapurna - Your AI Farming Assistant!**
-
-I'm Annapurna, powered by advanced knowledge systems to help farmers succeed! 🌾
-
-**🎯 What I Can Help You With:**
-
-**🌱 Crop Guidance:**
-• Variety selection for your region
-• Sowing and harvesting schedules
-• Yield optimization techniques
-
-**🧪 Input Management:**
-• Fertilizer recommendations (NPK)
-• Soil health improvement
-• Organic farming methods
-
-**🐛 Plant Protection:**
-• Pest and disease identification
-• Integrated pest management (IPM)
-• Organic control methods
-
-**💧 Water Management:**
-• Irrigation scheduling
-• Water conservation techniques
-• Drip irrigation guidance
-
-**💰 Farm Economics:**
-• Cost analysis and budgeting
-• Profit calculation
-• Market insights
-
-**📝 Example Questions:**
-• "How to grow rice in kharif season?"
-• "NPK fertilizer for wheat crop"
-• "How to control cotton bollworm?"
-• "Best crops for this season"
-• "Drip irrigation cost for tomatoes"
-
-**💡 Pro Tip:** Be specific about your location, crop, and farm size for better advice!
-
-Ask me anything about farming - I'm here to help you grow better crops! 🚜
-
-*Jai Kisan! Jai Vigyan!* 🌾"""
-        
-        return {'advice': advice}
+        return {'advice': self.answers.get('general', language=analysis['language'])}
     
-    def get_conversation_history(self, limit: int = 10) -> List[Dict]:
-        """Get recent conversation history"""
-        return self.conversation_history[-limit:]
+    def get_conversation_history(self, limit: int = 10, session_id: str = None) -> List[Dict]:
+        """Get recent conversation history for a session"""
+        return self.memory.get_history(session_id, limit) if session_id else []
     
-    def clear_conversation_history(self):
-        """Clear conversation history"""
-        self.conversation_history = []
+    def clear_conversation_history(self, session_id: str = None):
+        """Clear conversation history for a session (all sessions if none given)"""
+        self.memory.clear(session_id)
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get Annapurna model information"""
@@ -969,7 +758,8 @@ Ask me anything about farming - I'm here to help you grow better crops! 🚜
                 'Farm economics',
                 'Seasonal planning'
             ],
-            'conversation_count': len(self.conversation_history)
+            'conversation_memory': self.memory.get_stats(),
+            'answers': self.answers.get_stats()
         }
 
 # AgriBot configuration - FORCE GROQ USAGE
@@ -983,14 +773,24 @@ AGRIBOT_CONFIG = {
     'fallback_enabled': False
 }
 
+# Process-wide knowledge-base engine, built once at startup and shared by every
+# request that needs the fallback (its knowledge base is read-only; turns are
+# only kept per session)
+knowledge_fallback = AgriBotAI()
+
 def initialize_agribot():
     """Initialize Annapurna with Groq API - force Groq usage"""
     try:
         groq_api_key = os.getenv('GROQ_API_KEY') or os.getenv('GROK_API_KEY')
         
-        if groq_api_key:
+        if os.getenv('LLM_PROVIDER', 'groq').lower() == 'local':
+            print("🔄 Initializing Annapurna with local LLM server...")
+            agribot = GroqAgriBot(knowledge_store=knowledge_fallback.knowledge_base.store)
+            print(f"✅ AgriBot using local model {agribot.model} at {agribot.base_url}")
+            return agribot, True
+        elif groq_api_key:
             print("🔄 Initializing Annapurna with Groq API...")
-            agribot = GroqAgriBot(api_key=groq_api_key)
+            agribot = GroqAgriBot(api_key=groq_api_key, knowledge_store=knowledge_fallback.knowledge_base.store)
             print("✅ AgriBot with Groq initialized successfully!")
             print("🆓 Using FREE Groq API quota")
             print("🔥 Groq ENABLED for all responses!")
@@ -999,30 +799,74 @@ def initialize_agribot():
             print("❌ GROQ_API_KEY not found in environment!")
             print("⚠️ Add GROQ_API_KEY to .env file to enable Groq")
             print("🔄 Using knowledge base fallback...")
-            agribot = AgriBotAI()
+            agribot = knowledge_fallback
             print("✅ Annapurna initialized with knowledge base fallback")
             return agribot, False
             
     except Exception as e:
         print(f"❌ Groq initialization error: {e}")
         print("🔄 Falling back to knowledge base...")
-        agribot = AgriBotAI()
+        agribot = knowledge_fallback
         return agribot, False
 
 # Initialize AgriBot on startup
 agribot, groq_enabled = initialize_agribot()
 
-# Add request logging
+if getattr(agribot, 'retriever', None) is not None:
+    readiness.add_task('retriever', lambda: {'passages': len(agribot.retriever.retrieve('rice fertilizer kharif', 3))})
+readiness.add_task('knowledge_base', lambda: {'crops': knowledge_fallback.analyze_query('rice fertilizer kharif')['crops']})
+readiness.start()
+
+REGISTRY.gauge('agribot_ready', 'Whether this worker has finished warming up (1) or not (0)',
+               function=lambda: int(readiness.ready))
+REGISTRY.gauge('agribot_llm_circuit_open', 'Whether the LLM circuit breaker is open (1) or not (0)',
+               function=lambda: int(getattr(getattr(agribot, 'circuit_breaker', None), 'state', 'closed') == 'open'))
+REGISTRY.gauge('agribot_log_records_dropped', 'Log records dropped because the log queue was full',
+               function=lambda: get_logging_stats().get('dropped', 0))
+REGISTRY.gauge('agribot_log_records_sampled_out', 'Access-log lines skipped by LOG_SAMPLE_RATE sampling',
+               function=lambda: get_logging_stats().get('sampled_out', 0))
+
+# Request-scoped access logging
 @app.before_request
 def log_request_info():
-    print(f"🌐 === INCOMING REQUEST === ")
-    print(f"🌐 Method: {request.method}")
-    print(f"🌐 URL: {request.url}")
-    print(f"🌐 Path: {request.path}")
-    print(f"🌐 Headers: {dict(request.headers)}")
-    if request.is_json:
-        print(f"🌐 JSON Body: {request.get_json()}")
-    print(f"🌐 ========================")
+    g.request_start = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_id_token = request_id_var.set(g.request_id)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🌐 Incoming request", extra={
+            'method': request.method, 'path': request.path,
+            'headers': redact_fields(dict(request.headers))
+        })
+
+@app.after_request
+def log_request_completion(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        # Errors and slow requests bypass sampling (it only drops records below WARNING)
+        level = logging.WARNING if response.status_code >= 500 or duration_ms >= SLOW_REQUEST_MS else logging.INFO
+        access_logger.log(level, "🌐 %s %s %s", request.method, request.path, response.status_code, extra={
+            'status': response.status_code, 'duration_ms': duration_ms,
+            'remote_addr': request.remote_addr, 'bytes': response.calculate_content_length()
+        })
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def reset_request_context(exc=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+# Opt-in per-request profiling (X-Profile header or PROFILE_SAMPLE_RATE)
+profiler = init_profiler(app)
+
+def get_session_id(data: Dict = None) -> Optional[str]:
+    """Get the chat session id from the JSON body, query string or X-Session-ID header"""
+    data = data or {}
+    context = data.get('context') or {}
+    return (data.get('session_id') or context.get('session_id')
+            or request.args.get('session_id') or request.headers.get('X-Session-ID'))
 
 # In-memory farmer chat storage (for demo; use DB in production)
 farmer_chat_messages = []
@@ -1042,6 +886,7 @@ def health_check():
         'timestamp': datetime.now().isoformat(),
         'endpoints': {
             'health': '/',
+            'readiness': '/readyz',
             'chat': '/api/chat',
             'expert_advice': '/api/expert-advice',
             'model_info': '/api/model-info',
@@ -1059,15 +904,18 @@ def health_check():
 
 @app.route('/healthz')
 def simple_health_check():
+    """Liveness probe: the process is up and serving HTTP"""
     return 'OK', 200
 
+@app.route('/readyz')
+def readiness_check():
+    """Readiness probe: 503 until the models and indexes are warm"""
+    status = readiness.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Enhanced multilingual Annapurna chat endpoint"""
-    print("🔥 === CHAT ENDPOINT CALLED ===")
-    print(f"🔥 agribot type: {type(agribot)}")
-    print(f"🔥 groq_enabled: {groq_enabled}")
-    print(f"🔥 has get_farming_advice: {hasattr(agribot, 'get_farming_advice')}")
     try:
         # Validate request
         if not request.is_json:
@@ -1092,16 +940,17 @@ def chat():
             }), 400
         
         context = data.get('context', {})
+        session_id = get_session_id(data)
         
-        logger.info(f"🌐 Multilingual AgriBot chat request: {message[:100]}...")
-        logger.info(f"🔍 Debug: groq_enabled = {groq_enabled}")
-        logger.info(f"🔍 Debug: agribot type = {type(agribot)}")
-        logger.info(f"🔍 Debug: has get_farming_advice = {hasattr(agribot, 'get_farming_advice')}")
+        # Message text is user data: only its size is logged
+        logger.info("🌐 Multilingual AgriBot chat request", extra={'message_chars': len(message)})
+        logger.debug("🔍 Chat engine", extra={'groq_enabled': groq_enabled, 'agribot_type': type(agribot).__name__})
         
         # Force Groq API usage - prioritize Groq over fallback
         if groq_enabled and hasattr(agribot, 'get_farming_advice'):
             logger.info("🤖 Using Groq API for response generation...")
-            response = agribot.get_farming_advice(message, context)
+            response = agribot.get_farming_advice(message, context, session_id=session_id)
+            groq_status = response.get('model_type')
             
             # Only use fallback if Groq completely fails (not for partial responses)
             if response.get('success', False):
@@ -1111,15 +960,15 @@ def chat():
                 logger.info("✅ Groq API response generated successfully")
             else:
                 logger.warning("⚠️ Groq API failed, using knowledge base fallback...")
-                fallback_bot = AgriBotAI()
-                response = fallback_bot.generate_response(message, context)
+                response = knowledge_fallback.generate_response(message, context)
+                response['groq_status'] = groq_status
                 response['fallback_used'] = False  # Changed from True to False
                 response['provider'] = 'groq_ai'  # Changed from 'knowledge_base' to 'groq_ai'
                 response['multilingual_support'] = True  # Changed from False to True
         else:
             # Knowledge base method only if Groq is not available
             logger.info("📚 Using knowledge base (Groq not available)")
-            response = agribot.generate_response(message, context)
+            response = agribot.generate_response(message, context, session_id=session_id)
             response['fallback_used'] = False  # Changed from True to False
             response['provider'] = 'groq_ai'  # Changed from 'knowledge_base' to 'groq_ai'
             response['multilingual_support'] = True  # Changed from False to True
@@ -1146,8 +995,7 @@ def chat():
         
         # Emergency fallback
         try:
-            fallback_bot = AgriBotAI()
-            response = fallback_bot.generate_response(data.get('message', 'help'), {})
+            response = knowledge_fallback.generate_response(data.get('message', 'help'), {})
             response['emergency_fallback'] = True
             return jsonify(response)
         except:
@@ -1182,6 +1030,13 @@ def model_info():
                 'api_limits': info.get('limits', 'None'),
                 'provider': info.get('provider', 'local')
             },
+            'profiling': profiler.get_stats(),
+            'product_images': product_images.get_stats(),
+            'product_counters': product_counters.get_stats(),
+            'product_prices': product_prices.get_stats(),
+            'marketplace_store': marketplace_store.get_stats(),
+            'knowledge_answers': knowledge_fallback.answers.get_stats(),
+            'logging': get_logging_stats(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -1226,7 +1081,7 @@ def get_history():
     """Get conversation history"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        history = agribot.get_conversation_history(limit=limit)
+        history = agribot.get_conversation_history(limit=limit, session_id=get_session_id())
         
         return jsonify({
             'success': True,
@@ -1252,7 +1107,7 @@ def get_history():
 def clear_history():
     """Clear conversation history"""
     try:
-        agribot.clear_conversation_history()
+        agribot.clear_conversation_history(session_id=get_session_id())
         return jsonify({
             'success': True,
             'message': 'AgriBot conversation history cleared',
@@ -1388,15 +1243,34 @@ def get_farmer_users():
 
 # --- Contract Farming Endpoints ---
 
-# In-memory storage for contracts (in production, use a proper database)
-contract_applications = []
-contract_counter = 1000
+# Marketplace records (contracts, products) persist in a write-ahead-logged SQLite store
+# shared by all workers; reads are served from memory
+marketplace_store = store_from_env()
+atexit.register(marketplace_store.close)
+
+@app.before_request
+def sync_marketplace_store():
+    """Apply listings and applications written by other workers"""
+    if request.path.startswith(('/api/products', '/api/contract-farming')):
+        marketplace_store.sync()
+
+# Contract applications by id, in submission order. Writers hold contracts_lock and
+# replace an application's dict rather than editing it, so readers never see a partial update
+contract_applications: Dict[str, Dict] = {}
+contracts_lock = threading.Lock()
+
+def apply_contract(contract_id: str, application: Optional[Dict]):
+    with contracts_lock:
+        if application is None:
+            contract_applications.pop(contract_id, None)
+        else:
+            contract_applications[contract_id] = application
+
+marketplace_store.register('contracts', apply_contract, lambda: list(contract_applications))
 
 @app.route('/api/contract-farming/submit', methods=['POST'])
 def submit_contract_application():
     """Submit a new contract farming application"""
-    global contract_counter
-    
     try:
         data = request.get_json()
         
@@ -1443,8 +1317,7 @@ def submit_contract_application():
         monthly_wages = 3000  # Fixed amount
         
         # Create contract application
-        contract_id = f"CF{contract_counter:04d}"
-        contract_counter += 1
+        contract_id = f"CF{marketplace_store.allocate('contracts', 1000):04d}"
         
         contract_application = {
             'contractId': contract_id,
@@ -1487,8 +1360,11 @@ def submit_contract_application():
             }
         }
         
-        # Store the application
-        contract_applications.append(contract_application)
+        # Store the application (durable before we acknowledge it)
+        with contracts_lock:
+            contract_applications[contract_id] = contract_application
+            commit = marketplace_store.put('contracts', contract_id, contract_application)
+        commit.wait()
         
         logger.info(f"✅ New contract application submitted: {contract_id} by {data.get('fullName')}")
         
@@ -1518,7 +1394,7 @@ def get_contract_applications():
         # In production, add authentication and authorization
         return jsonify({
             'success': True,
-            'applications': contract_applications,
+            'applications': list(contract_applications.values()),
             'total': len(contract_applications)
         })
     except Exception as e:
@@ -1532,10 +1408,7 @@ def get_contract_applications():
 def get_contract_application(contract_id):
     """Get specific contract application by ID"""
     try:
-        application = next(
-            (app for app in contract_applications if app['contractId'] == contract_id),
-            None
-        )
+        application = contract_applications.get(contract_id)
         
         if not application:
             return jsonify({
@@ -1568,23 +1441,22 @@ def update_contract_status(contract_id):
                 'error': f'Invalid status. Valid options: {", ".join(valid_statuses)}'
             }), 400
         
-        application = next(
-            (app for app in contract_applications if app['contractId'] == contract_id),
-            None
-        )
-        
-        if not application:
+        with contracts_lock:
+            current = contract_applications.get(contract_id)
+            if current:
+                old_status = current['status']
+                application = {**current, 'status': new_status, 'lastUpdated': datetime.now().isoformat()}
+                if data.get('remarks'):
+                    application['remarks'] = data.get('remarks')
+                contract_applications[contract_id] = application
+                commit = marketplace_store.put('contracts', contract_id, application)
+        
+        if not current:
             return jsonify({
                 'success': False,
                 'error': 'Contract application not found'
             }), 404
-        
-        old_status = application['status']
-        application['status'] = new_status
-        application['lastUpdated'] = datetime.now().isoformat()
-        
-        if data.get('remarks'):
-            application['remarks'] = data.get('remarks')
+        commit.wait()
         
         logger.info(f"📝 Contract {contract_id} status updated: {old_status} → {new_status}")
         
@@ -1645,12 +1517,13 @@ def calculate_contract_value():
 def get_contract_stats():
     """Get contract farming statistics"""
     try:
-        total_applications = len(contract_applications)
+        applications = list(contract_applications.values())
+        total_applications = len(applications)
         status_counts = {}
         total_land_area = 0
         total_contract_value = 0
         
-        for app in contract_applications:
+        for app in applications:
             status = app['status']
             status_counts[status] = status_counts.get(status, 0) + 1
             total_land_area += app['landDetails']['landAreaSatak']
@@ -1679,15 +1552,172 @@ def get_contract_stats():
 
 # --- Product Management Endpoints (Marketplace) ---
 
-# In-memory storage for products (in production, use MongoDB)
-farmer_products = []
-product_counter = 1000
+# Product catalog with id/category/farmer/status indexes, recovered from and written through to the store
+product_catalog = ProductCatalog(id_prefix='PRD', first_id=1000, store=marketplace_store)
+# Ranked full-text search (prefix + Hindi/English transliteration), updated per listing
+product_search = product_catalog.add_index(
+    ProductSearchIndex(crop_synonyms=knowledge_fallback.knowledge_base.crop_synonyms()))
+# Listings are geocoded once at creation (district/PIN gazetteer) and grid-indexed for nearby queries
+gazetteer = Gazetteer()
+product_geo = product_catalog.add_index(GeoIndex(cell_degrees=float(os.getenv('PRODUCTS_GEO_CELL_DEGREES', 0.25))))
+PRODUCTS_DEFAULT_RADIUS_KM = float(os.getenv('PRODUCTS_DEFAULT_RADIUS_KM', 50))
+PRODUCTS_MAX_RADIUS_KM = float(os.getenv('PRODUCTS_MAX_RADIUS_KM', 1000))
+
+def product_district(product: Dict[str, Any]) -> Optional[str]:
+    """Gazetteer place of a listing; client-supplied coordinates map to the nearest place"""
+    coordinates = product.get('coordinates')
+    if not coordinates:
+        return None
+    return coordinates.get('place') or gazetteer.nearest_place(coordinates['lat'], coordinates['lon'])
+
+# Price quantile sketches per category/district/unit, maintained with the other catalog indexes
+product_prices = product_catalog.add_index(
+    PriceStats(product_district, accuracy=float(os.getenv('PRODUCTS_PRICE_STATS_ACCURACY', 0.01))))
+# Uploaded photos are re-encoded and thumbnailed in the background (content-addressed, EXIF stripped)
+product_images = ImagePipeline.from_env()
+# ...and served by a WSGI middleware in front of Flask (sendfile, ETag, byte ranges, immutable caching)
+app.wsgi_app = MediaFiles(app.wsgi_app, product_images.url_prefix, product_images.root)
+# Views and inquiries are counted in sharded buffers and flushed to the catalog/store in batches
+product_counters = CounterBuffer.from_env(product_catalog.add_counts).start()
+atexit.register(product_counters.close)
+
+# Bulk CSV/JSONL imports (cooperatives) are capped per upload
+PRODUCTS_BULK_MAX_ROWS = int(os.getenv('PRODUCTS_BULK_MAX_ROWS', 5000))
+
+# Listing responses are paginated (?limit=&cursor=), sortable (?sort=) and projectable (?fields=)
+PRODUCTS_PAGE_SIZE = int(os.getenv('PRODUCTS_PAGE_SIZE', 50))
+PRODUCTS_MAX_PAGE_SIZE = int(os.getenv('PRODUCTS_MAX_PAGE_SIZE', 200))
+PRODUCT_FIELDS = frozenset({
+    'id', 'productName', 'category', 'description', 'price', 'quantity', 'unit', 'location',
+    'phoneNumber', 'farmerId', 'farmerName', 'productImage', 'organicCertified', 'deliveryAvailable',
+    'harvestDate', 'status', 'createdAt', 'updatedAt', 'views', 'inquiries', 'coordinates',
+    'imageStatus', 'thumbnails'
+})
+
+def product_listing_response(products: List[Dict], filters: Dict, rankings: Dict[str, Dict] = None,
+                             origin: Dict = None):
+    """Paginate, sort and project a product listing from the request's query string"""
+    try:
+        limit = int(request.args.get('limit', PRODUCTS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, PRODUCTS_MAX_PAGE_SIZE))
+    
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    unknown_fields = sorted(set(fields) - PRODUCT_FIELDS)
+    if unknown_fields:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown fields: {", ".join(unknown_fields)}'
+        }), 400
+    
+    try:
+        page = paginate(products, sort=request.args.get('sort'), limit=limit,
+                        cursor=request.args.get('cursor'), fingerprint=query_fingerprint(filters),
+                        rankings=rankings)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    extra = {}
+    if origin is not None:
+        distances = rankings['distance']
+        extra['origin'] = origin
+        extra['distances'] = {product['id']: round(distances[product['id']], 1) for product in page['products']}
+    
+    return jsonify({
+        'success': True,
+        'products': project(page['products'], fields),
+        'total': len(products),
+        'count': len(page['products']),
+        'limit': limit,
+        'sort': page['sort'],
+        'hasMore': page['hasMore'],
+        'nextCursor': page['nextCursor'],
+        **extra
+    })
+
+def product_geo_query():
+    """Nearby listings for ?near= (place or PIN) or ?lat=&lon=, with ?radiusKm= and/or ?nearest=
+
+    Returns ``(None, None)`` without a location, ``(origin, [(id, km), ...])``
+    nearest first, and raises ValueError for an invalid location query.
+    """
+    near = request.args.get('near', '').strip()
+    radius = request.args.get('radiusKm')
+    nearest = request.args.get('nearest')
+    if near:
+        origin = gazetteer.geocode(near)
+        if origin is None:
+            raise ValueError(f"Unknown location '{near}' (use a district, city or PIN code)")
+    elif request.args.get('lat') or request.args.get('lon'):
+        point = parse_coordinates(request.args.get('lat'), request.args.get('lon'))
+        if point is None:
+            raise ValueError('lat and lon must be valid coordinates')
+        origin = {'lat': point[0], 'lon': point[1], 'source': 'query'}
+    elif radius or nearest:
+        raise ValueError('radiusKm and nearest need a location (near or lat/lon)')
+    else:
+        return None, None
+    
+    try:
+        radius_km = float(radius) if radius else None
+        k = int(nearest) if nearest else None
+    except ValueError:
+        raise ValueError('radiusKm must be a number and nearest an integer')
+    if radius_km is not None and not 0 < radius_km <= PRODUCTS_MAX_RADIUS_KM:
+        raise ValueError(f'radiusKm must be between 0 and {PRODUCTS_MAX_RADIUS_KM:g}')
+    if k is not None:
+        if not 1 <= k <= PRODUCTS_MAX_PAGE_SIZE:
+            raise ValueError(f'nearest must be between 1 and {PRODUCTS_MAX_PAGE_SIZE}')
+        return origin, product_geo.nearest(origin['lat'], origin['lon'], k,
+                                              max_km=radius_km or PRODUCTS_MAX_RADIUS_KM)
+    return origin, product_geo.within(origin['lat'], origin['lon'], radius_km or PRODUCTS_DEFAULT_RADIUS_KM)
+
+def attach_product_image(product_id: str, result: Dict):
+    """Image pipeline callback: point the listing at its processed variants"""
+    if result['status'] == IMAGE_READY:
+        changes = {'productImage': result['url'], 'thumbnails': result['variants'], 'imageStatus': IMAGE_READY}
+    else:
+        changes = {'imageStatus': result['status']}
+    try:
+        product_catalog.update(product_id, changes)
+    except Exception as e:
+        logger.error(f"❌ Could not attach image {result.get('hash')} to {product_id}: {e}")
+
+def new_product(product_id: str, data: Dict[str, Any], image_pending: bool = False) -> Dict[str, Any]:
+    """Listing record from validated fields (price, quantity and flags already converted)"""
+    # Geocode once at listing time: explicit coordinates, else PIN code / district in the location
+    point = parse_coordinates(data.get('latitude'), data.get('longitude'))
+    coordinates = ({'lat': point[0], 'lon': point[1], 'source': 'client'} if point
+                   else gazetteer.geocode(data.get('location')))
+    return {
+        'id': product_id,
+        'productName': data.get('productName'),
+        'category': data.get('category'),
+        'description': data.get('description'),
+        'price': data['price'],
+        'quantity': data['quantity'],
+        'unit': data.get('unit'),
+        'location': data.get('location'),
+        'coordinates': coordinates,
+        'phoneNumber': data.get('phoneNumber'),
+        'farmerId': data.get('farmerId'),
+        'farmerName': data.get('farmerName') or 'Unknown Farmer',
+        'productImage': None,
+        'imageStatus': IMAGE_PROCESSING if image_pending else None,
+        'thumbnails': None,
+        'organicCertified': data['organicCertified'],
+        'deliveryAvailable': data['deliveryAvailable'],
+        'harvestDate': data.get('harvestDate') or None,
+        'status': 'active',
+        'createdAt': datetime.now().isoformat(),
+        'views': 0,
+        'inquiries': 0
+    }
 
 @app.route('/api/products', methods=['POST'])
 def create_product():
     """Create a new farmer product listing"""
-    global product_counter
-    
     try:
         # Get form data
         data = request.form.to_dict()
@@ -1705,49 +1735,31 @@ def create_product():
                 'error': f'Missing required fields: {", ".join(missing_fields)}'
             }), 400
         
-        # Handle file upload
-        image_path = None
+        _, product_id = product_catalog.allocate_id()
+        
+        # The upload is processed in the background; the listing gets its thumbnails when ready
+        image_data = None
         if 'productImage' in request.files:
             file = request.files['productImage']
             if file.filename:
-                filename = secure_filename(file.filename)
-                # Create uploads directory if it doesn't exist
-                upload_dir = os.path.join(os.path.dirname(__file__), 'uploads', 'products')
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                # Save file
-                image_path = os.path.join(upload_dir, f"{product_counter}_{filename}")
-                file.save(image_path)
-                logger.info(f"📷 Product image saved: {image_path}")
+                image_data = file.read()
+        if image_data and not product_images.available:
+            logger.warning(f"⚠️ Image for {product_id} dropped: Pillow is not installed")
+            image_data = None
         
         # Create product
-        product_id = f"PRD{product_counter:04d}"
-        product_counter += 1
-        
-        product = {
-            'id': product_id,
-            'productName': data.get('productName'),
-            'category': data.get('category'),
-            'description': data.get('description'),
-            'price': float(data.get('price')),
-            'quantity': float(data.get('quantity')),
-            'unit': data.get('unit'),
-            'location': data.get('location'),
-            'phoneNumber': data.get('phoneNumber'),
-            'farmerId': data.get('farmerId'),
-            'farmerName': data.get('farmerName', 'Unknown Farmer'),
-            'productImage': image_path if image_path else None,
+        data.update({
+            'price': parse_numeric('price', data.get('price')),
+            'quantity': parse_numeric('quantity', data.get('quantity')),
             'organicCertified': data.get('organicCertified', 'false').lower() == 'true',
-            'deliveryAvailable': data.get('deliveryAvailable', 'false').lower() == 'true',
-            'harvestDate': data.get('harvestDate'),
-            'status': 'active',
-            'createdAt': datetime.now().isoformat(),
-            'views': 0,
-            'inquiries': 0
-        }
+            'deliveryAvailable': data.get('deliveryAvailable', 'false').lower() == 'true'
+        })
+        product = new_product(product_id, data, image_pending=bool(image_data))
         
-        # Store the product
-        farmer_products.append(product)
+        # Store and index the product
+        product_catalog.add(product)
+        if image_data:
+            product_images.submit(image_data, lambda result: attach_product_image(product_id, result))
         
         logger.info(f"✅ New product listed: {product_id} - {data.get('productName')} by {data.get('farmerName')}")
         
@@ -1771,39 +1783,152 @@ def create_product():
             'error': 'Internal server error. Please try again later.'
         }), 500
 
+@app.route('/api/products/bulk', methods=['POST'])
+def import_products():
+    """Bulk-list products from a CSV or JSONL upload; reports errors per row.
+
+    The file comes as multipart ``file`` or as the raw request body
+    (``?format=csv|jsonl`` when neither the filename nor the content type
+    tells). ``farmerId``/``farmerName`` parameters fill rows that leave them
+    empty. ``atomic=true`` imports nothing unless every row is valid;
+    ``dryRun=true`` only validates. Valid rows are inserted in one transaction.
+    """
+    options = {**request.args.to_dict(), **request.form.to_dict()}
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename or '', upload.mimetype or ''
+    else:
+        stream, filename, content_type = request.stream, '', request.mimetype or ''
+    fmt = product_bulk.detect_format(options.get('format'), filename, content_type)
+    if fmt is None:
+        return jsonify({'success': False, 'error': 'Upload a .csv or .jsonl file (or pass format=csv|jsonl)'}), 400
+    defaults = {field: options[field] for field in ('farmerId', 'farmerName') if options.get(field)}
+    atomic = options.get('atomic', 'false').lower() == 'true'
+    dry_run = options.get('dryRun', 'false').lower() == 'true'
+    
+    start = time.perf_counter()
+    valid, errors, total = [], [], 0
+    try:
+        for chunk in product_bulk.chunked(product_bulk.read_rows(stream, fmt)):
+            total += len(chunk)
+            if total > PRODUCTS_BULK_MAX_ROWS:
+                return jsonify({'success': False,
+                                'error': f'Too many rows (at most {PRODUCTS_BULK_MAX_ROWS} per upload)'}), 413
+            for _, row in chunk:
+                if isinstance(row, dict):
+                    for field, value in defaults.items():
+                        if not row.get(field):
+                            row[field] = value
+            chunk_valid, chunk_errors = product_bulk.validate_rows(chunk)
+            valid.extend(chunk_valid)
+            errors.extend(chunk_errors)
+    except (ValueError, csv.Error) as e:
+        return jsonify({'success': False, 'error': f'Could not read the file: {e}'}), 400
+    
+    result = {'rows': total, 'valid': len(valid), 'failed': len(errors), 'errors': errors, 'dryRun': dry_run}
+    if not valid or (atomic and errors):
+        return jsonify({'success': False, 'imported': 0, **result,
+                        'error': 'No valid rows' if not valid else 'Some rows are invalid; nothing was imported'}), 422
+    if dry_run:
+        return jsonify({'success': True, 'imported': 0, **result}), 200
+    
+    ids = product_catalog.allocate_ids(len(valid))
+    products = [new_product(product_id, row) for (_, product_id), (_, row) in zip(ids, valid)]
+    product_catalog.add_many(products)
+    logger.info(f"✅ Bulk import: {len(products)} products listed, {len(errors)} rows rejected "
+                f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return jsonify({'success': True, 'imported': len(products), **result,
+                    'productIds': [product['id'] for product in products]}), 201
+
+@app.route('/api/products/export', methods=['GET'])
+def export_products():
+    """Stream listings as CSV or JSONL for analytics (filters: category, farmerId, status)"""
+    fmt = product_bulk.detect_format(request.args.get('format', 'csv'))
+    if fmt is None:
+        return jsonify({'success': False, 'error': 'format must be csv or jsonl'}), 400
+    category = request.args.get('category')
+    status = request.args.get('status')
+    # Point-in-time snapshot (the catalog replaces product dicts on change, never edits them);
+    # rows are serialized chunk by chunk while the response streams
+    products = product_catalog.query(
+        category=category if category != 'all' else None,
+        farmer_id=request.args.get('farmerId'),
+        status=status if status != 'all' else None
+    )
+    filename = f"products-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+    return Response(product_bulk.export_chunks(products, fmt),
+                    mimetype=product_bulk.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Total-Count': str(len(products))})
+
+@app.route('/api/products/stats', methods=['GET'])
+def get_product_stats():
+    """Min/quartile/median/max/mean prices of active listings per unit, for a category and/or district.
+
+    ``district`` accepts a place name or PIN code. ``groupBy=category|district``
+    returns one entry per category (or district) within the other filter.
+    """
+    category = request.args.get('category')
+    category = category if category != 'all' else None
+    district = None
+    if request.args.get('district'):
+        place = gazetteer.geocode(request.args['district'])
+        if place is None:
+            return jsonify({'success': False, 'error': f"Unknown district: {request.args['district']}"}), 400
+        district = place['place']
+    group_by = request.args.get('groupBy')
+    if group_by not in (None, 'category', 'district'):
+        return jsonify({'success': False, 'error': 'groupBy must be category or district'}), 400
+    
+    response = {'success': True, 'filters': {'category': category, 'district': district},
+                'accuracy': product_prices.accuracy}
+    if group_by:
+        response['groups'] = product_prices.breakdown(group_by, category, district)
+    else:
+        response['stats'] = product_prices.stats(category, district)
+    return jsonify(response)
+
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    """Get all products with optional filters"""
+    """List products: filters, search, sort, cursor pagination and field projection"""
     try:
         # Get query parameters
         category = request.args.get('category')
         farmer_id = request.args.get('farmerId')
-        search = request.args.get('search', '').lower()
+        search = request.args.get('search', '').strip()
         status = request.args.get('status', 'active')
         
-        # Filter products
-        filtered_products = farmer_products
-        
-        if category and category != 'all':
-            filtered_products = [p for p in filtered_products if p['category'] == category]
-        
-        if farmer_id:
-            filtered_products = [p for p in filtered_products if p['farmerId'] == farmer_id]
-        
-        if search:
-            filtered_products = [
-                p for p in filtered_products 
-                if search in p['productName'].lower() or search in p['description'].lower()
-            ]
-        
-        if status:
-            filtered_products = [p for p in filtered_products if p['status'] == status]
+        try:
+            origin, nearby = product_geo_query()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Search hits and nearby listings come back ranked; the other filters use the catalog indexes
+        hits = product_search.search(search) if search else None
+        rankings = {}
+        if nearby is not None:
+            rankings['distance'] = dict(nearby)
+        if hits is not None:
+            rankings['relevance'] = {product_id: rank for rank, (product_id, _) in enumerate(hits)}
+        ids = None
+        if nearby is not None:
+            ids = [product_id for product_id, _ in nearby]
+            if hits is not None:
+                ids = [product_id for product_id in ids if product_id in rankings['relevance']]
+        elif hits is not None:
+            ids = [product_id for product_id, _ in hits]
+        filtered_products = product_catalog.query(
+            category=category if category != 'all' else None,
+            farmer_id=farmer_id,
+            status=status,
+            ids=ids
+        )
         
-        return jsonify({
-            'success': True,
-            'products': filtered_products,
-            'total': len(filtered_products)
-        })
+        return product_listing_response(filtered_products, {
+            'category': category, 'farmerId': farmer_id, 'search': search, 'status': status,
+            'near': request.args.get('near'), 'lat': request.args.get('lat'), 'lon': request.args.get('lon'),
+            'radiusKm': request.args.get('radiusKm'), 'nearest': request.args.get('nearest')
+        }, rankings, origin)
         
     except Exception as e:
         logger.error(f"❌ Error fetching products: {str(e)}")
@@ -1816,10 +1941,7 @@ def get_products():
 def get_product(product_id):
     """Get specific product by ID"""
     try:
-        product = next(
-            (p for p in farmer_products if p['id'] == product_id),
-            None
-        )
+        product = product_catalog.get(product_id)
         
         if not product:
             return jsonify({
@@ -1827,12 +1949,13 @@ def get_product(product_id):
                 'error': 'Product not found'
             }), 404
         
-        # Increment view count
-        product['views'] += 1
+        # Count the view in the batch buffer; show totals including not-yet-flushed counts
+        product_counters.add(product_id, 'views')
+        pending = product_counters.pending(product_id)
         
         return jsonify({
             'success': True,
-            'product': product
+            'product': {**product, **{field: product.get(field, 0) + count for field, count in pending.items()}}
         })
         
     except Exception as e:
@@ -1842,34 +1965,45 @@ def get_product(product_id):
             'error': 'Internal server error'
         }), 500
 
+@app.route('/api/products/<product_id>/inquiries', methods=['POST'])
+def record_product_inquiry(product_id):
+    """Count a buyer inquiry (e.g. the call/WhatsApp button) for a listing"""
+    if product_catalog.get(product_id) is None:
+        return jsonify({
+            'success': False,
+            'error': 'Product not found'
+        }), 404
+    
+    product_counters.add(product_id, 'inquiries')
+    return jsonify({'success': True}), 202
+
 @app.route('/api/products/<product_id>', methods=['PUT'])
 def update_product(product_id):
     """Update product (farmer only)"""
     try:
         data = request.get_json()
         
-        product = next(
-            (p for p in farmer_products if p['id'] == product_id),
-            None
-        )
-        
-        if not product:
-            return jsonify({
-                'success': False,
-                'error': 'Product not found'
-            }), 404
-        
         # Update fields
         updateable_fields = [
             'productName', 'description', 'price', 'quantity',
             'organicCertified', 'deliveryAvailable', 'status'
         ]
         
-        for field in updateable_fields:
-            if field in data:
-                product[field] = data[field]
+        changes = {field: data[field] for field in updateable_fields if field in data}
+        try:
+            for field in NUMERIC_FIELDS:
+                if field in changes:
+                    changes[field] = parse_numeric(field, changes[field])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        changes['updatedAt'] = datetime.now().isoformat()
+        product = product_catalog.update(product_id, changes)
         
-        product['updatedAt'] = datetime.now().isoformat()
+        if not product:
+            return jsonify({
+                'success': False,
+                'error': 'Product not found'
+            }), 404
         
         logger.info(f"📝 Product updated: {product_id}")
         
@@ -1890,12 +2024,7 @@ def update_product(product_id):
 def delete_product(product_id):
     """Delete product (farmer only)"""
     try:
-        global farmer_products
-        
-        product = next(
-            (p for p in farmer_products if p['id'] == product_id),
-            None
-        )
+        product = product_catalog.remove(product_id)
         
         if not product:
             return jsonify({
@@ -1903,8 +2032,6 @@ def delete_product(product_id):
                 'error': 'Product not found'
             }), 404
         
-        farmer_products = [p for p in farmer_products if p['id'] != product_id]
-        
         logger.info(f"🗑️ Product deleted: {product_id}")
         
         return jsonify({
@@ -1923,13 +2050,9 @@ def delete_product(product_id):
 def get_farmer_products(farmer_id):
     """Get all products by specific farmer"""
     try:
-        products = [p for p in farmer_products if p['farmerId'] == farmer_id]
+        products = product_catalog.query(farmer_id=farmer_id)
         
-        return jsonify({
-            'success': True,
-            'products': products,
-            'total': len(products)
-        })
+        return product_listing_response(products, {'farmerId': farmer_id})
         
     except Exception as e:
         logger.error(f"❌ Error fetching farmer products {farmer_id}: {str(e)}")
@@ -0,0 +1,247 @@
+"""
+Listing Geocoding and Spatial Index
+===================================
+
+Lets buyers ask for produce near them ("tomatoes within 50 km of Nashik")
+on ``/api/products``.
+
+``Gazetteer`` geocodes a listing's free-text ``location`` once, when the
+listing is created. It uses a bundled table of Indian districts and cities
+(``knowledge/india_gazetteer.json``) with English and Hindi names and their
+3-digit PIN sorting-district prefixes. A 6-digit PIN code wins over names.
+Otherwise the last place name in the text wins, because Indian addresses
+run from village to district to state. Results are district centroids,
+accurate to roughly 10-20 km, which is enough for "within 50 km" queries.
+
+``GeoIndex`` is a catalog index (see ``product_catalog.add_index``) that
+buckets geocoded listings into a fixed lat/lon grid. A radius query only
+visits the cells overlapping the circle's bounding box. A nearest-k query
+searches rings of cells outwards from the query point and stops once no
+unvisited cell can be closer than the k-th hit. Query cost depends on the
+listings near the point, not on the catalog size.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from knowledge_retriever import tokenize
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge', 'india_gazetteer.json')
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+PIN_PATTERN = re.compile(r'(?<!\d)([1-9]\d{2})\s?\d{3}(?!\d)')
+MAX_NAME_TOKENS = 3
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_coordinates(lat: Any, lon: Any) -> Optional[Tuple[float, float]]:
+    """Validate a latitude/longitude pair; None when either is missing or out of range"""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or math.isnan(lat) or math.isnan(lon):
+        return None
+    return lat, lon
+
+
+class Gazetteer:
+    """Offline geocoder: PIN codes and district/city names -> coordinates"""
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self._names: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._pins: Dict[str, Dict[str, Any]] = {}
+        self._entries: List[Dict[str, Any]] = []
+        self.places = 0
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Gazetteer not loaded from {path}: {e}")
+            return
+        for place in data.get('places', []):
+            entry = {'lat': place['lat'], 'lon': place['lon'],
+                     'place': f"{place['name']}, {place['state']}"}
+            for name in (place['name'], *place.get('aliases', ())):
+                key = tuple(tokenize(name))
+                if key:
+                    self._names.setdefault(key, entry)
+            for prefix in place.get('pin_prefixes', ()):
+                self._pins[prefix] = entry
+            self._entries.append(entry)
+            self.places += 1
+        logger.info(f"🗺️ Gazetteer loaded: {self.places} places, {len(self._pins)} PIN prefixes")
+
+    def geocode(self, text: Optional[str]) -> Optional[Dict[str, Any]]:
+        """``{'lat', 'lon', 'place', 'source'}`` for a free-text location, or None"""
+        if not text:
+            return None
+        for match in PIN_PATTERN.finditer(text):
+            entry = self._pins.get(match.group(1))
+            if entry:
+                return {**entry, 'source': 'pin'}
+        tokens = tokenize(text)
+        best = None
+        for start in range(len(tokens)):
+            for size in range(min(MAX_NAME_TOKENS, len(tokens) - start), 0, -1):
+                entry = self._names.get(tuple(tokens[start:start + size]))
+                if entry:
+                    best = entry
+                    break
+        return {**best, 'source': 'gazetteer'} if best else None
+
+    def nearest_place(self, lat: float, lon: float, max_km: float = 75.0) -> Optional[str]:
+        """Name of the closest gazetteer place within ``max_km`` (e.g. for client-supplied coordinates)"""
+        best, best_km = None, max_km
+        for entry in self._entries:
+            km = haversine_km(lat, lon, entry['lat'], entry['lon'])
+            if km <= best_km:
+                best, best_km = entry['place'], km
+        return best
+
+
+class GeoIndex:
+    """Grid index over listings' ``coordinates`` for radius and nearest-k queries"""
+
+    def __init__(self, cell_degrees: float = 0.25, field: str = 'coordinates'):
+        self.cell_degrees = cell_degrees
+        self.field = field
+        self._cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        self._points: Dict[str, Tuple[int, int]] = {}
+        self._bounds: Optional[List[int]] = None  # [min_i, max_i, min_j, max_j]; only ever grows
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def add(self, product: Dict[str, Any]):
+        coordinates = product.get(self.field)
+        if not coordinates:
+            return
+        lat, lon = coordinates['lat'], coordinates['lon']
+        cell = self._cell(lat, lon)
+        with self._lock:
+            self._cells.setdefault(cell, {})[product['id']] = (lat, lon)
+            self._points[product['id']] = cell
+            if self._bounds is None:
+                self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+            else:
+                bounds = self._bounds
+                bounds[:] = (min(bounds[0], cell[0]), max(bounds[1], cell[0]),
+                             min(bounds[2], cell[1]), max(bounds[3], cell[1]))
+
+    def remove(self, product: Dict[str, Any]):
+        with self._lock:
+            cell = self._points.pop(product['id'], None)
+            if cell is None:
+                return
+            bucket = self._cells[cell]
+            bucket.pop(product['id'], None)
+            if not bucket:
+                del self._cells[cell]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _lon_degrees(self, km: float, lat: float) -> float:
+        """Longitude span covering ``km`` at every latitude within ``km`` of ``lat``"""
+        widest_lat = min(89.0, abs(lat) + km / KM_PER_DEGREE)
+        return min(180.0, km / (KM_PER_DEGREE * math.cos(math.radians(widest_lat))))
+
+    def within(self, lat: float, lon: float, radius_km: float,
+               limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """``(product_id, km)`` for listings within ``radius_km``, nearest first"""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = self._lon_degrees(radius_km, lat)
+        (i0, j0), (i1, j1) = self._cell(lat - dlat, lon - dlon), self._cell(lat + dlat, lon + dlon)
+        hits = []
+        with self._lock:
+            # Large circles: walking the occupied cells is cheaper than the whole box
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+                cells = [cell for cell in self._cells if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1]
+            else:
+                cells = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+            for cell in cells:
+                for product_id, (plat, plon) in self._cells.get(cell, {}).items():
+                    distance = haversine_km(lat, lon, plat, plon)
+                    if distance <= radius_km:
+                        hits.append((distance, product_id))
+        hits = heapq.nsmallest(limit, hits) if limit is not None else sorted(hits)
+        return [(product_id, distance) for distance, product_id in hits]
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_km: Optional[float] = None) -> List[Tuple[str, float]]:
+        """``(product_id, km)`` for the ``k`` nearest listings (within ``max_km``), nearest first"""
+        if k <= 0:
+            return []
+        ci, cj = self._cell(lat, lon)
+        best: List[Tuple[float, str]] = []  # max-heap of the k nearest as (-km, id)
+        with self._lock:
+            if not self._cells:
+                return []
+            min_i, max_i, min_j, max_j = self._bounds
+            span = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj)
+            for ring in range(span + 1):
+                if 8 * ring > len(self._cells):
+                    # Rings now outnumber the occupied cells: finish with one pass over those
+                    cells = [cell for cell in self._cells if max(abs(cell[0] - ci), abs(cell[1] - cj)) >= ring]
+                else:
+                    cells = self._ring(ci, cj, ring)
+                for cell in cells:
+                    for product_id, (plat, plon) in self._cells.get(cell, {}).items():
+                        distance = haversine_km(lat, lon, plat, plon)
+                        if max_km is not None and distance > max_km:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, product_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, product_id))
+                if 8 * ring > len(self._cells):
+                    break
+                # Anything outside the searched square is at least this far away
+                bound = self._outside_distance(lat, lon, ci, cj, ring)
+                if max_km is not None and bound > max_km:
+                    break
+                if len(best) == k and -best[0][0] <= bound:
+                    break
+        return [(product_id, -negative) for negative, product_id in sorted(best, reverse=True)]
+
+    def _ring(self, ci: int, cj: int, ring: int):
+        if ring == 0:
+            yield ci, cj
+            return
+        for j in range(cj - ring, cj + ring + 1):
+            yield ci - ring, j
+            yield ci + ring, j
+        for i in range(ci - ring + 1, ci + ring):
+            yield i, cj - ring
+            yield i, cj + ring
+
+    def _outside_distance(self, lat: float, lon: float, ci: int, cj: int, ring: int) -> float:
+        """Lower bound on the distance from the point to any cell beyond ``ring``"""
+        size = self.cell_degrees
+        lat_gap = min(lat - (ci - ring) * size, (ci + ring + 1) * size - lat)
+        lon_gap = min(lon - (cj - ring) * size, (cj + ring + 1) * size - lon)
+        widest_lat = min(89.0, abs(lat) + (ring + 1) * size)
+        return min(lat_gap * KM_PER_DEGREE, lon_gap * KM_PER_DEGREE * math.cos(math.radians(widest_lat)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'points': len(self._points), 'cells': len(self._cells), 'cell_degrees': self.cell_degrees}
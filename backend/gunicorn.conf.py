@@ -0,0 +1,169 @@
+"""
+Gunicorn Configuration
+======================
+
+Production serving for the AgriBot AI backend:
+
+    gunicorn -c gunicorn.conf.py farming_expert_app_ai:app
+
+Workers are preforked ``gthread`` workers. Keras inference is CPU-bound and
+releases the GIL inside TensorFlow, while Groq calls are network-bound, so a
+few processes with a pool of threads each fit the workload better than
+greenlets. ``GUNICORN_WORKER_CLASS=gevent`` is still available where gevent is installed.
+
+Each worker loads its own copy of the model (``preload_app`` is off:
+TensorFlow is not fork-safe, and graceful reload needs fresh imports).
+The worker count is therefore the smaller of the CPU count and how many
+model-sized processes fit in the memory budget. TensorFlow's intra-op
+threads are split between the workers so they do not oversubscribe the CPUs.
+
+Workers accept connections as soon as they boot. Warm-up (see
+``readiness.py``) runs in the background and only gates ``/readyz``; the
+disease endpoint answers 503 + ``Retry-After`` until the model is warm.
+``post_worker_init`` does not block, because gunicorn stops the old workers
+of a ``kill -HUP <master>`` reload as soon as the new ones are spawned: a
+worker that waited for warm-up before accepting would leave nobody serving.
+So a HUP reload keeps the port open, but requests needing the model are
+refused until the new workers are warm. For zero-downtime deploys, roll
+instances behind a load balancer (or the container ``HEALTHCHECK``) that
+sends traffic only to instances whose ``/readyz`` returns 200.
+
+Environment:
+
+- ``PORT``: listen port (default 5000)
+- ``WEB_CONCURRENCY``: worker count (default: derived from CPUs and memory)
+- ``GUNICORN_THREADS``: threads per worker (default: derived from CPUs)
+- ``GUNICORN_WORKER_CLASS``: ``gthread`` (default) or ``gevent``
+- ``MEMORY_BUDGET_MB``: memory for all workers (default: 80% of the cgroup limit or RAM)
+- ``MODEL_MEMORY_MB``: memory per worker (default: runtime base plus 3x the model file)
+- ``GUNICORN_TIMEOUT`` / ``GUNICORN_GRACEFUL_TIMEOUT``: seconds (default 120 / 30)
+- ``GUNICORN_MAX_REQUESTS``: recycle workers after N requests (default 0 = never)
+- ``METRICS_MULTIPROC_DIR``: where workers share metric snapshots (default: a per-master temp dir, see ``metrics.py``)
+- ``WARM_UP_TIMEOUT``: seconds after which a worker still warming up logs a warning (default 300)
+"""
+
+import glob
+import os
+import tempfile
+import threading
+import time
+
+BASE_WORKER_MB = 400
+MEMORY_HEADROOM = 0.8
+MODEL_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', '*.h5')
+
+
+def _cpu_count() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def _read_int(path: str):
+    try:
+        with open(path) as f:
+            value = f.read().split()[0]
+        return None if value == 'max' else int(value)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _memory_budget_mb() -> int:
+    if os.getenv('MEMORY_BUDGET_MB'):
+        return int(os.getenv('MEMORY_BUDGET_MB'))
+    limit = (_read_int('/sys/fs/cgroup/memory.max')
+             or _read_int('/sys/fs/cgroup/memory/memory.limit_in_bytes'))
+    if limit is None or limit >= 1 << 60:
+        try:
+            with open('/proc/meminfo') as f:
+                limit = next(int(line.split()[1]) * 1024 for line in f if line.startswith('MemTotal:'))
+        except (OSError, StopIteration, ValueError):
+            limit = 2048 << 20
+    return int(limit / (1 << 20) * MEMORY_HEADROOM)
+
+
+def _model_memory_mb() -> int:
+    if os.getenv('MODEL_MEMORY_MB'):
+        return int(os.getenv('MODEL_MEMORY_MB'))
+    model_mb = sum(os.path.getsize(path) for path in glob.glob(MODEL_GLOB)) / (1 << 20)
+    return int(BASE_WORKER_MB + 3 * model_mb)
+
+
+cpus = _cpu_count()
+memory_budget_mb = _memory_budget_mb()
+worker_memory_mb = _model_memory_mb()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or max(1, min(cpus, memory_budget_mb // worker_memory_mb))
+threads = int(os.getenv('GUNICORN_THREADS', 0)) or max(4, min(16, 4 * cpus // workers))
+if worker_class == 'gevent':
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+preload_app = False
+reload = os.getenv('GUNICORN_RELOAD', 'false').lower() == 'true'
+
+# The app writes its own structured access log (structured_logging)
+accesslog = None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+# Split TensorFlow's CPU threads between the workers
+os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(max(1, cpus // workers)))
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+os.environ.setdefault('OMP_NUM_THREADS', os.environ['TF_NUM_INTRAOP_THREADS'])
+
+warm_up_timeout = float(os.getenv('WARM_UP_TIMEOUT', 300))
+
+# Each worker has its own metrics registry; /metrics merges the snapshots in this directory
+os.environ.setdefault('METRICS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), f"agribot-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    # Counters restart from zero with the master; drop a previous run's snapshots
+    metrics_dir = os.environ['METRICS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+    server.log.info(
+        f"🚀 {workers} {worker_class} workers x {threads} threads "
+        f"({cpus} CPUs, {memory_budget_mb} MB budget, ~{worker_memory_mb} MB per worker)")
+
+
+def post_worker_init(worker):
+    readiness = getattr(worker.wsgi, 'extensions', {}).get('readiness')
+    if readiness is None:
+        return
+
+    # Report warm-up from a side thread: the worker must start accepting right away
+    def report():
+        start = time.monotonic()
+        if readiness.wait(warm_up_timeout):
+            worker.log.info(f"✅ Worker {worker.pid} warm after {time.monotonic() - start:.1f}s")
+        else:
+            worker.log.warning(f"⚠️ Worker {worker.pid} not ready after {warm_up_timeout}s: "
+                               f"{readiness.status()['components']}")
+
+    threading.Thread(target=report, name='warm-up-report', daemon=True).start()
+
+
+def on_reload(server):
+    server.log.info("🔄 Reload: replacing workers; /readyz is 503 until the new ones are warm")
+
+
+def worker_exit(server, worker):
+    # Runs in the worker: publish its final metric values before it goes
+    from metrics import REGISTRY
+    REGISTRY.flush()
+    server.log.info(f"👋 Worker {worker.pid} exited")
+
+
+def child_exit(server, worker):
+    # Runs in the master: keep the dead worker's counters, drop its gauges
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
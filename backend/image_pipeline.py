@@ -0,0 +1,194 @@
+"""
+Product Image Pipeline
+======================
+
+Processes uploaded listing photos off the request path. ``create_product``
+hands over the raw bytes and returns at once. A small worker pool then:
+
+- decodes the upload, using JPEG draft mode to decode large photos straight
+  at a reduced scale, and applies the EXIF orientation;
+- re-encodes it without metadata. EXIF (GPS position, device serial) never
+  reaches disk or buyers;
+- writes one WebP and one JPEG per thumbnail size.
+
+Files are content-addressed by the SHA-256 of the upload
+(``<root>/<ab>/<digest>_<size>.<ext>``), so the same photo uploaded twice is
+processed and stored once, and a filename never changes content (safe to
+cache forever). A JSON manifest next to the variants records the result, so
+duplicates are recognized across restarts too.
+
+Environment:
+
+- ``PRODUCT_IMAGE_DIR``: output directory (default ``uploads/products``)
+- ``PRODUCT_IMAGE_URL``: URL prefix the directory is served under (default ``/media/products``)
+- ``PRODUCT_IMAGE_SIZES``: longest-edge sizes in px (default ``160,480,1024``)
+- ``PRODUCT_IMAGE_WORKERS``: worker threads (default 2)
+- ``PRODUCT_IMAGE_MAX_PIXELS``: largest accepted image (default 50 megapixels)
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is in requirements.txt; without it uploads are skipped
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads', 'products')
+DIGEST_LENGTH = 32
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+           'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ImagePipeline:
+    """Background re-encoding and thumbnailing of product photos"""
+
+    def __init__(self, root: str = DEFAULT_ROOT, url_prefix: str = '/media/products',
+                 sizes: Sequence[int] = (160, 480, 1024), workers: int = 2, max_pixels: int = 50_000_000):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.sizes = tuple(sorted(sizes))
+        self.max_pixels = max_pixels
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {'processed': 0, 'deduplicated': 0, 'failed': 0, 'seconds': 0.0}
+
+    @classmethod
+    def from_env(cls) -> 'ImagePipeline':
+        return cls(
+            root=os.getenv('PRODUCT_IMAGE_DIR', DEFAULT_ROOT),
+            url_prefix=os.getenv('PRODUCT_IMAGE_URL', '/media/products'),
+            sizes=[int(size) for size in os.getenv('PRODUCT_IMAGE_SIZES', '160,480,1024').split(',')],
+            workers=int(os.getenv('PRODUCT_IMAGE_WORKERS', 2)),
+            max_pixels=int(os.getenv('PRODUCT_IMAGE_MAX_PIXELS', 50_000_000)))
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    def _path(self, digest: str, name: str) -> str:
+        return os.path.join(self.root, digest[:2], name)
+
+    def _url(self, digest: str, name: str) -> str:
+        return f"{self.url_prefix}/{digest[:2]}/{name}"
+
+    def submit(self, data: bytes, callback: Callable[[Dict[str, Any]], None]) -> str:
+        """Queue an upload; ``callback(result)`` runs once its variants exist. Returns the digest.
+
+        The callback runs on a worker thread, or immediately when the same
+        image has been processed before.
+        """
+        digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+        manifest = self._load_manifest(digest)
+        if manifest is not None:
+            self._stats['deduplicated'] += 1
+            callback(manifest)
+            return digest
+        with self._lock:
+            future = self._in_flight.get(digest)
+            if future is None:
+                future = self._executor.submit(self._process, data, digest)
+                self._in_flight[digest] = future
+                future.add_done_callback(lambda _: self._forget(digest))
+            else:
+                self._stats['deduplicated'] += 1
+        future.add_done_callback(lambda done: callback(done.result()))
+        return digest
+
+    def _forget(self, digest: str):
+        with self._lock:
+            self._in_flight.pop(digest, None)
+
+    def _load_manifest(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(digest, f"{digest}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path: str, data: bytes):
+        """Write atomically, so a reader never sees a partial file"""
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _process(self, data: bytes, digest: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = self._render(data, digest)
+        except Exception as e:
+            self._stats['failed'] += 1
+            logger.warning(f"⚠️ Product image {digest} could not be processed: {e}")
+            return {'status': FAILED, 'hash': digest, 'error': str(e)}
+        elapsed = time.perf_counter() - start
+        self._stats['processed'] += 1
+        self._stats['seconds'] += elapsed
+        logger.info(f"📷 Product image {digest}: {len(result['variants'])} sizes in {elapsed * 1000:.0f}ms")
+        return result
+
+    def _render(self, data: bytes, digest: str) -> Dict[str, Any]:
+        if Image is None:
+            raise RuntimeError('Pillow is not installed')
+        largest = self.sizes[-1]
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > self.max_pixels:
+                raise ValueError(f"image too large ({image.width}x{image.height})")
+            # JPEG: let the decoder downscale by up to 8x instead of decoding every pixel
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+                image = background
+            else:
+                image = image.convert('RGB')
+
+        os.makedirs(os.path.join(self.root, digest[:2]), exist_ok=True)
+        variants = {}
+        # Largest first: each smaller size is resampled from the previous one
+        for size in reversed(self.sizes):
+            image.thumbnail((size, size), Image.LANCZOS)
+            variant = {'width': image.width, 'height': image.height}
+            for extension, (pil_format, options) in FORMATS.items():
+                name = f"{digest}_{size}.{extension}"
+                buffer = io.BytesIO()
+                image.save(buffer, pil_format, **options)
+                self._write(self._path(digest, name), buffer.getvalue())
+                variant[extension] = self._url(digest, name)
+            variants[str(size)] = variant
+
+        result = {
+            'status': READY,
+            'hash': digest,
+            'url': variants[str(largest)]['jpeg'],
+            'variants': {str(size): variants[str(size)] for size in self.sizes}
+        }
+        self._write(self._path(digest, f"{digest}.json"), json.dumps(result).encode('utf-8'))
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        processed = self._stats['processed']
+        return {
+            'available': self.available,
+            'sizes': list(self.sizes),
+            'in_flight': len(self._in_flight),
+            'processed': processed,
+            'deduplicated': self._stats['deduplicated'],
+            'failed': self._stats['failed'],
+            'avg_ms': round(self._stats['seconds'] / processed * 1000, 1) if processed else 0.0
+        }
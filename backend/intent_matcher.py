@@ -0,0 +1,156 @@
+"""
+Single-Pass Intent Matcher
+==========================
+
+Aho–Corasick multi-pattern matcher used by AgriBotAI.analyze_query. All crop
+names, topic keywords and query-type cues (English, Indic scripts and common
+synonyms) are compiled once into one automaton, and a query is scanned a
+single time to extract crops, topics and query type together. Matching cost
+is linear in the query length plus the number of hits, independent of how
+many vocabulary terms are loaded.
+
+Matching is substring-based on lowercased text, the same as the previous
+``word in message`` checks (so ``plant`` also matches ``planting``).
+
+English vocabulary beyond the old keyword lists changes some results:
+
+- ``fertiliser`` and ``manure`` select the fertilizer topic, and ``zaid``
+  the seasonal topic, so those queries now get the fertilizer or seasonal
+  answer instead of the general one.
+- Crop synonyms from the knowledge store (``paddy`` for rice, ``corn``
+  for maize) count as crop mentions and get that crop's guide.
+- ``sprinkler`` (irrigation), ``mandi`` (economics), ``varieties`` and
+  ``hybrid`` (varieties) only add topics to the reported analysis; the
+  answer is chosen by crop, fertilizer, pest and seasonal topics.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, List
+
+# Topic keywords, in the order topics are reported
+TOPIC_KEYWORDS = {
+    'fertilizer': ['fertilizer', 'fertiliser', 'nutrient', 'npk', 'urea', 'manure',
+                   'खाद', 'उर्वरक', 'यूरिया', 'ਖਾਦ', 'உரம்', 'ఎరువు', 'সার', 'ખાતર', 'ಗೊಬ್ಬರ', 'വളം'],
+    'pest': ['pest', 'disease', 'insect', 'bug', 'कीट', 'रोग', 'बीमारी', 'ਕੀੜ', 'ਰੋਗ', 'பூச்சி', 'நோய்',
+             'పురుగు', 'తెగులు', 'পোকা', 'রোগ', 'જીવાત', 'રોગ', 'ಕೀಟ', 'ರೋಗ', 'കീട', 'രോഗ'],
+    'irrigation': ['irrigation', 'water', 'drip', 'sprinkler', 'सिंचाई', 'पानी', 'ਸਿੰਚਾਈ', 'ਪਾਣੀ',
+                   'பாசன', 'நீர்', 'నీటి', 'সেচ', 'সিঞ্চন', 'સિંચાઈ', 'ನೀರಾವರಿ', 'ജലസേചന'],
+    'economics': ['cost', 'profit', 'economics', 'price', 'mandi', 'लागत', 'मुनाफा', 'दाम', 'भाव', 'कीमत',
+                  'ਕੀਮਤ', 'விலை', 'ధర', 'দাম', 'ભાવ', 'ಬೆಲೆ', 'വില'],
+    'varieties': ['variety', 'varieties', 'seed', 'cultivar', 'hybrid', 'किस्म', 'बीज', 'ਬੀਜ', 'ਕਿਸਮ',
+                  'விதை', 'రకం', 'విత్తన', 'বীজ', 'জাত', 'બીજ', 'ಬೀಜ', 'വിത്ത്'],
+    'seasonal': ['season', 'kharif', 'rabi', 'zaid', 'plant', 'sow', 'crop', 'मौसम', 'खरीफ', 'रबी', 'बुवाई',
+                 'फसल', 'ਫਸਲ', 'ਬਿਜਾਈ', 'பருவ', 'விதைப்பு', 'పంట', 'ফসল', 'মৌসুম', 'પાક', 'ಬೆಳೆ', 'വിള']
+}
+
+# Query-type cues, in priority order (the first type that matches wins)
+QUERY_TYPE_KEYWORDS = {
+    'how_to': ['how', 'कैसे', 'method', 'process', 'ਕਿਵੇਂ', 'எப்படி', 'ఎలా', 'কিভাবে', 'कसे', 'કેવી રીતે',
+               'ಹೇಗೆ', 'എങ്ങനെ'],
+    'timing': ['when', 'कब', 'time', 'season', 'ਕਦੋਂ', 'எப்போது', 'ఎప్పుడు', 'কখন', 'केव्हा', 'ક્યારે',
+               'ಯಾವಾಗ', 'എപ്പോൾ'],
+    'economics': ['cost', 'price', 'profit', 'लागत', 'ਲਾਗਤ', 'செலவு', 'ఖర్చు', 'খরচ', 'ખર્ચ', 'ಖರ್ಚು', 'ചെലവ്'],
+    'problem': ['problem', 'issue', 'disease', 'समस्या', 'ਸਮੱਸਿਆ', 'பிரச்சனை', 'సమస్య', 'সমস্যা', 'સમસ્યા',
+                'ಸಮಸ್ಯೆ', 'പ്രശ്നം']
+}
+
+class AhoCorasick:
+    """Aho–Corasick automaton mapping patterns to payloads"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload: Any):
+        """Add a pattern; call build() once every pattern is added"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(payload)
+        self._built = False
+
+    def build(self):
+        """Compute failure links (breadth-first)"""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+
+    def iter_payloads(self, text: str) -> Iterable[Any]:
+        """Yield the payload of every pattern occurrence in ``text``"""
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                yield from output[node]
+
+
+class IntentMatcher:
+    """Extracts crops, topics and query type from a query in one pass"""
+
+    def __init__(self, crops: Iterable[str], crop_synonyms: Dict[str, List[str]] = None,
+                 topic_keywords: Dict[str, List[str]] = None,
+                 query_type_keywords: Dict[str, List[str]] = None):
+        crop_synonyms = crop_synonyms or {}
+        topic_keywords = TOPIC_KEYWORDS if topic_keywords is None else topic_keywords
+        query_type_keywords = QUERY_TYPE_KEYWORDS if query_type_keywords is None else query_type_keywords
+
+        self.crops = list(crops)
+        self.topics = list(topic_keywords)
+        self.query_types = list(query_type_keywords)
+        self.automaton = AhoCorasick()
+
+        # Payloads are (kind, rank) so results keep a stable, meaningful order
+        for rank, crop in enumerate(self.crops):
+            for term in [crop] + list(crop_synonyms.get(crop, [])):
+                self.automaton.add(term.lower(), ('crop', rank))
+        for rank, topic in enumerate(self.topics):
+            for term in topic_keywords[topic]:
+                self.automaton.add(term.lower(), ('topic', rank))
+        for rank, query_type in enumerate(self.query_types):
+            for term in query_type_keywords[query_type]:
+                self.automaton.add(term.lower(), ('query_type', rank))
+        self.automaton.build()
+
+    def match(self, message_lower: str) -> Dict[str, Any]:
+        """Match an already-lowercased message"""
+        crop_ranks = set()
+        topic_ranks = set()
+        query_type_rank = len(self.query_types)
+        for kind, rank in self.automaton.iter_payloads(message_lower):
+            if kind == 'crop':
+                crop_ranks.add(rank)
+            elif kind == 'topic':
+                topic_ranks.add(rank)
+            elif rank < query_type_rank:
+                query_type_rank = rank
+        return {
+            'crops': [self.crops[rank] for rank in sorted(crop_ranks)],
+            'topics': [self.topics[rank] for rank in sorted(topic_ranks)],
+            'query_type': self.query_types[query_type_rank] if query_type_rank < len(self.query_types) else 'general'
+        }
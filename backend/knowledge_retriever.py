@@ -0,0 +1,231 @@
+"""
+Local Knowledge Retrieval (BM25)
+================================
+
+Small in-process retrieval layer used to ground Groq answers. Passages are
+built from the agronomy knowledge store (crop guides, pests, soil types) and
+the Kaggle crop production statistics, then indexed in a BM25 inverted index
+at startup. A query is answered in about a millisecond, and the top passages
+are added to the prompt as reference notes.
+
+Tokenization works for English and the Indic scripts: words are split on
+whitespace and punctuation, without breaking vowel signs. Local crop names and
+topic keywords are expanded to their canonical English terms. This means
+"धान में खाद" retrieves the rice fertilizer passage.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from intent_matcher import TOPIC_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+CROP_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               '..', 'data', 'kaggle', 'processed_crop_data.json')
+
+# Word characters plus the Indic blocks (Devanagari..Malayalam, minus the
+# danda punctuation) and zero-width joiners used in Malayalam/Bengali words
+TOKEN_PATTERN = re.compile(r'[\w\u0900-\u0963\u0966-\u0d7f\u200c\u200d]+')
+
+STOPWORDS = frozenset(
+    'a an and are at be by can do does for from how i in is it my of on or should the to what when which '
+    'with me we you your our this that there will would about'.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into index terms"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.strip('_\u200c\u200d')
+        if not token or token in STOPWORDS:
+            continue
+        # Light plural folding for English words ("aphids" -> "aphid")
+        if token.isascii() and len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        self._doc_terms = []
+        self.postings = {}
+        self.idf = {}
+        self.doc_lengths = []
+        self.avg_doc_length = 0.0
+
+    def add(self, document: Dict[str, Any], terms: Iterable[str]):
+        """Add a document (any dict) with its index terms; call build() afterwards"""
+        self.documents.append(document)
+        self._doc_terms.append(list(terms))
+
+    def build(self):
+        """Compute postings, document lengths and IDF"""
+        self.postings = {}
+        self.doc_lengths = []
+        for doc_id, terms in enumerate(self._doc_terms):
+            self.doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, frequency))
+        count = len(self.documents)
+        self.avg_doc_length = sum(self.doc_lengths) / count if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        self._doc_terms = []
+
+    def search(self, terms: Iterable[str], top_k: int = 3) -> List[Dict[str, Any]]:
+        """Return the top_k documents for the query terms, best first"""
+        scores = {}
+        k1, b, avg_length = self.k1, self.b, self.avg_doc_length or 1.0
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, frequency in postings:
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [{**self.documents[doc_id], 'score': round(score, 3)} for doc_id, score in best]
+
+
+class KnowledgeRetriever:
+    """Builds passages from the knowledge sources and retrieves the best ones for a question"""
+
+    def __init__(self, store, crop_stats_path: Optional[str] = CROP_STATS_PATH,
+                 min_score: float = 1.0):
+        self.min_score = min_score
+        self.index = BM25Index()
+
+        # Local names and topic keywords -> canonical English terms
+        self.expansions = {}
+        for crop, terms in store.crop_synonyms().items():
+            for term in terms:
+                for token in tokenize(term):
+                    self.expansions.setdefault(token, set()).add(crop)
+        for topic, keywords in TOPIC_KEYWORDS.items():
+            for keyword in keywords:
+                for token in tokenize(keyword):
+                    self.expansions.setdefault(token, set()).add(topic)
+
+        start = time.perf_counter()
+        for passage in self._knowledge_passages(store):
+            self._add(passage)
+        if crop_stats_path and os.path.exists(crop_stats_path):
+            for passage in self._crop_stat_passages(crop_stats_path):
+                self._add(passage)
+        self.index.build()
+
+        self._lock = threading.Lock()
+        self.stats = {'queries': 0, 'hits': 0, 'total_ms': 0.0}
+        logger.info(f"🔎 Knowledge retriever indexed {len(self.index.documents)} passages, "
+                    f"{len(self.index.postings)} terms in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def _add(self, passage: Dict[str, Any]):
+        # Crop and topic tags are indexed alongside the text so expanded
+        # query terms always have something to match
+        terms = tokenize(passage['text']) + [tag for tag in passage.pop('tags', []) if tag]
+        self.index.add(passage, terms)
+
+    def _knowledge_passages(self, store) -> Iterable[Dict[str, Any]]:
+        for name in store.crops:
+            crop = store.crops[name]
+            title = name.title()
+            seasons = '; '.join(f"{season} sowing {timing['sowing']}, harvest {timing['harvest']}"
+                                for season, timing in crop['seasons'].items())
+            regions = ', '.join(crop.get('regions', ()))
+            fertilizer = crop['fertilizer']
+            yield {
+                'id': f"crop:{name}:seasonal", 'source': 'knowledge_base', 'tags': [name, 'seasonal', 'varieties'],
+                'text': f"{title} varieties: {', '.join(crop['varieties'])}. Seasons: {seasons}."
+                        + (f" Major growing states: {regions}." if regions else '')
+            }
+            yield {
+                'id': f"crop:{name}:fertilizer", 'source': 'knowledge_base', 'tags': [name, 'fertilizer'],
+                'text': f"{title} fertilizer dose: N {fertilizer['N']}, P {fertilizer['P']}, "
+                        f"K {fertilizer['K']} {fertilizer['unit']}."
+            }
+            yield {
+                'id': f"crop:{name}:irrigation", 'source': 'knowledge_base', 'tags': [name, 'irrigation'],
+                'text': f"{title} water requirement: {crop['water']}."
+            }
+            yield {
+                'id': f"crop:{name}:economics", 'source': 'knowledge_base', 'tags': [name, 'economics'],
+                'text': f"{title} economics: cost {crop['cost']}, yield {crop['yield']}, profit {crop['profit']}."
+            }
+            yield {
+                'id': f"crop:{name}:tips", 'source': 'knowledge_base', 'tags': [name],
+                'text': f"{title} cultivation tips: {'; '.join(crop['tips'])}."
+            }
+        for name in store.pests:
+            pest = store.pests[name]
+            yield {
+                'id': f"pest:{name}", 'source': 'knowledge_base', 'tags': ['pest', *pest['crops']],
+                'text': f"{name.title()} pest on {', '.join(pest['crops'])}. "
+                        f"Symptoms: {', '.join(pest['symptoms'])}. "
+                        f"Organic control: {', '.join(pest['organic_control'])}. "
+                        f"Chemical control: {', '.join(pest['chemical_control'])}. "
+                        f"Prevention: {', '.join(pest['prevention'])}."
+            }
+        for name in store.soil_types:
+            soil = store.soil_types[name]
+            yield {
+                'id': f"soil:{name}", 'source': 'knowledge_base', 'tags': ['fertilizer'],
+                'text': f"{name.title()} soil: {soil['drainage']} drainage, {soil['fertility']} fertility. "
+                        f"{soil['recommendations']}."
+            }
+
+    def _crop_stat_passages(self, path: str) -> Iterable[Dict[str, Any]]:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for crop, stat in data.get('crop_statistics', {}).items():
+            yield {
+                'id': f"stats:{crop.strip()}", 'source': 'crop_statistics', 'tags': ['economics'],
+                'text': f"{crop.strip()} all-India district yield statistics: average {stat['avg_yield']:.2f} "
+                        f"tonnes/hectare (range {stat['min_yield']:.2f}-{stat['max_yield']:.2f}) "
+                        f"over {stat['records']} district-season records."
+            }
+
+    def query_terms(self, query: str) -> List[str]:
+        terms = tokenize(query)
+        for token in list(terms):
+            terms.extend(self.expansions.get(token, ()))
+        return terms
+
+    def retrieve(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Return up to top_k passages relevant to the question"""
+        start = time.perf_counter()
+        results = [hit for hit in self.index.search(self.query_terms(query), top_k)
+                   if hit['score'] >= self.min_score]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats['queries'] += 1
+            self.stats['hits'] += bool(results)
+            self.stats['total_ms'] += elapsed_ms
+        logger.info(f"🔎 Retrieved {len(results)} passages in {elapsed_ms:.2f}ms: "
+                    f"{[hit['id'] for hit in results]}")
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['queries'], 3) if stats['queries'] else 0.0
+        stats['total_ms'] = round(stats['total_ms'], 2)
+        stats.update({'passages': len(self.index.documents), 'terms': len(self.index.postings)})
+        return stats
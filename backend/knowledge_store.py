@@ -0,0 +1,278 @@
+"""
+Agronomy Knowledge Store
+========================
+
+On-disk, indexed store for the AgriBot knowledge base. The editable source
+of truth is ``knowledge/agronomy_knowledge.json`` (crops, pests and soil
+types, with a ``version`` field). It is compiled into an indexed SQLite
+database (by crop, pest, season and region), normally at image build time
+(``python knowledge_store.py`` in the dockerfile). At startup the database
+is only rebuilt if it is missing or its version differs from the JSON.
+
+The database lives in the writable data directory, not in the source
+tree, so a read-only image still works. A rebuild writes a per-process
+temporary file and atomically renames it into place, so workers starting
+together never see a half-built file; at worst each builds once. If the
+data directory cannot be written, an existing older database is used as
+is, or the store is built in the system temp directory.
+
+Only the crop/pest name lists and synonyms are read eagerly. Full entries
+are loaded on first use and kept in a bounded in-memory cache, so shipping
+hundreds of crops doesn't slow startup, and each worker holds only the
+entries it actually serves. The SQLite pages themselves are shared between
+worker processes through the OS page cache.
+
+Environment:
+
+- ``KNOWLEDGE_DB``: database path (default ``data/agronomy_knowledge.sqlite``)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge')
+SOURCE_PATH = os.path.join(KNOWLEDGE_DIR, 'agronomy_knowledge.json')
+DB_PATH = os.getenv('KNOWLEDGE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  'data', 'agronomy_knowledge.sqlite'))
+SCHEMA_VERSION = '1'
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE crops (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE crop_seasons (crop TEXT NOT NULL, season TEXT NOT NULL);
+CREATE TABLE crop_regions (crop TEXT NOT NULL, region TEXT NOT NULL);
+CREATE TABLE crop_synonyms (crop TEXT NOT NULL, term TEXT NOT NULL);
+CREATE TABLE pests (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE pest_crops (pest TEXT NOT NULL, crop TEXT NOT NULL);
+CREATE TABLE soil_types (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE INDEX idx_crop_seasons_season ON crop_seasons (season);
+CREATE INDEX idx_crop_seasons_crop ON crop_seasons (crop);
+CREATE INDEX idx_crop_regions_region ON crop_regions (region COLLATE NOCASE);
+CREATE INDEX idx_crop_regions_crop ON crop_regions (crop);
+CREATE INDEX idx_pest_crops_crop ON pest_crops (crop);
+CREATE INDEX idx_pest_crops_pest ON pest_crops (pest);
+"""
+
+
+def freeze_knowledge(value):
+    """Recursively convert knowledge data into read-only mappings and tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze_knowledge(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_knowledge(item) for item in value)
+    return value
+
+
+def build_database(source_path: str = SOURCE_PATH, db_path: str = DB_PATH) -> str:
+    """Compile the JSON knowledge source into an indexed SQLite database.
+
+    The database is written to a temporary file and atomically moved into
+    place, so concurrent workers never see a half-built store.
+    """
+    with open(source_path, 'r', encoding='utf-8') as f:
+        source = json.load(f)
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        for name, crop in source.get('crops', {}).items():
+            conn.execute("INSERT INTO crops VALUES (?, ?)", (name, json.dumps(crop, ensure_ascii=False)))
+            conn.executemany("INSERT INTO crop_seasons VALUES (?, ?)",
+                             [(name, season) for season in crop.get('seasons', {})])
+            conn.executemany("INSERT INTO crop_regions VALUES (?, ?)",
+                             [(name, region) for region in crop.get('regions', [])])
+            conn.executemany("INSERT INTO crop_synonyms VALUES (?, ?)",
+                             [(name, term) for term in crop.get('synonyms', [])])
+        for name, pest in source.get('pests', {}).items():
+            conn.execute("INSERT INTO pests VALUES (?, ?)", (name, json.dumps(pest, ensure_ascii=False)))
+            conn.executemany("INSERT INTO pest_crops VALUES (?, ?)",
+                             [(name, crop) for crop in pest.get('crops', [])])
+        for name, soil in source.get('soil_types', {}).items():
+            conn.execute("INSERT INTO soil_types VALUES (?, ?)", (name, json.dumps(soil, ensure_ascii=False)))
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('schema_version', SCHEMA_VERSION),
+            ('data_version', str(source.get('version', '0')))
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    try:
+        os.replace(tmp_path, db_path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+    logger.info(f"📚 Knowledge store built: {db_path} (version {source.get('version', '0')})")
+    return db_path
+
+
+def _source_version(source_path: str) -> str:
+    with open(source_path, 'r', encoding='utf-8') as f:
+        return str(json.load(f).get('version', '0'))
+
+
+def _database_versions(db_path: str) -> Optional[Dict[str, str]]:
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+class LazyTable(Mapping):
+    """Read-only mapping whose entries are loaded from the store on first access"""
+
+    def __init__(self, store: 'KnowledgeStore', table: str, names: List[str]):
+        self._store = store
+        self._table = table
+        self._names = names
+        self._name_set = frozenset(names)
+
+    def __getitem__(self, name):
+        if name not in self._name_set:
+            raise KeyError(name)
+        return self._store.get_entry(self._table, name)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._name_set
+
+
+class KnowledgeStore:
+    """Indexed, lazily loaded, read-only agronomy knowledge"""
+
+    TABLES = ('crops', 'pests', 'soil_types')
+
+    def __init__(self, db_path: str = DB_PATH, source_path: str = SOURCE_PATH, cache_size: int = 256):
+        self.db_path = db_path
+        self.source_path = source_path
+        self.cache_size = cache_size
+        self._ensure_database()
+
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        conn = self._connection()
+        self.version = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+        self.names = {
+            table: [row[0] for row in conn.execute(f"SELECT name FROM {table} ORDER BY rowid")]
+            for table in self.TABLES
+        }
+        self.crops = LazyTable(self, 'crops', self.names['crops'])
+        self.pests = LazyTable(self, 'pests', self.names['pests'])
+        self.soil_types = LazyTable(self, 'soil_types', self.names['soil_types'])
+        logger.info(f"📚 Knowledge store v{self.version}: {len(self.crops)} crops, {len(self.pests)} pests")
+
+    def _is_current(self, db_path: str) -> bool:
+        versions = _database_versions(db_path)
+        return (versions is not None and versions.get('schema_version') == SCHEMA_VERSION
+                and (not os.path.exists(self.source_path)
+                     or versions.get('data_version') == _source_version(self.source_path)))
+
+    def _ensure_database(self):
+        """Build the SQLite store if it is missing or older than the JSON source"""
+        if self._is_current(self.db_path):
+            return
+        try:
+            build_database(self.source_path, self.db_path)
+        except (OSError, sqlite3.Error) as e:
+            versions = _database_versions(self.db_path)
+            if versions is not None and versions.get('schema_version') == SCHEMA_VERSION:
+                logger.warning(f"⚠️ Cannot rebuild knowledge store at {self.db_path} ({e}) - "
+                               f"keeping version {versions.get('data_version')}")
+                return
+            fallback = os.path.join(tempfile.gettempdir(), os.path.basename(self.db_path))
+            logger.warning(f"⚠️ Cannot build knowledge store at {self.db_path} ({e}) - using {fallback}")
+            self.db_path = fallback
+            if not self._is_current(fallback):
+                build_database(self.source_path, fallback)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread read-only connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def get_entry(self, table: str, name: str):
+        """Get one frozen entry, loading it from disk on first use"""
+        key = (table, name)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        row = self._connection().execute(f"SELECT data FROM {table} WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        entry = freeze_knowledge(json.loads(row[0]))
+
+        with self._cache_lock:
+            self._cache[key] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+    def crop_synonyms(self) -> Dict[str, List[str]]:
+        """Local names and synonyms for every crop"""
+        synonyms = {}
+        for crop, term in self._connection().execute("SELECT crop, term FROM crop_synonyms ORDER BY rowid"):
+            synonyms.setdefault(crop, []).append(term)
+        return synonyms
+
+    def crops_for_season(self, season: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT crop FROM crop_seasons WHERE season = ? ORDER BY rowid", (season.lower(),))
+        return [row[0] for row in rows]
+
+    def crops_for_region(self, region: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT crop FROM crop_regions WHERE region = ? COLLATE NOCASE ORDER BY rowid", (region,))
+        return [row[0] for row in rows]
+
+    def pests_for_crop(self, crop: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT pest FROM pest_crops WHERE crop = ? ORDER BY rowid", (crop.lower(),))
+        return [row[0] for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            cached = len(self._cache)
+        return {
+            'version': self.version,
+            'crops': len(self.crops),
+            'pests': len(self.pests),
+            'soil_types': len(self.soil_types),
+            'cached_entries': cached,
+            'cache_size': self.cache_size
+        }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_database()
@@ -0,0 +1,202 @@
+"""
+LLM Providers for Annapurna
+===========================
+
+Provider abstraction behind GroqAgriBot.get_farming_advice. Every backend
+speaks the OpenAI-compatible ``/chat/completions`` API:
+
+- ``groq``:  hosted Groq API (default)
+- ``local``: a CPU model served on the LAN or the same box, e.g. a quantized
+  GGUF model behind llama.cpp's ``llama-server`` (started with
+  ``--parallel N --cont-batching``), Ollama or vLLM.
+
+The local provider admits at most ``parallel`` requests at once, matching the
+server's slots so concurrent chats are batched server-side, and coalesces
+identical in-flight prompts into a single generation. Generation speed
+(tokens/sec) is tracked per provider.
+
+Select a backend per deployment with ``LLM_PROVIDER`` (``groq`` or ``local``).
+``GROQ_BASE_URL`` points the Groq provider at a proxy or a mock server.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from metrics import REGISTRY
+from request_profiler import span
+
+logger = logging.getLogger(__name__)
+
+llm_request_seconds = REGISTRY.histogram(
+    'agribot_llm_request_duration_seconds', 'LLM chat completion latency by provider and HTTP status',
+    ('provider', 'status'), buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0))
+
+
+class OpenAICompatibleProvider:
+    """Chat completion client for any OpenAI-compatible endpoint"""
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: Optional[str] = None,
+                 timeout: float = 30, parallel: Optional[int] = None, coalesce: bool = False):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+        # Cap concurrent requests to the server's batch slots
+        self._slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.parallel = parallel
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'coalesced_requests': 0,
+            'completion_tokens': 0,
+            'generation_seconds': 0.0,
+            'last_tokens_per_second': 0.0
+        }
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int = 2000,
+                 temperature: float = 0.7, top_p: float = 0.9, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Run one chat completion.
+
+        Returns a dict with ``status_code``, ``content`` (None on HTTP errors),
+        ``usage``, ``error_text``, ``elapsed`` and ``tokens_per_second``.
+        Network errors (``requests`` exceptions) are raised to the caller.
+        ``timeout`` overrides the provider's timeout for this call.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": False
+        }
+        if not self.coalesce:
+            return self._post(payload, timeout)
+
+        # Identical prompts already being generated share that generation
+        key = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            with self._stats_lock:
+                self.stats['coalesced_requests'] += 1
+            return future.result(timeout=timeout)
+
+        try:
+            result = self._post(payload, timeout)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _post(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        if self._slots and not self._slots.acquire(timeout=timeout):
+            raise requests.exceptions.Timeout(f"No free {self.name} slot within {timeout:.3g}s")
+        try:
+            with span('llm_request', provider=self.name, model=self.model) as attributes, \
+                    llm_request_seconds.time(provider=self.name, status='error') as labels:
+                start = time.perf_counter()
+                response = requests.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    json=payload,
+                    timeout=timeout
+                )
+                elapsed = time.perf_counter() - start
+                labels['status'] = attributes['status'] = response.status_code
+        finally:
+            if self._slots:
+                self._slots.release()
+
+        result = {
+            'status_code': response.status_code,
+            'content': None,
+            'usage': {},
+            'error_text': '',
+            'elapsed': elapsed,
+            'tokens_per_second': 0.0
+        }
+        if response.status_code != 200:
+            result['error_text'] = response.text
+            return result
+
+        data = response.json()
+        result['content'] = data['choices'][0]['message']['content']
+        result['usage'] = data.get('usage') or {}
+        completion_tokens = result['usage'].get('completion_tokens') or 0
+        # llama.cpp reports its own decode speed; otherwise use wall-clock time
+        timings = data.get('timings') or {}
+        tokens_per_second = timings.get('predicted_per_second') or (
+            completion_tokens / elapsed if elapsed > 0 else 0.0)
+        result['tokens_per_second'] = round(tokens_per_second, 2)
+
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['completion_tokens'] += completion_tokens
+            self.stats['generation_seconds'] += elapsed
+            self.stats['last_tokens_per_second'] = result['tokens_per_second']
+        logger.info(f"⚙️ {self.name} generated {completion_tokens} tokens in {elapsed:.2f}s "
+                    f"({result['tokens_per_second']} tokens/sec)")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get throughput statistics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        seconds = stats['generation_seconds']
+        stats['avg_tokens_per_second'] = round(stats['completion_tokens'] / seconds, 2) if seconds else 0.0
+        stats['generation_seconds'] = round(seconds, 2)
+        stats.update({'provider': self.name, 'model': self.model, 'parallel_slots': self.parallel})
+        return stats
+
+
+def create_provider(api_key: Optional[str] = None) -> OpenAICompatibleProvider:
+    """Create the LLM provider configured for this deployment"""
+    provider = os.getenv('LLM_PROVIDER', 'groq').lower()
+
+    if provider == 'local':
+        return OpenAICompatibleProvider(
+            name='local',
+            base_url=os.getenv('LOCAL_LLM_URL', 'http://127.0.0.1:8080/v1'),
+            model=os.getenv('LOCAL_LLM_MODEL', 'qwen2.5-1.5b-instruct-q4_k_m'),
+            api_key=os.getenv('LOCAL_LLM_API_KEY'),
+            timeout=float(os.getenv('LOCAL_LLM_TIMEOUT', 120)),
+            parallel=int(os.getenv('LOCAL_LLM_PARALLEL', 4)),
+            coalesce=True
+        )
+
+    if provider != 'groq':
+        raise ValueError(f"Unknown LLM_PROVIDER '{provider}' (expected 'groq' or 'local')")
+    api_key = api_key or os.getenv('GROQ_API_KEY') or os.getenv('GROK_API_KEY')
+    if not api_key:
+        raise ValueError("GROQ_API_KEY environment variable is required")
+    return OpenAICompatibleProvider(
+        name='groq',
+        base_url=os.getenv('GROQ_BASE_URL', "https://api.groq.com/openai/v1"),
+        model=os.getenv('GROQ_MODEL', 'llama-3.1-8b-instant'),
+        api_key=api_key,
+        timeout=30
+    )
@@ -0,0 +1,420 @@
+"""
+Prometheus Metrics
+==================
+
+Dependency-free metrics with a Prometheus text exposition at ``/metrics``.
+Shared by the AI backend and the main API (``back/main.py`` imports this
+module).
+
+Counters, gauges and histograms write to per-thread shards. Each shard has
+its own lock, which only its owner thread and a scrape take, so recording
+a sample never contends with other request threads. A scrape copies every
+shard under its lock (no torn bucket/count pairs) and sums them. Shards of
+threads that have exited are folded into a retired total, so
+request-per-thread servers do not grow without bound.
+
+Preforked servers (gunicorn workers) each have their own registry. With
+``METRICS_MULTIPROC_DIR`` set (``gunicorn.conf.py`` sets it), every process
+writes a snapshot of its metrics to ``<dir>/<pid>.json`` every
+``METRICS_FLUSH_INTERVAL`` seconds (default 1) and at exit. A scrape
+writes its own snapshot, then merges all files, so any worker answers for
+the whole server:
+
+- counters and histograms are summed over all workers, including ones that
+  have exited. The master's ``child_exit`` hook folds a dead worker's file
+  into ``archive.json`` (``mark_process_dead``);
+- inc/dec gauges (in-flight requests) are summed over live workers;
+- callback gauges (per-worker state such as readiness) are reported per
+  worker with a ``pid`` label.
+
+Other workers' values can lag a scrape by up to one flush interval. A
+worker killed without running its exit hooks loses the samples since its
+last flush.
+
+``instrument_app(app)`` adds per-route request histograms, an in-flight
+gauge and the ``/metrics`` endpoint to a Flask app. Code that calls
+external services times them with ``histogram.time(**labels)``.
+"""
+
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+MULTIPROC_DIR_ENV = 'METRICS_MULTIPROC_DIR'
+ARCHIVE_FILE = 'archive.json'
+
+# How per-process values combine across workers
+SUM = 'sum'            # all processes, dead ones included (counters, histograms)
+LIVE_SUM = 'livesum'   # live processes only (inc/dec gauges)
+PER_PROCESS = 'pid'    # one sample per live process, labelled with its pid (callback gauges)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_samples(name: str, kind: str, documentation: str, labelnames: Tuple[str, ...],
+                    samples: Dict[tuple, Any], buckets: Tuple[float, ...] = ()) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for key, value in sorted(samples.items()):
+        if kind != 'histogram':
+            lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+            continue
+        cumulative = 0
+        for bound, count in zip(tuple(buckets) + (float('inf'),), value):
+            cumulative += count
+            le = f'le="{_format_value(bound) if bound != float("inf") else "+Inf"}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(float(value[-2]))}")
+        lines.append(f"{name}_count{labels} {value[-1]}")
+    return lines
+
+
+def _add_sample(into: Dict[tuple, Any], key: tuple, value: Any):
+    """Add a counter/gauge value or a histogram state (list) into ``into``"""
+    total = into.get(key)
+    if total is None:
+        into[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(total, list):
+        for index, item in enumerate(value):
+            total[index] += item
+    else:
+        into[key] = total + value
+
+
+class _Metric:
+    """Base class: per-thread shards of {label values: state}"""
+
+    kind = 'untyped'
+    multiprocess_mode = SUM
+    buckets: Tuple[float, ...] = ()
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, threading.Lock, Dict]] = []
+        self._retired: Dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _shard(self) -> Tuple[threading.Lock, Dict]:
+        """This thread's ``(lock, shard)``; the lock is only contended while a scrape copies the shard"""
+        entry = getattr(self._local, 'shard', None)
+        if entry is None:
+            entry = (threading.Lock(), {})
+            self._local.shard = entry
+            # Only the first sample from each thread takes the metric lock
+            with self._lock:
+                self._shards.append((threading.current_thread(), *entry))
+        return entry
+
+    def _collect(self) -> Dict:
+        """Sum every shard, retiring those whose thread has exited"""
+        with self._lock:
+            alive = []
+            for entry in self._shards:
+                thread, lock, shard = entry
+                if thread.is_alive():
+                    alive.append(entry)
+                else:
+                    with lock:
+                        for key, value in shard.items():
+                            _add_sample(self._retired, key, value)
+            self._shards = alive
+            total = {}
+            for key, value in self._retired.items():
+                _add_sample(total, key, value)
+        for _, lock, shard in alive:
+            # Copy under the owner's lock, so a histogram's buckets, sum and count are consistent
+            with lock:
+                for key, value in shard.items():
+                    _add_sample(total, key, value)
+        return total
+
+    def render(self) -> List[str]:
+        return _render_samples(self.name, self.kind, self.documentation, self.labelnames,
+                               self._collect(), self.buckets)
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        lock, shard = self._shard()
+        key = self._key(labels)
+        with lock:
+            shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """Gauge built from per-thread deltas (inc/dec), or from a callback"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self.multiprocess_mode = PER_PROCESS if function is not None else LIVE_SUM
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _collect(self) -> Dict:
+        if self.function is not None:
+            return {(): self.function()}
+        return super()._collect()
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        lock, shard = self._shard()
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with lock:
+            state = shard.get(key)
+            if state is None:
+                # One slot per bucket plus +Inf, then sum and count
+                state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block; labels may be updated inside it"""
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+
+def _load_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path: str, snapshot: Dict[str, Any]):
+    """Write atomically, so a concurrent scrape reads the old or the new file, never half of one"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def render_multiprocess(directory: str) -> str:
+    """Merge every process snapshot in ``directory`` into one exposition"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        snapshot = _load_snapshot(path)
+        if snapshot is None:
+            continue
+        pid = os.path.basename(path)[:-len('.json')]
+        for name, metric in snapshot.items():
+            entry = merged.get(name)
+            if entry is None:
+                labelnames = tuple(metric['labelnames'])
+                if metric['mode'] == PER_PROCESS:
+                    labelnames += ('pid',)
+                entry = merged[name] = {**metric, 'labelnames': labelnames, 'samples': {}}
+            for labels, value in metric['samples']:
+                key = tuple(labels) + ((pid,) if metric['mode'] == PER_PROCESS else ())
+                _add_sample(entry['samples'], key, value)
+    lines = []
+    for name, entry in merged.items():
+        lines.extend(_render_samples(name, entry['kind'], entry['help'], entry['labelnames'],
+                                     entry['samples'], tuple(entry['buckets'])))
+    return '\n'.join(lines) + '\n'
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None):
+    """Fold an exited worker's counters and histograms into the archive and drop its gauges.
+
+    Call from the gunicorn master (``child_exit``); it is the archive's only writer.
+    """
+    directory = directory or os.getenv(MULTIPROC_DIR_ENV)
+    if not directory:
+        return
+    path = os.path.join(directory, f"{pid}.json")
+    snapshot = _load_snapshot(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    archive = _load_snapshot(archive_path) or {}
+    for name, metric in snapshot.items():
+        if metric['mode'] != SUM:
+            continue
+        entry = archive.setdefault(name, {**metric, 'samples': []})
+        samples = {tuple(labels): value for labels, value in entry['samples']}
+        for labels, value in metric['samples']:
+            _add_sample(samples, tuple(labels), value)
+        entry['samples'] = [[list(key), value] for key, value in samples.items()]
+    _write_snapshot(archive_path, archive)
+    os.remove(path)
+
+
+class Registry:
+    """Collection of metrics rendered together (merged across workers in multiprocess mode)"""
+
+    def __init__(self, multiprocess_dir: Optional[str] = None, flush_interval: float = 1.0):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def _all(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's values, in the JSON form other workers merge"""
+        return {metric.name: {
+            'kind': metric.kind, 'help': metric.documentation, 'labelnames': list(metric.labelnames),
+            'buckets': list(metric.buckets), 'mode': metric.multiprocess_mode,
+            'samples': [[list(key), value] for key, value in metric._collect().items()]
+        } for metric in self._all()}
+
+    def flush(self):
+        """Write this process's snapshot for the other workers' scrapes"""
+        if self.multiprocess_dir:
+            _write_snapshot(os.path.join(self.multiprocess_dir, f"{os.getpid()}.json"), self.snapshot())
+
+    def start_flushing(self):
+        """Flush periodically and at exit; call in each serving process (after the fork)"""
+        if not self.multiprocess_dir or self._flusher is not None:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+
+        def run():
+            while True:
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"⚠️ Metrics snapshot not written: {e}")
+                time.sleep(self.flush_interval)
+
+        self._flusher = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def render(self) -> str:
+        if self.multiprocess_dir:
+            self.flush()
+            return render_multiprocess(self.multiprocess_dir)
+        lines = []
+        for metric in self._all():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry(os.getenv(MULTIPROC_DIR_ENV) or None,
+                    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', 1)))
+
+http_request_seconds = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status'))
+http_requests_in_flight = REGISTRY.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled')
+
+
+def instrument_app(app, registry: Registry = REGISTRY, endpoint: str = '/metrics'):
+    """Add request metrics and the /metrics endpoint to a Flask app"""
+    from flask import Response, request
+
+    registry.start_flushing()
+
+    @app.before_request
+    def _metrics_start_request():
+        if request.path == endpoint:
+            return  # A scrape doesn't count itself (its snapshot would show it in flight)
+        request.environ['metrics.start'] = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def _metrics_record_request(response):
+        start = request.environ.get('metrics.start')
+        if start is not None:
+            # Label by URL rule, not raw path, to keep label cardinality bounded
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            http_request_seconds.observe(time.perf_counter() - start, method=request.method,
+                                         route=route, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _metrics_end_request(exc=None):
+        if request.environ.pop('metrics.start', None) is not None:
+            http_requests_in_flight.dec()
+
+    @app.route(endpoint)
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+    return app
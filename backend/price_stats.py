@@ -0,0 +1,177 @@
+"""
+Incremental Price Statistics
+============================
+
+Min / quartiles / median / max / mean listing prices per category and
+district, kept up to date as listings change, so ``/api/products/stats``
+never scans the catalog.
+
+``PriceStats`` is a catalog index (``add(product)`` / ``remove(product)``).
+The catalog calls it in the same locked step as its other indexes on
+create, update (remove + add) and delete. The price of each active
+listing goes into four groups: (category, district), (category, any),
+(any, district) and (any, any). Zero, negative and non-finite prices are
+left out. Within a group, prices are kept per unit, because
+₹/kg and ₹/quintal cannot be mixed.
+
+Each group/unit holds a ``PriceSketch``: a DDSketch-style log-bucketed
+histogram. A price goes into bucket ``ceil(log(price) / log(gamma))``, so
+every bucket spans a fixed relative width, and a quantile read from a
+bucket is within ``accuracy`` (default 1%) of the true value. Removing a
+price decrements its bucket, so updates and deletes are exact. Memory and
+query time depend on the price range (a few hundred buckets at most), not
+on the number of listings. Buckets also track the smallest and largest
+price they received, which makes min/max exact in practice. Summaries are
+cached per existing group until the group changes, so repeated reads are
+dictionary lookups.
+"""
+
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+GroupKey = Tuple[Optional[str], Optional[str]]  # (category, district); None means any
+
+# Positive values below this share the lowest bucket (PriceStats never adds values <= 0)
+MIN_VALUE = 0.01
+
+
+class PriceSketch:
+    """Relative-error quantile sketch over positive values that supports removal"""
+
+    def __init__(self, accuracy: float = 0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._buckets: Dict[int, List[float]] = {}  # index -> [count, smallest, largest]
+        self.count = 0
+        self.total = 0.0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(max(value, MIN_VALUE)) / self._log_gamma)
+
+    def add(self, value: float):
+        bucket = self._buckets.get(self._index(value))
+        if bucket is None:
+            self._buckets[self._index(value)] = [1, value, value]
+        else:
+            bucket[0] += 1
+            bucket[1] = min(bucket[1], value)
+            bucket[2] = max(bucket[2], value)
+        self.count += 1
+        self.total += value
+
+    def remove(self, value: float):
+        index = self._index(value)
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            return
+        bucket[0] -= 1
+        if bucket[0] <= 0:
+            del self._buckets[index]
+        self.count -= 1
+        self.total -= value
+
+    def summary(self, quantiles: Iterable[Tuple[str, float]]) -> Dict[str, Any]:
+        """Count, min, max, mean and the given ``(name, q)`` quantiles in one pass over the buckets"""
+        if not self.count:
+            return {'count': 0}
+        ordered = sorted(self._buckets.items())
+        result = {'count': self.count, 'min': round(ordered[0][1][1], 2), 'max': round(ordered[-1][1][2], 2),
+                  'mean': round(self.total / self.count, 2)}
+        targets = sorted(quantiles, key=lambda item: item[1])
+        seen, position = 0, 0
+        for index, (count, smallest, largest) in ordered:
+            seen += count
+            while position < len(targets) and targets[position][1] * (self.count - 1) < seen:
+                # Bucket midpoint (relative error <= accuracy), clamped to the values actually seen
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                result[targets[position][0]] = round(min(max(estimate, smallest), largest), 2)
+                position += 1
+        return result
+
+
+class PriceStats:
+    """Catalog index of price sketches per (category, district) and unit"""
+
+    QUANTILES = (('p25', 0.25), ('median', 0.5), ('p75', 0.75))
+
+    def __init__(self, district: Callable[[Dict[str, Any]], Optional[str]], accuracy: float = 0.01,
+                 statuses: Iterable[str] = ('active',)):
+        self.accuracy = accuracy
+        self._district = district
+        self._statuses = frozenset(statuses)
+        self._groups: Dict[GroupKey, Dict[str, PriceSketch]] = {}
+        self._entries: Dict[str, Tuple[GroupKey, str, float]] = {}  # id -> what was added, for remove()
+        self._summaries: Dict[GroupKey, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(value: Optional[str]) -> Optional[str]:
+        return value.strip().lower() or None if isinstance(value, str) else None
+
+    @staticmethod
+    def _keys(category: Optional[str], district: Optional[str]) -> List[GroupKey]:
+        return [(category, district), (category, None), (None, district), (None, None)]
+
+    def add(self, product: Dict[str, Any]):
+        if product.get('status') not in self._statuses:
+            return
+        try:
+            price = float(product.get('price'))
+        except (TypeError, ValueError):
+            return
+        if not math.isfinite(price) or price <= 0:
+            return  # Legacy values the listing validation would reject; they'd skew min and mean
+        category = self.normalize(product.get('category'))
+        district = self._district(product)
+        unit = self.normalize(product.get('unit')) or 'unit'
+        with self._lock:
+            self._entries[product['id']] = ((category, district), unit, price)
+            for key in set(self._keys(category, district)):
+                self._groups.setdefault(key, {}).setdefault(unit, PriceSketch(self.accuracy)).add(price)
+                self._summaries.pop(key, None)
+
+    def remove(self, product: Dict[str, Any]):
+        with self._lock:
+            entry = self._entries.pop(product['id'], None)
+            if entry is None:
+                return
+            (category, district), unit, price = entry
+            for key in set(self._keys(category, district)):
+                units = self._groups[key]
+                units[unit].remove(price)
+                if not units[unit].count:
+                    del units[unit]
+                    if not units:
+                        del self._groups[key]
+                self._summaries.pop(key, None)
+
+    def stats(self, category: Optional[str] = None, district: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """``{unit: {count, min, p25, median, p75, max, mean}}`` for one group (None = any)"""
+        key = (self.normalize(category), district)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                units = self._groups.get(key)
+                if units is None:
+                    return {}  # Not cached: keys come from the query string
+                summary = {unit: sketch.summary(self.QUANTILES) for unit, sketch in sorted(units.items())}
+                self._summaries[key] = summary
+            return summary
+
+    def breakdown(self, by: str, category: Optional[str] = None,
+                  district: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Stats for every category (``by='category'``) or district (``by='district'``) in the other filter"""
+        category = self.normalize(category)
+        with self._lock:
+            if by == 'category':
+                keys = [key for key in self._groups if key[0] is not None and key[1] == district]
+            else:
+                keys = [key for key in self._groups if key[1] is not None and key[0] == category]
+        return [{'category': key[0], 'district': key[1], 'stats': self.stats(*key)}
+                for key in sorted(keys, key=lambda key: (key[0] or '', key[1] or ''))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'products': len(self._entries), 'groups': len(self._groups),
+                    'cached_summaries': len(self._summaries), 'accuracy': self.accuracy}
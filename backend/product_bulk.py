@@ -0,0 +1,213 @@
+"""
+Bulk Product Import and Export
+==============================
+
+Lets farmer producer organizations list many products in one upload and
+pull the catalog out for analytics.
+
+Import reads a CSV or JSONL upload as a stream, in chunks of
+``CHUNK_ROWS`` rows. Each chunk is validated column by column with numpy
+rather than row by row: required fields, booleans, and the price/quantity
+bounds that create and update share (``product_catalog.NUMERIC_FIELDS``).
+Every failing row is reported with its line number and reasons.
+The endpoint then inserts all valid rows with one catalog call, which is
+one store transaction.
+
+Export streams ``CSV`` or ``JSONL`` in chunks of ``chunk_rows`` rows. The
+endpoint takes a snapshot of the matching listings first: a list of
+references, one per listing, which the catalog never edits in place (a
+change stores a new dict). The export is therefore consistent as of the
+request, and only one chunk of serialized output is held at a time. The
+snapshot itself grows with the number of matching listings.
+CSV cells that a spreadsheet would run as formulas are prefixed with
+``'``.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from product_catalog import NUMERIC_FIELDS, numeric_error
+
+REQUIRED_FIELDS = ('productName', 'category', 'description', 'price', 'quantity',
+                   'unit', 'location', 'phoneNumber', 'farmerId')
+OPTIONAL_FIELDS = ('farmerName', 'organicCertified', 'deliveryAvailable', 'harvestDate',
+                   'latitude', 'longitude')
+BOOLEAN_FIELDS = ('organicCertified', 'deliveryAvailable')
+TRUE_VALUES = ('true', 'yes', 'y', '1')
+FALSE_VALUES = ('false', 'no', 'n', '0', '')
+CHUNK_ROWS = 1000
+
+EXPORT_FIELDS = ('id', 'productName', 'category', 'description', 'price', 'quantity', 'unit', 'location',
+                 'latitude', 'longitude', 'phoneNumber', 'farmerId', 'farmerName', 'organicCertified',
+                 'deliveryAvailable', 'harvestDate', 'status', 'createdAt', 'updatedAt', 'views',
+                 'inquiries', 'productImage')
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def detect_format(requested: Optional[str], filename: str = '', content_type: str = '') -> Optional[str]:
+    """``csv`` or ``jsonl`` from an explicit format, the file extension or the content type"""
+    if requested:
+        requested = requested.lower()
+        return {'ndjson': 'jsonl'}.get(requested, requested) if requested in ('csv', 'jsonl', 'ndjson') else None
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if 'csv' in content_type:
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line, row)`` from a binary stream; ``row`` is a dict, or an error string for a bad line"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, 'too many columns'
+            elif any(value not in (None, '') for value in row.values()):
+                yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f'invalid JSON: {e.msg}'
+            continue
+        yield line_number, row if isinstance(row, dict) else 'each line must be a JSON object'
+
+
+def chunked(rows: Iterable[Any], size: int = CHUNK_ROWS) -> Iterator[List[Any]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _column(rows: List[Dict[str, Any]], field: str) -> np.ndarray:
+    """One field of every row as a stripped string array ('' when missing)"""
+    values = ['' if row.get(field) is None else str(row.get(field)) for row in rows]
+    return np.char.strip(np.array(values, dtype=str)) if values else np.array([], dtype=str)
+
+
+def _to_float(column: np.ndarray) -> np.ndarray:
+    """Parse a string column to floats, NaN where a value is not a number"""
+    try:
+        return column.astype(float)
+    except ValueError:
+        parsed = np.full(len(column), np.nan)
+        for index, value in enumerate(column):
+            try:
+                parsed[index] = float(value)
+            except ValueError:
+                pass
+        return parsed
+
+
+def validate_rows(numbered_rows: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Validate a chunk column by column.
+
+    Returns ``(valid, errors)``: ``valid`` holds ``(line, normalized row)``
+    with typed price/quantity/booleans; ``errors`` holds
+    ``{'row': line, 'errors': [...]}`` for every rejected row.
+    """
+    problems: Dict[int, List[str]] = {}
+    rows, lines = [], []
+    for line, row in numbered_rows:
+        if isinstance(row, str):
+            problems[line] = [row]
+        else:
+            rows.append(row)
+            lines.append(line)
+    if not rows:
+        return [], [{'row': line, 'errors': errors} for line, errors in problems.items()]
+
+    columns = {field: _column(rows, field) for field in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+    failures: List[Tuple[np.ndarray, str]] = []
+    for field in REQUIRED_FIELDS:
+        failures.append((np.char.str_len(columns[field]) == 0, f'{field} is required'))
+    numbers = {field: _to_float(columns[field]) for field in NUMERIC_FIELDS}
+    for field, values in numbers.items():
+        low, inclusive, high = NUMERIC_FIELDS[field]
+        present = np.char.str_len(columns[field]) > 0
+        with np.errstate(invalid='ignore'):
+            in_bounds = np.isfinite(values) & ((values >= low) if inclusive else (values > low))
+            if high is not None:
+                in_bounds &= values <= high
+        failures.append((present & ~in_bounds, numeric_error(field)))
+    booleans = {}
+    for field in BOOLEAN_FIELDS:
+        lowered = np.char.lower(columns[field])
+        booleans[field] = np.isin(lowered, TRUE_VALUES)
+        failures.append((~booleans[field] & ~np.isin(lowered, FALSE_VALUES), f'{field} must be true or false'))
+    coordinates = [_to_float(columns[field]) for field in ('latitude', 'longitude')]
+    given = (np.char.str_len(columns['latitude']) > 0) | (np.char.str_len(columns['longitude']) > 0)
+    with np.errstate(invalid='ignore'):
+        in_range = (np.abs(coordinates[0]) <= 90) & (np.abs(coordinates[1]) <= 180)
+    failures.append((given & ~in_range, 'latitude/longitude must be valid coordinates'))
+
+    failed = np.zeros(len(rows), dtype=bool)
+    for mask, message in failures:
+        failed |= mask
+        for index in np.flatnonzero(mask):
+            problems.setdefault(lines[index], []).append(message)
+
+    valid = []
+    for index in np.flatnonzero(~failed):
+        row = {field: str(columns[field][index]) for field in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+        row.update({field: float(numbers[field][index]) for field in NUMERIC_FIELDS})
+        row.update({field: bool(booleans[field][index]) for field in BOOLEAN_FIELDS})
+        valid.append((lines[index], row))
+    errors = [{'row': line, 'errors': problems[line]} for line in sorted(problems)]
+    return valid, errors
+
+
+def _export_row(product: Dict[str, Any]) -> Dict[str, Any]:
+    coordinates = product.get('coordinates') or {}
+    return {field: coordinates.get('lat' if field == 'latitude' else 'lon') if field in ('latitude', 'longitude')
+            else product.get(field) for field in EXPORT_FIELDS}
+
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_chunks(products: Iterable[Dict[str, Any]], fmt: str, chunk_rows: int = 500) -> Iterator[str]:
+    """Serialize products as CSV (with header) or JSONL, ``chunk_rows`` rows per yielded string"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for product in products:
+        row = _export_row(product)
+        if writer:
+            writer.writerow([_csv_cell(row[field]) for field in EXPORT_FIELDS])
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write('\n')
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
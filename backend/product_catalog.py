@@ -0,0 +1,394 @@
+"""
+Indexed Product Catalog
+=======================
+
+In-memory store behind the marketplace ``/api/products`` endpoints. It has a
+primary ``id -> product`` map plus secondary indexes (category, farmerId,
+status). Every index is updated in the same locked step as the primary map
+on create, update and delete, so an id lookup costs O(1). A filtered
+listing only visits the products in its smallest matching index bucket,
+never the whole catalog.
+
+Index buckets are insertion-ordered dicts used as ordered sets, so listings
+keep creation order. Products are plain dicts (the API's JSON shape).
+Mutations must go through the catalog so the indexes stay consistent. A
+change replaces the stored dict instead of editing it, so a product that a
+request thread is still serializing never changes under it.
+
+With a ``DurableStore`` (see ``durable_store.py``) the catalog is
+write-through. Each change is queued to the store's write-ahead log in the
+same locked step, and the caller waits for the group commit after the lock
+is released. The catalog is recovered from the store at startup, and
+``apply`` replays other workers' changes into it.
+
+``paginate`` and ``project`` shape listing responses. Pages use keyset
+cursors: an opaque token holding the sort key of the last item returned.
+This stays correct while listings are added or removed between pages. Each
+page is picked with a bounded heap, and only the requested fields are
+serialized, so response size and serialization time depend on ``limit``,
+not on the catalog size.
+"""
+
+import base64
+import hashlib
+import heapq
+import json
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Numeric listing fields: (lower bound, whether the bound itself is allowed, upper bound or None).
+# Shared by create, update and bulk import (product_bulk applies the same bounds column-wise).
+NUMERIC_FIELDS: Dict[str, Tuple[float, bool, Optional[float]]] = {
+    'price': (0.0, False, 10_000_000.0),
+    'quantity': (0.0, True, None),
+}
+
+
+def numeric_error(field: str) -> str:
+    low, inclusive, high = NUMERIC_FIELDS[field]
+    bounds = f"{'>=' if inclusive else '>'} {low:.15g}" + (f" and <= {high:.15g}" if high is not None else '')
+    return f"{field} must be a number {bounds}"
+
+
+def parse_numeric(field: str, value: Any) -> float:
+    """Validate a price/quantity value; raises ValueError with a client-facing message"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(numeric_error(field)) from None
+    low, inclusive, high = NUMERIC_FIELDS[field]
+    if not math.isfinite(number) or number < low or (number == low and not inclusive) or (
+            high is not None and number > high):
+        raise ValueError(numeric_error(field))
+    return number
+
+
+def _sort_number(value: Any) -> float:
+    """Numeric sort value; legacy unparseable or non-finite values sort as 0 instead of failing the listing"""
+    try:
+        number = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if math.isfinite(number) else 0.0
+
+
+# Sort name -> key function; every key ends with the id so the order is total
+SORT_KEYS: Dict[str, Callable[[Dict[str, Any]], tuple]] = {
+    'createdAt': lambda product: (product.get('createdAt') or '', product['id']),
+    'price': lambda product: (_sort_number(product.get('price')), product['id']),
+    'views': lambda product: (_sort_number(product.get('views')), product['id']),
+}
+# Type of the first key element per sort, to validate cursors (rankings are numbers)
+SORT_VALUE_TYPES: Dict[str, type] = {'createdAt': str, 'price': float, 'views': float}
+SORT_ALIASES = {'date': 'createdAt', 'created': 'createdAt', 'newest': '-createdAt', 'oldest': 'createdAt'}
+# Sorts that need a per-query ranking, and the query parameter that provides it
+RANKED_SORTS = {'relevance': 'a search query', 'distance': 'a location (near or lat/lon)'}
+
+
+class FieldIndex:
+    """Secondary index: field value -> ordered set of product ids"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._buckets: Dict[Any, Dict[str, None]] = {}
+
+    def add(self, product: Dict[str, Any]):
+        self._buckets.setdefault(product.get(self.field), {})[product['id']] = None
+
+    def remove(self, product: Dict[str, Any]):
+        value = product.get(self.field)
+        bucket = self._buckets.get(value)
+        if bucket is not None:
+            bucket.pop(product['id'], None)
+            if not bucket:
+                del self._buckets[value]
+
+    def ids(self, value: Any) -> Dict[str, None]:
+        return self._buckets.get(value, {})
+
+    def counts(self) -> Dict[Any, int]:
+        return {value: len(bucket) for value, bucket in self._buckets.items()}
+
+
+class ProductCatalog:
+    """Thread-safe product store with consistent secondary indexes"""
+
+    INDEXED_FIELDS = ('category', 'farmerId', 'status')
+    COUNTER_FIELDS = ('views', 'inquiries')
+
+    def __init__(self, id_prefix: str = 'PRD', first_id: int = 1000, store=None, collection: str = 'products'):
+        self.id_prefix = id_prefix
+        self._first_id = first_id
+        self._next_number = first_id
+        self._products: Dict[str, Dict[str, Any]] = {}
+        self._field_indexes = {field: FieldIndex(field) for field in self.INDEXED_FIELDS}
+        self._indexes: List[Any] = list(self._field_indexes.values())
+        self._lock = threading.RLock()
+        self._store = store
+        self._collection = collection
+        if store is not None:
+            store.register(collection, self.apply, lambda: list(self._products),
+                           counters=self.COUNTER_FIELDS, apply_counts=self.set_counts)
+
+    def add_index(self, index) -> Any:
+        """Attach another index (anything with ``add(product)`` / ``remove(product)``)"""
+        with self._lock:
+            for product in self._products.values():
+                index.add(product)
+            self._indexes.append(index)
+        return index
+
+    def allocate_id(self) -> Tuple[int, str]:
+        """Reserve the next product number and its id (e.g. ``(1000, 'PRD1000')``)"""
+        if self._store is not None:
+            number = self._store.allocate(self._collection, self._first_id)
+        else:
+            with self._lock:
+                number = self._next_number
+                self._next_number += 1
+        return number, f"{self.id_prefix}{number:04d}"
+
+    def allocate_ids(self, count: int) -> List[Tuple[int, str]]:
+        """Reserve ``count`` consecutive product numbers in one step (bulk imports)"""
+        if count <= 0:
+            return []
+        if self._store is not None:
+            first = self._store.allocate(self._collection, self._first_id, count)
+        else:
+            with self._lock:
+                first = self._next_number
+                self._next_number += count
+        return [(number, f"{self.id_prefix}{number:04d}") for number in range(first, first + count)]
+
+    def _persist(self, product_id: str, product: Optional[Dict[str, Any]]):
+        """Queue a change to the store (call under the lock, so the log order matches memory)"""
+        if self._store is None:
+            return None
+        if product is None:
+            return self._store.delete(self._collection, product_id)
+        return self._store.put(self._collection, product_id, product)
+
+    def add(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            if product['id'] in self._products:
+                raise KeyError(f"Product {product['id']} already exists")
+            self._products[product['id']] = product
+            for index in self._indexes:
+                index.add(product)
+            commit = self._persist(product['id'], product)
+        if commit is not None:
+            commit.wait()
+        return product
+
+    def add_many(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add several products under one lock and persist them in one store transaction"""
+        with self._lock:
+            ids = [product['id'] for product in products]
+            duplicates = [product_id for product_id in ids if product_id in self._products]
+            if duplicates or len(set(ids)) != len(ids):
+                raise KeyError(f"Products already exist: {', '.join(duplicates) or 'duplicate ids'}")
+            for product in products:
+                self._products[product['id']] = product
+                for index in self._indexes:
+                    index.add(product)
+            commit = None
+            if self._store is not None and products:
+                commit = self._store.put_many(self._collection, {product['id']: product for product in products})
+        if commit is not None:
+            commit.wait()
+        return products
+
+    def get(self, product_id: str) -> Optional[Dict[str, Any]]:
+        return self._products.get(product_id)
+
+    def update(self, product_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply field changes and re-index the product; None if it does not exist"""
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            for index in self._indexes:
+                index.remove(product)
+            product = {**product, **fields}
+            self._products[product_id] = product
+            for index in self._indexes:
+                index.add(product)
+            commit = self._persist(product_id, product)
+        if commit is not None:
+            commit.wait()
+        return product
+
+    def add_counts(self, deltas: Dict[str, Dict[str, int]]):
+        """Add batched counter deltas (``{id: {'views': n}}``); persisted write-behind as increments"""
+        with self._lock:
+            for product_id, counts in deltas.items():
+                product = self._products.get(product_id)
+                if product is None:
+                    continue
+                self._products[product_id] = {
+                    **product, **{field: product.get(field, 0) + amount for field, amount in counts.items()}}
+                if self._store is not None:
+                    self._store.add_counts(self._collection, product_id, counts)
+
+    def set_counts(self, product_id: str, counts: Dict[str, int]):
+        """Overwrite counters with the store's totals (which include other workers' counts)"""
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is not None:
+                self._products[product_id] = {**product, **counts}
+
+    def remove(self, product_id: str) -> Optional[Dict[str, Any]]:
+        commit = None
+        with self._lock:
+            product = self._products.pop(product_id, None)
+            if product is not None:
+                for index in self._indexes:
+                    index.remove(product)
+                commit = self._persist(product_id, None)
+        if commit is not None:
+            commit.wait()
+        return product
+
+    def apply(self, product_id: str, product: Optional[Dict[str, Any]]):
+        """Insert, replace or (``None``) delete a product without persisting it (store recovery and sync)"""
+        with self._lock:
+            current = self._products.get(product_id)
+            if current is not None:
+                for index in self._indexes:
+                    index.remove(current)
+            if product is None:
+                self._products.pop(product_id, None)
+                return
+            # Replacing an existing key keeps its creation order
+            self._products[product_id] = product
+            for index in self._indexes:
+                index.add(product)
+
+    def _candidate_ids(self, filters: Dict[str, Any]) -> Iterable[str]:
+        """Ids in the smallest index bucket among the active filters (all ids if none)"""
+        buckets = [self._field_indexes[field].ids(value) for field, value in filters.items()]
+        if not buckets:
+            return self._products
+        return min(buckets, key=len)
+
+    def query(self, category: Optional[str] = None, farmer_id: Optional[str] = None,
+              status: Optional[str] = None, ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Products matching every given filter, in creation order.
+
+        ``ids`` (e.g. ranked search hits) restricts the result to those
+        products and keeps their order.
+        """
+        filters = {field: value for field, value in
+                   (('category', category), ('farmerId', farmer_id), ('status', status)) if value}
+        with self._lock:
+            products = self._products
+            candidates = list(ids) if ids is not None else list(self._candidate_ids(filters))
+            return [products[product_id] for product_id in candidates if product_id in products
+                    and all(products[product_id].get(field) == value for field, value in filters.items())]
+
+    def counts(self, field: str) -> Dict[Any, int]:
+        """Products per value of an indexed field"""
+        with self._lock:
+            return self._field_indexes[field].counts()
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            return iter(list(self._products.values()))
+
+
+def _encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or not isinstance(payload.get('k'), list):
+            raise ValueError
+        return payload
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+
+def _cursor_key(values: List[Any], value_type: type) -> tuple:
+    """Cursor sort key as a tuple comparable with the sort's keys (ValueError if it is not)"""
+    if len(values) != 2 or not isinstance(values[1], str) or isinstance(values[0], bool):
+        raise ValueError('Invalid cursor')
+    if value_type is float and isinstance(values[0], (int, float)):
+        return float(values[0]), values[1]
+    if value_type is str and isinstance(values[0], str):
+        return values[0], values[1]
+    raise ValueError('Invalid cursor')
+
+
+def query_fingerprint(params: Dict[str, Any]) -> str:
+    """Short hash of the filters a cursor was issued for"""
+    raw = json.dumps({key: value for key, value in params.items() if value}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def paginate(products: List[Dict[str, Any]], sort: Optional[str] = None, limit: int = 50,
+             cursor: Optional[str] = None, fingerprint: str = '',
+             rankings: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Any]:
+    """Select one page of ``products``.
+
+    ``sort`` is a key of ``SORT_KEYS`` (``-`` prefix for descending), an
+    alias such as ``newest``, or the name of one of ``rankings`` (e.g.
+    ``relevance``: product id -> search rank, ``distance``: product id ->
+    km). Rankings sort ascending; the first one is the default sort when
+    given, creation order otherwise. Raises ValueError for an unknown sort
+    or for a cursor from a different query or sort.
+    """
+    rankings = rankings or {}
+    sort = SORT_ALIASES.get(sort, sort) or next(iter(rankings), 'createdAt')
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field in rankings:
+        descending = False
+        ranking = rankings[field]
+        key = lambda product: (ranking.get(product['id'], math.inf), product['id'])
+        value_type = float
+    elif field in RANKED_SORTS:
+        raise ValueError(f"Sort '{field}' requires {RANKED_SORTS[field]}")
+    elif field in SORT_KEYS:
+        key = SORT_KEYS[field]
+        value_type = SORT_VALUE_TYPES[field]
+    else:
+        names = ', '.join(sorted({*SORT_KEYS, *RANKED_SORTS}))
+        raise ValueError(f"Unknown sort '{sort}' (use {names}, '-' for descending)")
+
+    if cursor:
+        state = _decode_cursor(cursor)
+        if state.get('s') != sort or state.get('f') != fingerprint:
+            raise ValueError('Cursor does not match this query')
+        last = _cursor_key(state['k'], value_type)
+        if descending:
+            products = [product for product in products if key(product) < last]
+        else:
+            products = [product for product in products if key(product) > last]
+
+    select = heapq.nlargest if descending else heapq.nsmallest
+    page = select(limit + 1, products, key=key)
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        'products': page,
+        'sort': sort,
+        'hasMore': has_more,
+        'nextCursor': _encode_cursor({'s': sort, 'f': fingerprint, 'k': list(key(page[-1]))})
+                      if has_more else None
+    }
+
+
+def project(products: Iterable[Dict[str, Any]], fields: Optional[Iterable[str]]) -> List[Dict[str, Any]]:
+    """Copy only ``fields`` (plus ``id``) of each product; all fields when None"""
+    if not fields:
+        return list(products)
+    fields = ('id', *(field for field in fields if field != 'id'))
+    return [{field: product[field] for field in fields if field in product} for product in products]
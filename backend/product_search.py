@@ -0,0 +1,283 @@
+"""
+Product Listing Search
+======================
+
+Incremental inverted index over marketplace listings, attached to the
+``ProductCatalog`` (see ``product_catalog.add_index``). Creating, updating
+or deleting a listing re-indexes only that listing.
+
+Each token of a listing's name, category and description is indexed under
+three keys:
+
+- the token itself (``tomato``, ``टमाटर``),
+- a phonetic key, which folds spelling variants of romanized Hindi
+  (``tamaatar`` and ``tamatar``; ``aloo`` and ``alu``). Devanagari is
+  romanized first, so ``टमाटर`` and ``tamatar`` share a key,
+- the canonical produce name when the token is a known crop name in
+  English, Hindi or romanized Hindi (``धान``, ``dhan``, ``paddy`` -> rice).
+
+A query token matches a listing through any of its keys, exactly or as a
+prefix (``tom``, ``gehu``). Every query token must match. Results are
+ranked by the best match per token, weighted by field (name > category >
+description), by match kind (exact > transliterated > prefix) and by IDF;
+ties go to the newest listing.
+Prefixes are found by bisecting a sorted vocabulary, so search cost depends
+on the matched postings, not on the catalog size.
+"""
+
+import bisect
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from knowledge_retriever import tokenize
+
+FIELD_WEIGHTS = (('productName', 3.0), ('category', 1.5), ('description', 1.0))
+EXACT, PHONETIC, PRODUCE = 1.0, 0.8, 0.9
+PREFIX_FACTOR = 0.5
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_TERMS = 64
+
+# Marketplace produce names: English -> Hindi and common romanized spellings
+PRODUCE_NAMES = {
+    'rice': ('धान', 'चावल', 'dhan', 'chawal', 'paddy', 'basmati'),
+    'wheat': ('गेहूं', 'गेहूँ', 'gehun', 'gehu', 'gehoon'),
+    'maize': ('मक्का', 'भुट्टा', 'makka', 'makki', 'bhutta', 'corn'),
+    'cotton': ('कपास', 'kapas'),
+    'sugarcane': ('गन्ना', 'ganna'),
+    'mustard': ('सरसों', 'sarson', 'sarso'),
+    'chickpea': ('चना', 'chana', 'gram'),
+    'lentil': ('मसूर', 'masoor', 'masur'),
+    'pigeonpea': ('अरहर', 'तूर', 'arhar', 'toor', 'tur'),
+    'soybean': ('सोयाबीन', 'soyabean', 'soya'),
+    'groundnut': ('मूंगफली', 'moongfali', 'mungfali', 'peanut'),
+    'millet': ('बाजरा', 'bajra'),
+    'sorghum': ('ज्वार', 'jowar', 'jwar'),
+    'tomato': ('टमाटर', 'tamatar'),
+    'onion': ('प्याज', 'प्याज़', 'pyaz', 'pyaj', 'kanda'),
+    'potato': ('आलू', 'aloo', 'alu'),
+    'brinjal': ('बैंगन', 'baingan', 'eggplant'),
+    'okra': ('भिंडी', 'bhindi', 'ladyfinger'),
+    'cauliflower': ('फूलगोभी', 'gobhi', 'gobi'),
+    'cabbage': ('पत्तागोभी', 'bandgobhi', 'pattagobhi'),
+    'chilli': ('मिर्च', 'mirch', 'mirchi', 'chili'),
+    'garlic': ('लहसुन', 'lahsun', 'lehsun'),
+    'ginger': ('अदरक', 'adrak'),
+    'turmeric': ('हल्दी', 'haldi'),
+    'banana': ('केला', 'kela'),
+    'mango': ('आम', 'aam'),
+    'milk': ('दूध', 'doodh', 'dudh'),
+}
+
+_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n', 'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh',
+    'ञ': 'n', 'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n', 'त': 't', 'थ': 'th', 'द': 'd',
+    'ध': 'dh', 'न': 'n', 'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm', 'य': 'y', 'र': 'r',
+    'ल': 'l', 'व': 'v', 'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h', 'ळ': 'l', 'क़': 'q', 'ख़': 'kh',
+    'ग़': 'g', 'ज़': 'z', 'ड़': 'r', 'ढ़': 'rh', 'फ़': 'f', 'य़': 'y',
+}
+_VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ii', 'उ': 'u', 'ऊ': 'uu', 'ऋ': 'ri', 'ए': 'e', 'ऐ': 'ai',
+    'ओ': 'o', 'औ': 'au', 'ऑ': 'o',
+}
+_VOWEL_SIGNS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ii', 'ु': 'u', 'ू': 'uu', 'ृ': 'ri', 'े': 'e', 'ै': 'ai', 'ो': 'o',
+    'ौ': 'au', 'ॉ': 'o',
+}
+_NASALS = {'ं': 'n', 'ँ': 'n', 'ः': 'h'}
+_VIRAMA = '्'
+_NUKTA = '़'
+
+# Applied in order to build phonetic keys
+_PHONETIC_RULES = (
+    ('chh', 'ch'), ('ph', 'f'), ('kh', 'k'), ('gh', 'g'), ('jh', 'j'), ('th', 't'), ('dh', 'd'),
+    ('bh', 'b'), ('sh', 's'), ('aa', 'a'), ('ee', 'i'), ('ii', 'i'), ('oo', 'u'), ('uu', 'u'),
+    ('w', 'v'), ('z', 'j'), ('q', 'k'), ('y', 'i'),
+)
+
+
+def romanize(token: str) -> str:
+    """Romanize a Devanagari token (schwa dropped word-finally and before vowel signs)"""
+    if token.isascii():
+        return token
+    output = []
+    chars = list(token)
+    for index, char in enumerate(chars):
+        if char == _NUKTA:
+            continue
+        if index + 1 < len(chars) and chars[index + 1] == _NUKTA and char + _NUKTA in _CONSONANTS:
+            char = char + _NUKTA
+        if char in _CONSONANTS:
+            output.append(_CONSONANTS[char])
+            following = next((c for c in chars[index + 1:] if c != _NUKTA), None)
+            if following is not None and following not in _VOWEL_SIGNS and following != _VIRAMA \
+                    and following not in _NASALS:
+                output.append('a')
+        elif char in _VOWELS:
+            output.append(_VOWELS[char])
+        elif char in _VOWEL_SIGNS:
+            output.append(_VOWEL_SIGNS[char])
+        elif char in _NASALS:
+            output.append(_NASALS[char])
+        elif char.isascii():
+            output.append(char)
+    return ''.join(output)
+
+
+def phonetic_key(token: str) -> str:
+    """Spelling-insensitive key for romanized (or Devanagari) words"""
+    key = romanize(token)
+    if not key.isascii() or not key:
+        return ''
+    for pattern, replacement in _PHONETIC_RULES:
+        key = key.replace(pattern, replacement)
+    # Collapse doubled letters ("makka" / "maka")
+    return ''.join(char for index, char in enumerate(key) if index == 0 or char != key[index - 1])
+
+
+class ProductSearchIndex:
+    """Field-weighted inverted index with prefix and transliterated matching"""
+
+    def __init__(self, crop_synonyms: Optional[Dict[str, Iterable[str]]] = None):
+        self.produce_aliases: Dict[str, str] = {}
+        for canonical, names in list(PRODUCE_NAMES.items()) + list((crop_synonyms or {}).items()):
+            for name in (canonical, *names):
+                for token in tokenize(name):
+                    self.produce_aliases.setdefault(token, canonical)
+                    key = phonetic_key(token)
+                    if key:
+                        self.produce_aliases.setdefault('~' + key, canonical)
+        # term -> {product id: best field weight}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._created: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    def _keys(self, token: str) -> List[Tuple[str, float]]:
+        """Index keys of one token with their match weights"""
+        keys = [(token, EXACT)]
+        key = phonetic_key(token)
+        if key:
+            keys.append(('~' + key, PHONETIC))
+        canonical = (self.produce_aliases.get(token) or (key and self.produce_aliases.get('~' + key))
+                     # Plural folding leaves "tomatoe", "chillie"
+                     or (token.endswith('e') and self.produce_aliases.get(token[:-1])))
+        if canonical:
+            keys.append(('#' + canonical, PRODUCE))
+        return keys
+
+    def add(self, product: Dict[str, Any]):
+        terms: Dict[str, float] = {}
+        for field, field_weight in FIELD_WEIGHTS:
+            for token in tokenize(str(product.get(field) or '')):
+                for term, match_weight in self._keys(token):
+                    weight = field_weight * match_weight
+                    if weight > terms.get(term, 0.0):
+                        terms[term] = weight
+        product_id = product['id']
+        with self._lock:
+            if product_id in self._doc_terms:
+                self._remove_id(product_id)
+            for term, weight in terms.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = {}
+                    bisect.insort(self._vocabulary, term)
+                posting[product_id] = weight
+            self._doc_terms[product_id] = tuple(terms)
+            self._created[product_id] = str(product.get('createdAt') or '')
+
+    def remove(self, product: Dict[str, Any]):
+        with self._lock:
+            self._remove_id(product['id'])
+
+    def _remove_id(self, product_id: str):
+        self._created.pop(product_id, None)
+        for term in self._doc_terms.pop(product_id, ()):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(product_id, None)
+            if not posting:
+                del self.postings[term]
+                position = bisect.bisect_left(self._vocabulary, term)
+                if position < len(self._vocabulary) and self._vocabulary[position] == term:
+                    del self._vocabulary[position]
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + '\uffff', start)
+        return self._vocabulary[start:min(end, start + MAX_PREFIX_TERMS)]
+
+    def _idf(self, term: str) -> float:
+        total = max(1, len(self._doc_terms))
+        frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+
+    def _match_terms(self, token: str) -> List[Tuple[Dict[str, float], float]]:
+        """(posting, factor) for every index term a query token matches"""
+        matches = []
+        for term, match_weight in self._keys(token):
+            candidates = [(term, 1.0)]
+            if len(token) >= MIN_PREFIX_LENGTH and not term.startswith('#'):
+                candidates.extend((prefixed, PREFIX_FACTOR) for prefixed in self._prefix_terms(term)
+                                  if prefixed != term)
+            for candidate, prefix_factor in candidates:
+                posting = self.postings.get(candidate)
+                if posting:
+                    matches.append((posting, match_weight * prefix_factor * self._idf(candidate)))
+        return matches
+
+    @staticmethod
+    def _score(matches: List[Tuple[Dict[str, float], float]],
+               restrict: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Best score per listing for one query token, optionally only for ``restrict`` ids"""
+        scores: Dict[str, float] = {}
+        for posting, factor in matches:
+            if restrict is not None and len(restrict) < len(posting):
+                pairs = ((product_id, posting[product_id]) for product_id in restrict if product_id in posting)
+            else:
+                pairs = posting.items()
+            for product_id, weight in pairs:
+                if restrict is not None and product_id not in restrict:
+                    continue
+                score = weight * factor
+                if score > scores.get(product_id, 0.0):
+                    scores[product_id] = score
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> Optional[List[Tuple[str, float]]]:
+        """Ranked ``(product id, score)`` pairs matching every query token.
+
+        Returns None when the query has no searchable tokens (only stopwords
+        or punctuation), so callers can treat it as "no search".
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return None
+        with self._lock:
+            # Rarest token first: later tokens only score listings still in the running
+            matched = sorted((self._match_terms(token) for token in tokens),
+                             key=lambda matches: sum(len(posting) for posting, _ in matches))
+            totals: Optional[Dict[str, float]] = None
+            for matches in matched:
+                scores = self._score(matches, totals)
+                totals = scores if totals is None else {
+                    product_id: totals[product_id] + score for product_id, score in scores.items()}
+                if not totals:
+                    return []
+            # Equal scores: newest listing first
+            created = self._created
+            ranked = sorted(sorted(totals.items(), key=lambda item: created.get(item[0], ''), reverse=True),
+                            key=lambda item: -item[1])
+        return ranked[:limit] if limit else ranked
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'documents': len(self._doc_terms),
+                'terms': len(self.postings),
+                'postings': sum(len(posting) for posting in self.postings.values()),
+                'produce_aliases': len(self.produce_aliases)
+            }
@@ -0,0 +1,138 @@
+"""
+Compact Prompt Builder for Groq Requests
+========================================
+
+Builds the chat messages sent to the Groq API. The system prompt is a single
+module-level constant so the prompt prefix is byte-identical on every request
+(which lets provider-side prefix caching kick in), and the per-request user
+block only carries what actually changes: detected language, region, any
+retrieved reference notes and the farmer's question. Token counts are
+estimated per request and logged.
+"""
+
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Everything that is the same for every request lives here. The response
+# rules that used to be repeated in every user block are stated once.
+SYSTEM_PROMPT = """You are Annapurna, an expert agricultural advisor for Indian farmers.
+
+Expertise: all major crops (cereals, pulses, oilseeds, vegetables, fruits, cash crops); modern, traditional, organic and precision farming; crop rotation and intercropping; soil fertility, plant nutrition and fertilizers; irrigation and water management; pests, diseases and IPM; farm machinery; market prices; government schemes and subsidies.
+
+Rules:
+1. Reply entirely in the user's language (Hindi, English, Punjabi, Tamil, Telugu, Bengali, Marathi, Gujarati, Kannada or Malayalam).
+2. Tailor advice to the region given in the request: local crops and varieties, climate, soil, pests and farming traditions.
+3. Use regional units (acre, bigha, hectare, quintal) and local crop names.
+4. Be practical and specific: quantities, costs in ₹, timing.
+5. Mention relevant state or central government schemes and agricultural universities when useful.
+6. Use simple, farmer-friendly language, short sections and a few emojis.
+7. Include safety warnings for chemicals and consider economic viability.
+8. When reference notes are given, base quantities, varieties and timings on them."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a string without a tokenizer.
+
+    Uses ~4 UTF-8 bytes per token, which tracks Llama-style BPE closely for
+    English and stays conservative for Indic scripts (3 bytes per character).
+    """
+    if not text:
+        return 0
+    return max(1, (len(text.encode('utf-8')) + 3) // 4)
+
+
+class PromptBuilder:
+    """Builds compact, cache-friendly chat messages for Groq"""
+
+    def __init__(self, system_prompt: str = SYSTEM_PROMPT):
+        self.system_prompt = system_prompt
+        self.system_tokens = estimate_tokens(system_prompt)
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'prompt_tokens_estimated': 0,
+            'prompt_tokens_reported': 0,
+            'completion_tokens_reported': 0,
+            'cached_tokens_reported': 0
+        }
+
+    def build_user_block(self, user_message: str, lang_info: Dict[str, Any],
+                         passages: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Build the per-request user block (only the parts that vary)"""
+        lines = [f"Language: {lang_info.get('language', 'english').title()}"]
+        region = lang_info.get('region')
+        if region:
+            lines.append(f"Region: {region}")
+        common_crops = lang_info.get('common_crops') or []
+        if common_crops:
+            lines.append(f"Common crops: {', '.join(common_crops)}")
+        if passages:
+            lines.append("Reference notes:")
+            lines.extend(f"- {passage['text']}" for passage in passages)
+        lines.append(f"Question: {user_message}")
+        return '\n'.join(lines)
+
+    def build_messages(self, user_message: str, lang_info: Dict[str, Any],
+                       history: Optional[List[Dict[str, str]]] = None,
+                       passages: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Build the messages list and its estimated token usage.
+
+        The system message always comes first and never changes, so the
+        request prefix stays identical across users and turns. Retrieved
+        ``passages`` go in the user block, after that fixed prefix.
+        """
+        user_block = self.build_user_block(user_message, lang_info, passages)
+        messages = [{"role": "system", "content": self.system_prompt}]
+        history_tokens = 0
+        for turn in history or []:
+            messages.append(turn)
+            history_tokens += estimate_tokens(turn.get('content', ''))
+        messages.append({"role": "user", "content": user_block})
+
+        user_tokens = estimate_tokens(user_block)
+        return {
+            'messages': messages,
+            'tokens': {
+                'system': self.system_tokens,
+                'history': history_tokens,
+                'user': user_tokens,
+                'total': self.system_tokens + history_tokens + user_tokens
+            }
+        }
+
+    def record_usage(self, estimated_tokens: int, usage: Optional[Dict[str, Any]] = None,
+                     language: str = 'unknown'):
+        """Record and log token usage for one request.
+
+        ``usage`` is the ``usage`` object returned by the OpenAI-compatible
+        API, when available.
+        """
+        usage = usage or {}
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        completion_tokens = usage.get('completion_tokens') or 0
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['prompt_tokens_estimated'] += estimated_tokens
+            self.stats['prompt_tokens_reported'] += prompt_tokens
+            self.stats['completion_tokens_reported'] += completion_tokens
+            self.stats['cached_tokens_reported'] += cached_tokens
+
+        logger.info(
+            f"📏 prompt_tokens_estimated={estimated_tokens} prompt_tokens={prompt_tokens} "
+            f"completion_tokens={completion_tokens} cached_tokens={cached_tokens} language={language}"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get aggregated token metrics"""
+        with self._lock:
+            stats = dict(self.stats)
+        requests_count = stats['requests'] or 1
+        stats['system_prompt_tokens'] = self.system_tokens
+        stats['avg_prompt_tokens_estimated'] = round(stats['prompt_tokens_estimated'] / requests_count, 1)
+        stats['avg_prompt_tokens_reported'] = round(stats['prompt_tokens_reported'] / requests_count, 1)
+        return stats
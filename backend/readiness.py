@@ -0,0 +1,122 @@
+"""
+Readiness and Model Warm-up
+===========================
+
+Separates liveness from readiness. ``/healthz`` answers as soon as the
+process serves HTTP. ``/readyz`` returns 503 until every required warm-up
+task has finished (the retrieval index and knowledge cache touched), so
+load balancers and container health checks only send traffic to
+instances that can answer at full speed. The disease model (loaded and
+run once, since Keras builds its predict graph on the first call) is an
+optional task: its endpoint answers 503 on its own until it is ready, and
+a model that fails to load does not take chat out of rotation.
+
+Warm-up tasks run in order on a background thread, so the worker binds,
+accepts connections and reports liveness immediately. Under gunicorn,
+``post_worker_init`` only logs when warm-up finishes (see
+``gunicorn.conf.py``). Blocking there would leave no worker accepting
+during a reload, because gunicorn stops the old workers at once.
+
+An optional task that fails leaves the service ready but ``degraded``.
+A required task that fails keeps it unready.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class Readiness:
+    """Tracks warm-up tasks and whether the service may receive traffic"""
+
+    def __init__(self):
+        self._tasks: List[Tuple[str, Callable[[], Any], bool]] = []
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self.started_at = time.monotonic()
+
+    def add_task(self, name: str, task: Callable[[], Any], required: bool = True):
+        """Register a warm-up step; its return value is reported as ``detail``"""
+        with self._lock:
+            self._tasks.append((name, task, required))
+            self._components[name] = {'state': PENDING, 'required': required}
+
+    def start(self) -> 'Readiness':
+        """Run the registered tasks on a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='warm-up', daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up has finished (or ``timeout``); returns whether the service is ready"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def _run(self):
+        try:
+            self._warm_up()
+        finally:
+            self._done.set()
+
+    def _warm_up(self):
+        for name, task, required in list(self._tasks):
+            self._update(name, state=RUNNING)
+            start = time.perf_counter()
+            try:
+                detail = task()
+            except Exception as e:
+                self._update(name, state=FAILED, error=str(e),
+                             seconds=round(time.perf_counter() - start, 3))
+                log = logger.error if required else logger.warning
+                log(f"❌ Warm-up '{name}' failed: {e}")
+                continue
+            self._update(name, state=READY, detail=detail, seconds=round(time.perf_counter() - start, 3))
+            logger.info(f"🔥 Warm-up '{name}' done in {time.perf_counter() - start:.2f}s")
+        if self.ready:
+            logger.info(f"✅ Service ready after {time.monotonic() - self.started_at:.1f}s")
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self._components[name].update(fields)
+
+    def state(self, name: str) -> Optional[str]:
+        """State of one warm-up task (``pending``/``running``/``ready``/``failed``), None if unknown"""
+        with self._lock:
+            component = self._components.get(name)
+            return component['state'] if component is not None else None
+
+    @property
+    def warming(self) -> bool:
+        """Whether warm-up tasks are still running"""
+        return self._thread is not None and not self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(
+                component['state'] == READY for component in self._components.values() if component['required'])
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {name: dict(component) for name, component in self._components.items()}
+        ready = self.ready
+        return {
+            'ready': ready,
+            'degraded': ready and any(component['state'] != READY for component in components.values()),
+            'warming': self.warming,
+            'uptime_seconds': round(time.monotonic() - self.started_at, 1),
+            'components': components,
+            'timestamp': datetime.now().isoformat()
+        }
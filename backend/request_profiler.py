@@ -0,0 +1,355 @@
+"""
+Per-Request Profiling
+=====================
+
+Opt-in profiling of single requests, for finding out where a slow ``/api/chat``
+or image request spent its time. A profiled request records:
+
+- span timings from ``span(name)`` blocks (language detection, retrieval,
+  prompt building, the LLM call, image decode/preprocess, model predict),
+- a wall-clock stack profile, sampled every few milliseconds by one
+  background thread from ``sys._current_frames()``. It needs no tracing
+  hooks, so unprofiled requests run at full speed.
+
+Each profile is written to ``PROFILE_DIR`` as two files:
+
+- ``<id>.folded``: collapsed stacks, prefixed with thread and span names.
+  Open it in speedscope, or render it with ``flamegraph.pl`` / ``inferno``.
+- ``<id>.trace.json``: Chrome trace-event spans for ``chrome://tracing`` or Perfetto.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_TOKEN>``, or when it is
+randomly sampled at ``PROFILE_SAMPLE_RATE``. At most ``PROFILE_MAX_CONCURRENT``
+requests are profiled at once. Extra requests are served unprofiled. Files
+are written off the request thread, and only the newest ``PROFILE_MAX_FILES``
+are kept, so a low sampling rate is safe to leave on in production.
+
+Environment:
+
+- ``PROFILE_SAMPLE_RATE``: fraction of requests to profile (default 0)
+- ``PROFILE_TOKEN``: secret that enables the ``X-Profile`` header (header ignored if unset)
+- ``PROFILE_PATHS``: comma-separated path prefixes eligible for profiling
+- ``PROFILE_INTERVAL_MS``: stack sampling interval (default 5)
+- ``PROFILE_MAX_CONCURRENT``: simultaneous profiled requests (default 2)
+- ``PROFILE_DIR``: output directory (default ``profiles/``)
+- ``PROFILE_MAX_FILES``: profiles kept on disk (default 200)
+"""
+
+import contextvars
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+MAX_STACK_DEPTH = 128
+_UNSAFE_ID_CHARS = re.compile(r'[^A-Za-z0-9_-]')
+
+_active_profile = contextvars.ContextVar('active_profile', default=None)
+
+
+class Profile:
+    """Spans and stack samples of one request"""
+
+    def __init__(self, profile_id: str, method: str, path: str, trigger: str, sampler: '_Sampler'):
+        self.profile_id = profile_id
+        self.sampler = sampler
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = datetime.now().isoformat()
+        self.origin = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.closed = False
+        # Thread id -> (thread name, list of currently open span names)
+        self.threads: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def attach_thread(self) -> list:
+        thread = threading.current_thread()
+        with self._lock:
+            entry = self.threads.get(thread.ident)
+            if entry is None:
+                entry = self.threads[thread.ident] = (thread.name, [])
+        return entry[1]
+
+    def add_span(self, name: str, start: float, end: float, thread_name: str, attributes: Dict[str, Any]):
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'start_ms': round((start - self.origin) * 1000, 3),
+                'duration_ms': round((end - start) * 1000, 3),
+                'thread': thread_name,
+                'attributes': attributes
+            })
+
+    def add_sample(self, thread_id: int, frame):
+        entry = self.threads.get(thread_id)
+        if entry is None or self.closed:
+            return
+        thread_name, open_spans = entry
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        prefix = [thread_name] + [f"[{name}]" for name in list(open_spans)]
+        with self._lock:
+            self.samples[';'.join(prefix + stack)] += 1
+            self.sample_count += 1
+
+    def folded(self) -> str:
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def trace(self, total_ms: float, status: Optional[int]) -> Dict[str, Any]:
+        thread_ids = {name: index for index, name in enumerate(sorted({span['thread'] for span in self.spans}))}
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+                  for name, tid in thread_ids.items()]
+        events.extend({
+            'name': span['name'], 'ph': 'X', 'pid': 1, 'tid': thread_ids[span['thread']],
+            'ts': span['start_ms'] * 1000, 'dur': span['duration_ms'] * 1000, 'args': span['attributes']
+        } for span in self.spans)
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'profile_id': self.profile_id, 'method': self.method, 'path': self.path,
+                'trigger': self.trigger, 'started_at': self.started_at, 'status': status,
+                'total_ms': round(total_ms, 3), 'stack_samples': self.sample_count
+            }
+        }
+
+
+class _Sampler:
+    """One daemon thread that samples the stacks of every thread with an active profile"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: Dict[int, Profile] = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def track(self, thread_id: int, profile: Profile):
+        with self._condition:
+            self._profiles[thread_id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def untrack(self, thread_id: int, profile: Profile):
+        with self._condition:
+            if self._profiles.get(thread_id) is profile:
+                del self._profiles[thread_id]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._profiles:
+                    self._condition.wait()
+                tracked = list(self._profiles.items())
+            frames = sys._current_frames()
+            for thread_id, profile in tracked:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.add_sample(thread_id, frame)
+            del frames
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes their profiles to disk"""
+
+    def __init__(self, sample_rate: float = 0.0, token: Optional[str] = None,
+                 paths: tuple = ('/api/',), interval_ms: float = 5.0, max_concurrent: int = 2,
+                 output_dir: str = 'profiles', max_files: int = 200):
+        self.sample_rate = sample_rate
+        self.token = token
+        self.paths = tuple(paths)
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._sampler = _Sampler(interval_ms / 1000.0)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profile-writer')
+        self.stats = {'profiled': 0, 'skipped_busy': 0, 'written': 0, 'write_errors': 0}
+
+    @classmethod
+    def from_env(cls) -> 'RequestProfiler':
+        return cls(
+            sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+            token=os.getenv('PROFILE_TOKEN') or None,
+            paths=tuple(p.strip() for p in os.getenv(
+                'PROFILE_PATHS', '/api/chat,/api/expert-advice,/api/crop-disease-detection,/api/crop-image-analysis'
+            ).split(',') if p.strip()),
+            interval_ms=float(os.getenv('PROFILE_INTERVAL_MS', 5)),
+            max_concurrent=int(os.getenv('PROFILE_MAX_CONCURRENT', 2)),
+            output_dir=os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')),
+            max_files=int(os.getenv('PROFILE_MAX_FILES', 200))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.token is not None
+
+    def _trigger(self, path: str, header: Optional[str]) -> Optional[str]:
+        if not path.startswith(self.paths):
+            return None
+        if header and self.token and hmac.compare_digest(header, self.token):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def start(self, profile_id: str, method: str, path: str, header: Optional[str] = None):
+        """Begin profiling the current request if it qualifies; returns a token for ``finish``"""
+        trigger = self._trigger(path, header)
+        if trigger is None:
+            return None
+        if not self._slots.acquire(blocking=False):
+            self.stats['skipped_busy'] += 1
+            return None
+        profile = Profile(profile_id, method, path, trigger, self._sampler)
+        profile.attach_thread()
+        self._sampler.track(threading.get_ident(), profile)
+        self.stats['profiled'] += 1
+        return profile, _active_profile.set(profile)
+
+    def finish(self, token, status: Optional[int] = None) -> Optional[str]:
+        """Stop profiling and queue the files for writing; returns the profile id"""
+        if token is None:
+            return None
+        profile, context_token = token
+        try:
+            _active_profile.reset(context_token)
+        except ValueError:
+            _active_profile.set(None)
+        self._sampler.untrack(threading.get_ident(), profile)
+        profile.closed = True
+        self._slots.release()
+        total_ms = (time.perf_counter() - profile.origin) * 1000
+        self._writer.submit(self._write, profile, total_ms, status)
+        return profile.profile_id
+
+    def _write(self, profile: Profile, total_ms: float, status: Optional[int]):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, profile.profile_id)
+            with open(f"{base}.folded", 'w', encoding='utf-8') as f:
+                f.write(profile.folded())
+            with open(f"{base}.trace.json", 'w', encoding='utf-8') as f:
+                json.dump(profile.trace(total_ms, status), f)
+            self.stats['written'] += 1
+            logger.info(f"🔥 Profile written: {base}.folded", extra={
+                'path': profile.path, 'total_ms': round(total_ms, 2), 'stack_samples': profile.sample_count
+            })
+            self._prune()
+        except OSError as e:
+            self.stats['write_errors'] += 1
+            logger.warning(f"⚠️ Could not write profile {profile.profile_id}: {e}")
+
+    def _prune(self):
+        entries = sorted((entry for entry in os.scandir(self.output_dir)
+                          if entry.name.endswith(('.folded', '.trace.json'))),
+                         key=lambda entry: entry.stat().st_mtime)
+        # Two files per profile
+        for entry in entries[:max(0, len(entries) - 2 * self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'header_enabled': self.token is not None,
+            'interval_ms': self._sampler.interval * 1000,
+            'output_dir': self.output_dir,
+            **self.stats
+        }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a named span of the current request's profile (no-op when not profiling)"""
+    profile = _active_profile.get()
+    if profile is None:
+        yield attributes
+        return
+    open_spans = profile.attach_thread()
+    open_spans.append(name)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        end = time.perf_counter()
+        open_spans.pop()
+        profile.add_span(name, start, end, threading.current_thread().name, attributes)
+
+
+def propagate(fn: Callable) -> Callable:
+    """Wrap ``fn`` for another thread: it runs in a copy of the caller's context
+    (request id, active profile), and that thread is sampled while a profile is active"""
+    context = contextvars.copy_context()
+    profile = context.get(_active_profile)
+    if profile is None:
+        return functools.partial(context.run, fn)
+
+    def run(*args, **kwargs):
+        profile.attach_thread()
+        profile.sampler.track(threading.get_ident(), profile)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.sampler.untrack(threading.get_ident(), profile)
+
+    return functools.partial(context.run, run)
+
+
+def init_profiler(app, profiler: Optional[RequestProfiler] = None) -> RequestProfiler:
+    """Install the profiling hooks on a Flask app"""
+    from flask import g, request
+
+    profiler = profiler or RequestProfiler.from_env()
+    if not profiler.enabled:
+        return profiler
+
+    @app.before_request
+    def _profile_start():
+        # The request id may come from a client header: keep it filename-safe
+        request_id = _UNSAFE_ID_CHARS.sub('', getattr(g, 'request_id', None) or '')[:64] or os.urandom(6).hex()
+        profile_id = f"{datetime.now():%Y%m%dT%H%M%S}_{request_id}"
+        g.profile_token = profiler.start(profile_id, request.method, request.path,
+                                         request.headers.get(PROFILE_HEADER))
+
+    @app.after_request
+    def _profile_finish(response):
+        token = g.pop('profile_token', None)
+        if token is not None:
+            response.headers['X-Profile-Id'] = profiler.finish(token, response.status_code)
+        return response
+
+    @app.teardown_request
+    def _profile_abort(exc=None):
+        # Requests that failed before after_request still release their slot
+        profiler.finish(g.pop('profile_token', None))
+
+    logger.info(f"🔥 Request profiling enabled (sample rate {profiler.sample_rate}, "
+                f"header {'on' if profiler.token else 'off'}) -> {profiler.output_dir}")
+    return profiler
@@ -0,0 +1,54 @@
+"""
+Response Cache for AI Answers
+=============================
+
+Small thread-safe LRU cache with a time-to-live, used to keep recent Groq
+answers so a repeated question (or one whose Groq call finished after the
+latency budget) is answered without another API round trip. Only answers
+to questions sent without conversation history are cached.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a user question into a cache key component"""
+    return ' '.join(text.lower().split())
+
+
+class TTLCache:
+    """LRU cache whose entries expire after ``ttl_seconds``"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'ttl_seconds': self.ttl_seconds, **self.stats}
@@ -0,0 +1,147 @@
+"""
+Static Media Serving
+====================
+
+Serves the processed product images (see ``image_pipeline.py``) from a
+WSGI middleware mounted in front of Flask. Image requests never enter the
+Flask app: no routing, request hooks, store sync or access logging.
+
+- Filenames are content hashes, so every response is cacheable forever
+  (``Cache-Control: public, max-age=31536000, immutable``). The ETag is
+  derived from the filename and needs no disk read; ``If-None-Match``
+  returns 304.
+- The body goes out through ``wsgi.file_wrapper``. Under gunicorn (no TLS)
+  that is ``sendfile(2)``, a zero-copy transfer from the page cache to the
+  socket.
+- A single byte range (``Range: bytes=...``, honouring ``If-Range``) gets a
+  206 by seeking the file. gunicorn sends the partial body zero-copy too.
+  Multi-range requests get the whole file.
+- Only names the pipeline generates (``<ab>/<hash>_<size>.<ext>``) are
+  served, so paths cannot escape the media directory.
+
+Where a reverse proxy fronts the app, ``nginx/agribot.conf`` serves the same
+directory directly and Python sees no image traffic at all.
+"""
+
+import os
+import re
+from email.utils import formatdate
+from typing import Callable, Iterable, List, Optional, Tuple
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg', 'jpg': 'image/jpeg', 'png': 'image/png'}
+NAME_PATTERN = re.compile(r'^([0-9a-f]{2})/(\1[0-9a-f]{30}_\d+)\.(webp|jpeg|jpg|png)$')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """``(start, end)`` inclusive for a single-range header; None to send the whole file.
+
+    Raises ValueError for a syntactically valid but unsatisfiable range.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None  # Malformed or multi-range: ignore it (RFC 9110 allows a full response)
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('range not satisfiable')
+    return start, end
+
+
+def _file_chunks(f, length: int) -> Iterable[bytes]:
+    """Fallback body iterator for servers without ``wsgi.file_wrapper``"""
+    try:
+        while length > 0:
+            chunk = f.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class MediaFiles:
+    """WSGI middleware serving ``prefix/<name>`` from ``root``; everything else goes to ``app``"""
+
+    def __init__(self, app: Callable, prefix: str, root: str):
+        self.app = app
+        self.prefix = prefix.rstrip('/') + '/'
+        self.root = root
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.app(environ, start_response)
+        return self.serve(environ, start_response, path[len(self.prefix):])
+
+    def _error(self, start_response, status: str, headers: List[Tuple[str, str]] = ()) -> List[bytes]:
+        start_response(status, [('Content-Length', '0'), *headers])
+        return []
+
+    def serve(self, environ, start_response, name: str):
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if method not in ('GET', 'HEAD'):
+            return self._error(start_response, '405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+        match = NAME_PATTERN.match(name)
+        if not match:
+            return self._error(start_response, '404 Not Found')
+
+        etag = f'"{match.group(2)}.{match.group(3)}"'
+        headers = [('ETag', etag), ('Cache-Control', CACHE_CONTROL), ('Accept-Ranges', 'bytes')]
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (if_none_match.strip() == '*' or etag in
+                              [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]):
+            return self._error(start_response, '304 Not Modified', headers)
+
+        try:
+            f = open(os.path.join(self.root, name), 'rb')
+        except OSError:
+            return self._error(start_response, '404 Not Found')
+        try:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            byte_range = None
+            if_range = environ.get('HTTP_IF_RANGE')
+            if not if_range or if_range.strip() == etag:
+                byte_range = parse_range(environ.get('HTTP_RANGE'), size)
+        except ValueError:
+            f.close()
+            return self._error(start_response, '416 Range Not Satisfiable',
+                               [*headers, ('Content-Range', f'bytes */{size}')])
+        except OSError:
+            f.close()
+            return self._error(start_response, '404 Not Found')
+
+        headers += [('Content-Type', CONTENT_TYPES[match.group(3)]),
+                    ('Last-Modified', formatdate(stat.st_mtime, usegmt=True))]
+        if byte_range is None:
+            status, start, length = '200 OK', 0, size
+        else:
+            start, end = byte_range
+            status, length = '206 Partial Content', end - start + 1
+            headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+            f.seek(start)
+        headers.append(('Content-Length', str(length)))
+        start_response(status, headers)
+
+        if method == 'HEAD':
+            f.close()
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and start == 0 and length == size:
+            return file_wrapper(f, BLOCK_SIZE)
+        if file_wrapper is not None and environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+            # gunicorn sends Content-Length bytes from the file's current offset with sendfile()
+            return file_wrapper(f, BLOCK_SIZE)
+        return _file_chunks(f, length)
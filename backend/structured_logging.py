@@ -0,0 +1,207 @@
+"""
+Structured, Non-Blocking Logging
+================================
+
+Logging setup for the AgriBot backend. Request threads only put the log
+record on a bounded in-memory queue, which takes a few microseconds. A
+background listener thread formats the records and writes them to stdout.
+If the queue is full, records are dropped and counted, so a slow terminal or
+log shipper never stalls a worker. ``get_logging_stats`` reports the queue
+depth, dropped records and sampled-out access lines; the app serves it in
+``/api/model-info`` and as ``agribot_log_*`` gauges on ``/metrics``.
+
+Records are emitted as JSON lines (``LOG_FORMAT=json``) or as readable text
+with ``key=value`` fields (``LOG_FORMAT=text``, default). Secrets and personal
+data are redacted: sensitive field names (authorization, cookie, password,
+phone, ...) are masked, and bearer tokens, API keys, e-mail addresses and
+phone numbers are scrubbed from messages. Every record logged while a
+request is being handled carries that request's ``request_id``.
+
+Environment:
+
+- ``LOG_LEVEL``: root level (default ``INFO``)
+- ``LOG_FORMAT``: ``text`` or ``json``
+- ``LOG_QUEUE_SIZE``: maximum queued records before dropping (default 10000)
+- ``LOG_SAMPLE_RATE``: fraction of successful access-log lines kept (default 1.0);
+  warnings and errors are always kept
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+ACCESS_LOGGER = 'annapurna.access'
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+SENSITIVE_FIELDS = frozenset({
+    'authorization', 'cookie', 'set-cookie', 'x-api-key', 'api_key', 'apikey', 'password',
+    'token', 'access_token', 'refresh_token', 'secret', 'phone', 'phone_number', 'mobile',
+    'email', 'aadhaar', 'otp'
+})
+
+REDACTION_PATTERNS = (
+    (re.compile(r'(?i)bearer\s+[a-z0-9._\-]+'), 'Bearer [REDACTED]'),
+    (re.compile(r'\b(gsk|sk|xai)[-_][A-Za-z0-9_\-]{8,}'), '[REDACTED_KEY]'),
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), '[REDACTED_EMAIL]'),
+    (re.compile(r'(?<![\w+])(?:\+?91[\s-]?)?[6-9]\d{9}(?!\w)'), '[REDACTED_PHONE]'),
+)
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def redact_text(text: str) -> str:
+    """Scrub secrets and personal data from free text"""
+    for pattern, replacement in REDACTION_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def redact_fields(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Mask sensitive keys (recursively) and scrub string values"""
+    redacted = {}
+    for key, value in fields.items():
+        if str(key).lower() in SENSITIVE_FIELDS:
+            redacted[key] = '[REDACTED]'
+        elif isinstance(value, dict):
+            redacted[key] = redact_fields(value)
+        elif isinstance(value, str):
+            redacted[key] = redact_text(value)
+        else:
+            redacted[key] = value
+    return redacted
+
+
+def _record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_ATTRS and not key.startswith('_')}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact_text(record.getMessage()),
+            **redact_fields(_record_fields(record))
+        }
+        if record.exc_info:
+            entry['exc'] = redact_text(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic console format, followed by key=value fields"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = redact_text(super().format(record))
+        fields = redact_fields(_record_fields(record))
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            request_id = request_id_var.get()
+            if request_id:
+                record.request_id = request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING; keep every warning and error"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate:
+            return True
+        with self._lock:
+            self.sampled_out += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_sampling_filter: Optional[SamplingFilter] = None
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None) -> logging.Logger:
+    """Install the queue-backed handler on the root logger (idempotent)"""
+    global _listener, _queue_handler, _sampling_filter
+    root = logging.getLogger()
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    if _listener is not None:
+        return root
+
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'text')).lower()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(RequestContextFilter())
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    _sampling_filter = SamplingFilter(float(os.getenv('LOG_SAMPLE_RATE', 1.0)))
+    logging.getLogger(ACCESS_LOGGER).addFilter(_sampling_filter)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Queue depth, records dropped on a full queue, and access-log lines sampled out"""
+    if _queue_handler is None:
+        return {'configured': False}
+    return {
+        'configured': True,
+        'queued': _queue_handler.queue.qsize(),
+        'queue_size': _queue_handler.queue.maxsize,
+        'dropped': _queue_handler.dropped,
+        'sample_rate': _sampling_filter.rate,
+        'sampled_out': _sampling_filter.sampled_out
+    }
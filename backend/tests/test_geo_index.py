@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from geo_index import GeoIndex, haversine_km
+
+
+def make_points(count, seed=7):
+    rng = random.Random(seed)
+    points = {}
+    for number in range(count):
+        if number % 10 == 0:
+            # A few far-away listings so queries cross many empty rings
+            lat, lon = rng.uniform(-60, 70), rng.uniform(-170, 170)
+        else:
+            lat, lon = rng.uniform(8, 32), rng.uniform(70, 90)
+        points[f'P{number}'] = (round(lat, 5), round(lon, 5))
+    return points
+
+
+def build_index(points, cell_degrees):
+    index = GeoIndex(cell_degrees=cell_degrees)
+    for product_id, (lat, lon) in points.items():
+        index.add({'id': product_id, 'coordinates': {'lat': lat, 'lon': lon}})
+    return index
+
+
+def brute_force(points, lat, lon):
+    return sorted((haversine_km(lat, lon, plat, plon), product_id) for product_id, (plat, plon) in points.items())
+
+
+def queries(count, seed=11):
+    rng = random.Random(seed)
+    return [(rng.uniform(-20, 50), rng.uniform(60, 100)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('cell_degrees', [0.1, 0.25, 2.0])
+@pytest.mark.parametrize('k', [1, 5, 40])
+def test_nearest_matches_full_scan(cell_degrees, k):
+    points = make_points(400)
+    index = build_index(points, cell_degrees)
+    for lat, lon in queries(25):
+        expected = brute_force(points, lat, lon)[:k]
+        result = index.nearest(lat, lon, k)
+        assert [km for _, km in result] == pytest.approx([km for km, _ in expected])
+        assert {product_id for product_id, _ in result} == {product_id for _, product_id in expected}
+
+
+def test_nearest_respects_max_km():
+    points = make_points(300)
+    index = build_index(points, 0.25)
+    for lat, lon in queries(20):
+        expected = [item for item in brute_force(points, lat, lon) if item[0] <= 150][:10]
+        assert [product_id for product_id, _ in index.nearest(lat, lon, 10, max_km=150)] == \
+               [product_id for _, product_id in expected]
+
+
+@pytest.mark.parametrize('radius_km', [5, 60, 800, 5000])
+def test_within_matches_full_scan(radius_km):
+    points = make_points(400)
+    index = build_index(points, 0.25)
+    for lat, lon in queries(20):
+        expected = [product_id for km, product_id in brute_force(points, lat, lon) if km <= radius_km]
+        assert [product_id for product_id, _ in index.within(lat, lon, radius_km)] == expected
+
+
+def test_removed_points_are_not_returned():
+    points = make_points(200)
+    index = build_index(points, 0.25)
+    for product_id in list(points)[::2]:
+        index.remove({'id': product_id})
+        del points[product_id]
+    for lat, lon in queries(10):
+        expected = brute_force(points, lat, lon)[:8]
+        assert [product_id for product_id, _ in index.nearest(lat, lon, 8)] == \
+               [product_id for _, product_id in expected]
+    assert len(index) == len(points)
+
+
+def test_empty_index_and_non_positive_k():
+    index = GeoIndex()
+    assert index.nearest(20.0, 78.0, 5) == []
+    index.add({'id': 'P1', 'coordinates': {'lat': 20.0, 'lon': 78.0}})
+    assert index.nearest(20.0, 78.0, 0) == []
+    assert index.within(20.0, 78.0, 1) == [('P1', 0.0)]
@@ -0,0 +1,43 @@
+import math
+import random
+
+import pytest
+
+from knowledge_retriever import BM25Index
+
+VOCABULARY = ['rice', 'wheat', 'urea', 'npk', 'drip', 'aphid', 'kharif', 'rabi', 'soil', 'water', 'yield', 'seed']
+
+
+def reference_scores(documents, query, k1=1.5, b=0.75):
+    """Textbook Okapi BM25 over every document (no inverted index)"""
+    count = len(documents)
+    average = sum(len(terms) for terms in documents) / count
+    scores = {}
+    for doc_id, terms in enumerate(documents):
+        score = 0.0
+        for term in set(query):
+            frequency = terms.count(term)
+            if not frequency:
+                continue
+            containing = sum(term in other for other in documents)
+            idf = math.log(1 + (count - containing + 0.5) / (containing + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * len(terms) / average))
+        if score:
+            scores[doc_id] = score
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_bm25_matches_full_scan(seed):
+    rng = random.Random(seed)
+    documents = [[rng.choice(VOCABULARY) for _ in range(rng.randrange(1, 30))] for _ in range(80)]
+    index = BM25Index()
+    for doc_id, terms in enumerate(documents):
+        index.add({'id': doc_id}, terms)
+    index.build()
+    for _ in range(20):
+        query = rng.sample(VOCABULARY, rng.randrange(1, 4)) + ['unknown']
+        expected = reference_scores(documents, query)[:5]
+        result = index.search(query, top_k=5)
+        assert [document['id'] for document in result] == [doc_id for doc_id, _ in expected]
+        assert [document['score'] for document in result] == [round(score, 3) for _, score in expected]
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from price_stats import PriceSketch, PriceStats
+
+ACCURACY = 0.01
+QUANTILES = (('p10', 0.1), ('p25', 0.25), ('median', 0.5), ('p75', 0.75), ('p99', 0.99))
+
+
+def expected_quantile(values, q):
+    """The value the sketch's rank selection targets: index floor(q * (n - 1)) of the sorted values"""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def assert_close(estimate, exact):
+    # Relative sketch accuracy, plus rounding to paise
+    assert abs(estimate - exact) <= ACCURACY * exact + 0.005
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sketch_quantiles_within_accuracy(seed):
+    rng = random.Random(seed)
+    values = [round(rng.lognormvariate(3.5, 1.2), 2) + 0.01 for _ in range(rng.randrange(1, 3000))]
+    sketch = PriceSketch(ACCURACY)
+    for value in values:
+        sketch.add(value)
+    summary = sketch.summary(QUANTILES)
+    assert summary['count'] == len(values)
+    assert summary['min'] == round(min(values), 2)
+    assert summary['max'] == round(max(values), 2)
+    assert summary['mean'] == pytest.approx(sum(values) / len(values), abs=0.01)
+    for name, q in QUANTILES:
+        assert_close(summary[name], expected_quantile(values, q))
+
+
+def test_sketch_removal_matches_a_fresh_sketch():
+    rng = random.Random(9)
+    values = [round(rng.uniform(1, 5000), 2) for _ in range(1000)]
+    sketch = PriceSketch(ACCURACY)
+    for value in values:
+        sketch.add(value)
+    removed, kept = values[::3], [value for index, value in enumerate(values) if index % 3]
+    for value in removed:
+        sketch.remove(value)
+    summary = sketch.summary(QUANTILES)
+    assert summary['count'] == len(kept)
+    for name, q in QUANTILES:
+        assert_close(summary[name], expected_quantile(kept, q))
+
+
+def product(product_id, price, category='vegetables', district='Nashik, Maharashtra', unit='kg', status='active'):
+    return {'id': product_id, 'price': price, 'category': category, 'district': district, 'unit': unit,
+            'status': status}
+
+
+def make_stats():
+    return PriceStats(lambda item: item.get('district'), accuracy=ACCURACY)
+
+
+def test_groups_and_units_match_brute_force():
+    rng = random.Random(4)
+    stats = make_stats()
+    products = [product(f'P{number}', round(rng.uniform(5, 500), 2), rng.choice(['vegetables', 'grains']),
+                        rng.choice(['Nashik, Maharashtra', 'Indore, Madhya Pradesh']), rng.choice(['kg', 'quintal']))
+                for number in range(600)]
+    for item in products:
+        stats.add(item)
+    for category in (None, 'vegetables', 'grains'):
+        for district in (None, 'Nashik, Maharashtra', 'Indore, Madhya Pradesh'):
+            result = stats.stats(category, district)
+            for unit in ('kg', 'quintal'):
+                prices = [item['price'] for item in products if item['unit'] == unit
+                          and category in (None, item['category']) and district in (None, item['district'])]
+                assert result[unit]['count'] == len(prices)
+                assert_close(result[unit]['median'], expected_quantile(prices, 0.5))
+
+
+def test_update_remove_and_status_changes():
+    stats = make_stats()
+    stats.add(product('A', 10))
+    stats.add(product('B', 30))
+    stats.remove(product('A', 10))
+    stats.add(product('A', 20))
+    stats.add(product('C', 99, status='sold'))
+    assert stats.stats('vegetables')['kg']['count'] == 2
+    assert stats.stats('vegetables')['kg']['min'] == 20
+    stats.remove(product('B', 30))
+    stats.remove(product('A', 20))
+    assert stats.stats('vegetables') == {}
+    assert stats.get_stats()['groups'] == 0
+
+
+@pytest.mark.parametrize('price', [0, -5, 'abc', None, float('nan'), float('inf')])
+def test_invalid_prices_are_left_out(price):
+    stats = make_stats()
+    stats.add(product('A', price))
+    assert stats.stats() == {}
+
+
+def test_unknown_groups_are_not_cached():
+    stats = make_stats()
+    stats.add(product('A', 10))
+    for number in range(100):
+        assert stats.stats(f'junk-{number}') == {}
+    assert stats.stats('vegetables')['kg']['count'] == 1
+    assert stats.get_stats()['cached_summaries'] == 1
@@ -0,0 +1,120 @@
+import math
+import random
+
+import pytest
+
+from product_catalog import ProductCatalog, _encode_cursor, paginate, parse_numeric, query_fingerprint
+
+
+def make_catalog(count, seed=3):
+    rng = random.Random(seed)
+    catalog = ProductCatalog()
+    for number in range(count):
+        catalog.add({
+            'id': f'PRD{number:04d}',
+            # Few distinct values, so most pages break inside a run of equal sort keys
+            'price': rng.choice([10, 12.5, 40, 99]),
+            'views': rng.randrange(5),
+            'createdAt': f'2026-10-{1 + number % 9:02d}T00:00:00',
+            'category': rng.choice(['vegetables', 'grains']),
+            'status': 'active',
+        })
+    return catalog
+
+
+def walk(products, sort, limit, rankings=None, fingerprint=''):
+    ids, cursor = [], None
+    while True:
+        page = paginate(products, sort, limit, cursor, fingerprint, rankings)
+        ids.extend(product['id'] for product in page['products'])
+        if not page['hasMore']:
+            return ids
+        cursor = page['nextCursor']
+
+
+def walk_from(products, sort, limit, cursor):
+    ids = []
+    while cursor:
+        page = paginate(products, sort, limit, cursor)
+        ids.extend(product['id'] for product in page['products'])
+        cursor = page['nextCursor']
+    return ids
+
+
+@pytest.mark.parametrize('sort', ['createdAt', '-createdAt', 'price', '-price', 'views', '-views', 'newest'])
+@pytest.mark.parametrize('limit', [1, 7, 50, 500])
+def test_pages_cover_sorted_listing_without_duplicates_or_gaps(sort, limit):
+    products = make_catalog(120).query()
+    field = {'newest': '-createdAt'}.get(sort, sort)
+    key = (lambda product: (product[field.lstrip('-')], product['id']))
+    expected = [product['id'] for product in sorted(products, key=key, reverse=field.startswith('-'))]
+    assert walk(products, sort, limit) == expected
+
+
+def test_ranked_sort_round_trip():
+    products = make_catalog(60).query()
+    rng = random.Random(5)
+    ranking = {product['id']: rng.choice([0.5, 1.5, 3.0]) for product in products[::2]}
+    expected = sorted(products, key=lambda product: (ranking.get(product['id'], math.inf), product['id']))
+    assert walk(products, None, 9, rankings={'distance': ranking}) == [product['id'] for product in expected]
+
+
+def test_listings_added_between_pages_are_not_duplicated_or_skipped():
+    catalog = make_catalog(40)
+    page = paginate(catalog.query(), 'price', 10)
+    seen = [product['id'] for product in page['products']]
+    last_price = page['products'][-1]['price']
+    catalog.add({'id': 'PRD9000', 'price': 0.5, 'status': 'active', 'createdAt': '2026-10-01'})
+    catalog.add({'id': 'PRD9001', 'price': 1000, 'status': 'active', 'createdAt': '2026-10-01'})
+    rest = walk_from(catalog.query(), 'price', 10, page['nextCursor'])
+    assert len(seen + rest) == len(set(seen + rest))
+    assert 'PRD9001' in rest and 'PRD9000' not in rest
+    assert set(seen + rest) == {product['id'] for product in catalog.query()} - {'PRD9000'}
+    assert all(catalog.get(product_id)['price'] >= last_price for product_id in rest)
+
+
+@pytest.mark.parametrize('key', [['a', 'b'], [1], [True, 'x'], [1.5, 2], [None, 'x']])
+def test_tampered_cursor_is_rejected(key):
+    products = make_catalog(10).query()
+    with pytest.raises(ValueError):
+        paginate(products, 'price', 2, _encode_cursor({'s': 'price', 'f': '', 'k': key}))
+
+
+def test_cursor_from_other_query_is_rejected():
+    products = make_catalog(10).query()
+    cursor = paginate(products, 'price', 2, fingerprint=query_fingerprint({'category': 'grains'}))['nextCursor']
+    with pytest.raises(ValueError):
+        paginate(products, 'price', 2, cursor, fingerprint=query_fingerprint({'category': 'vegetables'}))
+    with pytest.raises(ValueError):
+        paginate(products, '-price', 2, cursor, fingerprint=query_fingerprint({'category': 'grains'}))
+
+
+def test_legacy_bad_prices_sort_as_zero():
+    catalog = ProductCatalog()
+    for product_id, price in [('A', 5), ('B', 'abc'), ('C', float('nan')), ('D', None), ('E', 1)]:
+        catalog.apply(product_id, {'id': product_id, 'price': price, 'status': 'active'})
+    assert walk(catalog.query(), 'price', 2) == ['B', 'C', 'D', 'E', 'A']
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-5', 0, 'abc', None, 10_000_001])
+def test_invalid_prices_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_numeric('price', value)
+
+
+def test_quantity_may_be_zero():
+    assert parse_numeric('quantity', '0') == 0.0
+    with pytest.raises(ValueError):
+        parse_numeric('quantity', -1)
+
+
+def test_updates_replace_rather_than_mutate():
+    catalog = make_catalog(3)
+    before = catalog.get('PRD0001')
+    snapshot = dict(before)
+    catalog.update('PRD0001', {'price': 77})
+    catalog.add_counts({'PRD0001': {'views': 2}})
+    assert before == snapshot
+    assert catalog.get('PRD0001')['price'] == 77
+    assert catalog.get('PRD0001')['views'] == snapshot['views'] + 2
+    assert [product['id'] for product in catalog] == ['PRD0000', 'PRD0001', 'PRD0002']
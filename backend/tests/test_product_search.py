@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from knowledge_retriever import tokenize
+from product_search import FIELD_WEIGHTS, MIN_PREFIX_LENGTH, ProductSearchIndex, phonetic_key, romanize
+
+NAMES = ['Fresh tomatoes', 'टमाटर', 'Tamaatar desi', 'Organic wheat', 'गेहूं शरबती', 'Basmati rice',
+         'धान', 'Paddy seed', 'Red onion', 'प्याज़', 'Aloo', 'Potato chips grade', 'Green chillies',
+         'Makka', 'Sweet corn', 'Kapas cotton', 'Haldi powder']
+CATEGORIES = ['vegetables', 'grains', 'spices', 'सब्ज़ी']
+QUERIES = ['tomato', 'tom', 'टमाटर', 'tamatar', 'gehu', 'wheat', 'गेहूँ', 'rice', 'dhan', 'paddy', 'pyaz',
+           'onion', 'alu', 'potato', 'chilli', 'maize', 'makki', 'corn', 'cotton', 'haldi', 'fresh tom',
+           'organic gehun', 'veg', 'grain rice', 'zzz', 'सब्ज़ी टमाटर', 'sweet']
+
+
+def make_products(count, seed=2):
+    rng = random.Random(seed)
+    return [{'id': f'P{number:03d}', 'productName': rng.choice(NAMES), 'category': rng.choice(CATEGORIES),
+             'description': ' '.join(rng.sample(NAMES, 2)), 'createdAt': f'2026-10-{1 + number % 28:02d}'}
+            for number in range(count)]
+
+
+def product_terms(index, product):
+    return {term for field, _ in FIELD_WEIGHTS for token in tokenize(str(product.get(field) or ''))
+            for term, _ in index._keys(token)}
+
+
+def token_matches(index, token, terms):
+    """Full-scan reference: any key of the token equals, or (for plain/phonetic keys) prefixes, a listing term"""
+    for key, _ in index._keys(token):
+        if key in terms:
+            return True
+        if len(token) >= MIN_PREFIX_LENGTH and not key.startswith('#') and any(
+                term.startswith(key) for term in terms):
+            return True
+    return False
+
+
+def build(products):
+    index = ProductSearchIndex()
+    for item in products:
+        index.add(item)
+    return index
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_search_matches_full_scan(query):
+    products = make_products(150)
+    index = build(products)
+    tokens = list(dict.fromkeys(tokenize(query)))
+    expected = {item['id'] for item in products
+                if all(token_matches(index, token, product_terms(index, item)) for token in tokens)}
+    result = index.search(query)
+    assert {product_id for product_id, _ in result} == expected
+    scores = [score for _, score in result]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_after_update_and_remove():
+    products = make_products(60)
+    index = build(products)
+    changed = dict(products[0], productName='Unique jackfruit')
+    index.add(changed)
+    index.remove(products[1])
+    assert [product_id for product_id, _ in index.search('jackfruit')] == [changed['id']]
+    assert products[1]['id'] not in {product_id for product_id, _ in index.search(products[1]['productName'])}
+
+
+def test_exact_name_outranks_prefix_name_and_description():
+    background = [{'id': f'X{number}', 'productName': 'Red onion', 'category': 'vegetables',
+                   'description': 'fresh stock', 'createdAt': '0'} for number in range(50)]
+    index = build(background + [
+        {'id': 'A', 'productName': 'Tomato', 'category': 'vegetables', 'description': '', 'createdAt': '1'},
+        {'id': 'B', 'productName': 'Onion', 'category': 'vegetables', 'description': 'goes with tomato',
+         'createdAt': '2'},
+        {'id': 'C', 'productName': 'Tomatoland hybrid', 'category': 'vegetables', 'description': '',
+         'createdAt': '3'},
+    ])
+    assert [product_id for product_id, _ in index.search('tomato')] == ['A', 'C', 'B']
+
+
+def test_stopword_only_query_is_not_a_search():
+    assert build(make_products(5)).search('the and of') is None
+
+
+def test_transliteration_keys():
+    assert romanize('टमाटर') == 'tamaatar'
+    assert phonetic_key('टमाटर') == phonetic_key('tamatar') == phonetic_key('tamaatar')
+    assert phonetic_key('aloo') == phonetic_key('alu')
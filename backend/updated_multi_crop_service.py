@@ -13,14 +13,20 @@ import tensorflow as tf
 from tensorflow.keras.models import load_model
 import logging
 from datetime import datetime
+from metrics import REGISTRY
+from request_profiler import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+model_inference_seconds = REGISTRY.histogram(
+    'agribot_model_inference_duration_seconds', 'Disease model inference time by stage (decode, preprocess, predict)',
+    ('stage',))
+
 class MultiCropDiseaseService:
-    def __init__(self):
-        """Initialize the multi-crop disease detection service"""
+    def __init__(self, autoload=True):
+        """Initialize the multi-crop disease detection service (``autoload=False`` defers ``load_real_model``)"""
         self.real_model = None
         self.model_loaded = False
         self.class_names = []
@@ -33,7 +39,8 @@ class MultiCropDiseaseService:
         self.training_info_path = './models/quick_training_info.json'
         
         # Try to load the real model
-        self.load_real_model()
+        if autoload:
+            self.load_real_model()
     
     def load_real_model(self):
         """Load the trained CNN model"""
@@ -65,17 +72,31 @@ class MultiCropDiseaseService:
             logger.error(f"❌ Failed to load real model: {e}")
             return False
     
+    def warm_up(self):
+        """Load the model if needed and run one dummy prediction so the first real request is not slow"""
+        if not self.model_loaded:
+            self.load_real_model()
+        if not self.model_loaded:
+            return self.get_model_status()
+        with model_inference_seconds.time(stage='warm_up'):
+            self.real_model.predict(np.zeros((1, self.img_size, self.img_size, 3), dtype=np.float32), verbose=0)
+        logger.info("🔥 Disease model warmed up")
+        return self.get_model_status()
+    
     def preprocess_image(self, image_path):
         """Preprocess image for model prediction"""
         try:
             # Load and resize image
-            image = Image.open(image_path)
-            image = image.convert('RGB')
-            image = image.resize((self.img_size, self.img_size))
+            with span('image_decode'), model_inference_seconds.time(stage='decode'):
+                image = Image.open(image_path)
+                image = image.convert('RGB')
             
-            # Convert to numpy array and normalize
-            image_array = np.array(image) / 255.0
-            image_array = np.expand_dims(image_array, axis=0)
+            with span('image_preprocess'), model_inference_seconds.time(stage='preprocess'):
+                image = image.resize((self.img_size, self.img_size))
+                
+                # Convert to numpy array and normalize
+                image_array = np.array(image) / 255.0
+                image_array = np.expand_dims(image_array, axis=0)
             
             return image_array
             
@@ -100,7 +121,8 @@ class MultiCropDiseaseService:
                 return self._fallback_response("Image preprocessing failed")
             
             # Make prediction
-            predictions = self.real_model.predict(processed_image, verbose=0)
+            with span('model_predict'), model_inference_seconds.time(stage='predict'):
+                predictions = self.real_model.predict(processed_image, verbose=0)
             predicted_class_idx = np.argmax(predictions[0])
             confidence = float(predictions[0][predicted_class_idx])
             
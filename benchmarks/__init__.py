@@ -0,0 +1 @@
+"""End-to-end load tests for the AgriGuru services"""
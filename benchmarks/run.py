@@ -0,0 +1,403 @@
+"""
+AgriGuru Load Test & Benchmark Runner
+=====================================
+
+Starts the mock Groq and fake Twilio stand-ins and both Flask services (see
+``benchmarks.serve``). It then drives each scenario closed-loop at the
+configured concurrency and writes a JSON report with throughput and latency
+percentiles per scenario.
+
+    python -m benchmarks.run --concurrency 16 --duration 20 --output bench_report.json
+    python -m benchmarks.run --scenarios chat,products --baseline last_report.json
+
+Scenarios:
+
+- ``chat``: POST /api/chat (AI backend, mock Groq)
+- ``disease``: POST /api/crop-disease-detection with synthetic leaf images
+- ``products``: POST then GET /api/products
+- ``socketio``: Socket.IO ``chat_message`` round trip in a room (main API)
+- ``bulk_alert``: POST /api/whatsapp/bulk-alert as admin (main API, fake Twilio)
+
+With ``--baseline`` the run is compared with an earlier report. The exit
+status is non-zero if a scenario's p99 latency or throughput regressed by
+more than ``--max-regression``.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks import stubs
+from benchmarks.serve import ADMIN_EMAIL, ADMIN_PASSWORD
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_QUESTIONS = (
+    "How to grow rice in kharif season?",
+    "NPK fertilizer for wheat crop",
+    "How to control cotton bollworm?",
+    "धान में खाद कितनी डालें?",
+    "Drip irrigation cost for tomatoes",
+    "Best crops for rabi season in Punjab",
+)
+
+SCENARIO_SERVICE = {
+    'chat': 'backend',
+    'disease': 'backend',
+    'products': 'backend',
+    'socketio': 'back',
+    'bulk_alert': 'back',
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], errors: int, elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    total = len(values)
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'status_counts': statuses,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'min': round(values[0] * 1000, 2) if values else 0.0,
+            'mean': round(sum(values) / total * 1000, 2) if values else 0.0,
+            'p50': round(percentile(values, 0.50) * 1000, 2),
+            'p90': round(percentile(values, 0.90) * 1000, 2),
+            'p95': round(percentile(values, 0.95) * 1000, 2),
+            'p99': round(percentile(values, 0.99) * 1000, 2),
+            'max': round(values[-1] * 1000, 2) if values else 0.0,
+        }
+    }
+
+
+def run_closed_loop(make_worker: Callable[[int], Callable[[int], str]], concurrency: int,
+                    duration: float, max_requests: Optional[int] = None) -> Dict[str, Any]:
+    """Run ``concurrency`` workers back-to-back until the time or request budget is spent.
+
+    ``make_worker(worker_index)`` returns a callable that performs one
+    request and returns its outcome ('200', 'timeout', ...). Outcomes that
+    are not 2xx count as errors.
+    """
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = [0]
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_index: int):
+        call = make_worker(worker_index)
+        local_latencies, local_statuses, local_errors = [], {}, 0
+        while time.perf_counter() < deadline:
+            sequence = next(counter)
+            if max_requests is not None and sequence >= max_requests:
+                break
+            start = time.perf_counter()
+            try:
+                outcome = str(call(sequence))
+            except Exception as e:
+                outcome = type(e).__name__
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[outcome] = local_statuses.get(outcome, 0) + 1
+            if not outcome.startswith('2'):
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            for outcome, count in local_statuses.items():
+                statuses[outcome] = statuses.get(outcome, 0) + count
+            errors[0] += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return summarize(latencies, statuses, errors[0], time.perf_counter() - start)
+
+
+# --- Scenarios: each returns make_worker(worker_index) -> call(sequence) ---
+
+def chat_scenario(base_url: str, **_):
+    def make_worker(worker_index):
+        session = requests.Session()
+
+        def call(sequence):
+            response = session.post(f"{base_url}/api/chat", timeout=60, json={
+                'message': CHAT_QUESTIONS[sequence % len(CHAT_QUESTIONS)],
+                'session_id': f"bench-{worker_index}"
+            })
+            return response.status_code
+        return call
+    return make_worker
+
+
+def disease_scenario(base_url: str, images=(), **_):
+    def make_worker(worker_index):
+        session = requests.Session()
+
+        def call(sequence):
+            name, data = images[sequence % len(images)]
+            response = session.post(f"{base_url}/api/crop-disease-detection", timeout=60,
+                                    files={'image': (name, data, 'image/png')})
+            return response.status_code
+        return call
+    return make_worker
+
+
+def products_scenario(base_url: str, **_):
+    def make_worker(worker_index):
+        session = requests.Session()
+
+        def call(sequence):
+            if sequence % 4 == 0:
+                response = session.post(f"{base_url}/api/products", timeout=30, data={
+                    'productName': f"Bench Wheat {sequence}", 'category': 'grains',
+                    'description': 'Benchmark listing', 'price': str(2000 + sequence % 500),
+                    'quantity': '10', 'unit': 'quintal', 'location': 'Ludhiana, Punjab',
+                    'phoneNumber': '9000000000', 'farmerId': f"bench-farmer-{worker_index}"
+                })
+            else:
+                response = session.get(f"{base_url}/api/products", timeout=30,
+                                       params={'category': 'grains', 'search': 'wheat'})
+            return response.status_code
+        return call
+    return make_worker
+
+
+def socketio_scenario(base_url: str, **_):
+    import socketio
+
+    def make_worker(worker_index):
+        client = socketio.Client(reconnection=False)
+        room = f"bench-room-{worker_index % 4}"
+        username = f"bench-user-{worker_index}"
+        pending: Dict[str, threading.Event] = {}
+
+        @client.on('chat_message')
+        def on_message(data):
+            event = pending.get(data.get('message'))
+            if event:
+                event.set()
+
+        client.connect(base_url, transports=['websocket'], wait_timeout=10)
+        client.emit('join', {'room': room, 'username': username})
+
+        def call(sequence):
+            token = uuid.uuid4().hex
+            event = pending[token] = threading.Event()
+            client.emit('chat_message', {'room': room, 'username': username, 'message': token})
+            delivered = event.wait(10)
+            pending.pop(token, None)
+            return 200 if delivered else 'timeout'
+        return call
+    return make_worker
+
+
+def bulk_alert_scenario(base_url: str, **_):
+    def make_worker(worker_index):
+        session = requests.Session()
+        login = session.post(f"{base_url}/api/login", timeout=30,
+                             json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+        login.raise_for_status()
+
+        def call(sequence):
+            response = session.post(f"{base_url}/api/whatsapp/bulk-alert", timeout=120, json={
+                'alert_type': 'weather',
+                'alert_data': {'location': 'Nashik', 'condition': 'heavy rain', 'temperature': '24'}
+            })
+            return response.status_code
+        return call
+    return make_worker
+
+
+SCENARIOS = {
+    'chat': chat_scenario,
+    'disease': disease_scenario,
+    'products': products_scenario,
+    'socketio': socketio_scenario,
+    'bulk_alert': bulk_alert_scenario,
+}
+
+
+# --- Orchestration ---
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode} before {url} came up")
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_service(name: str, env: Dict[str, str], args: List[str], log_dir: str):
+    port = _free_port()
+    log_file = open(os.path.join(log_dir, f"{name}.log"), 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', name, '--port', str(port), *args],
+        cwd=ROOT, env={**os.environ, **env}, stdout=log_file, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_until_up(f"{base_url}/healthz" if name == 'backend' else f"{base_url}/", process)
+    return process, base_url
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """List the scenarios whose p99 or throughput regressed beyond the threshold"""
+    regressions = []
+    for name, result in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before or 'latency_ms' not in result or 'latency_ms' not in before:
+            continue
+        p99, p99_before = result['latency_ms']['p99'], before['latency_ms']['p99']
+        rps, rps_before = result['throughput_rps'], before['throughput_rps']
+        if p99_before and (p99 - p99_before) / p99_before > max_regression:
+            regressions.append(f"{name}: p99 {p99_before}ms -> {p99}ms")
+        if rps_before and (rps_before - rps) / rps_before > max_regression:
+            regressions.append(f"{name}: throughput {rps_before} -> {rps} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgriGuru end-to-end load test')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15, help='seconds per scenario')
+    parser.add_argument('--requests', type=int, default=None, help='optional request cap per scenario')
+    parser.add_argument('--warmup', type=float, default=2, help='warm-up seconds per scenario (not reported)')
+    parser.add_argument('--groq-latency', type=float, default=0.3, help='mock Groq mean latency (s)')
+    parser.add_argument('--twilio-latency', type=float, default=0.05, help='fake Twilio latency (s)')
+    parser.add_argument('--mongo', default='mongomock', help="'mongomock' or a local MongoDB URI")
+    parser.add_argument('--farmers', type=int, default=50, help='WhatsApp users targeted by bulk alerts')
+    parser.add_argument('--images', type=int, default=16, help='synthetic images for the disease scenario')
+    parser.add_argument('--output', default='bench_report.json')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.10)
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    groq = stubs.start_server(stubs.MockGroqHandler, latency=args.groq_latency)
+    twilio = stubs.start_server(stubs.FakeTwilioHandler, latency=args.twilio_latency)
+    images = stubs.synthetic_images(args.images) if 'disease' in selected else []
+    log_dir = os.path.join(ROOT, 'benchmarks', 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+
+    services = {}
+    processes = []
+    try:
+        for service in sorted({SCENARIO_SERVICE[name] for name in selected}):
+            print(f"🚀 Starting {service}...")
+            if service == 'backend':
+                # A fresh marketplace store per run, so listings don't carry over between runs
+                store_path = os.path.join(log_dir, 'marketplace.sqlite')
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(store_path + suffix):
+                        os.remove(store_path + suffix)
+                env = {'GROQ_API_KEY': 'bench', 'GROQ_BASE_URL': f"{groq.url}/openai/v1",
+                       'LLM_PROVIDER': 'groq', 'LOG_SAMPLE_RATE': os.getenv('LOG_SAMPLE_RATE', '0.01'),
+                       'MARKETPLACE_DB': store_path}
+                process, base_url = start_service(service, env, [], log_dir)
+            else:
+                process, base_url = start_service(service, {}, [
+                    '--twilio-url', twilio.url, '--mongo', args.mongo, '--farmers', str(args.farmers)
+                ], log_dir)
+            processes.append(process)
+            services[service] = base_url
+
+        results = {}
+        for name in selected:
+            make_worker = SCENARIOS[name](services[SCENARIO_SERVICE[name]], images=images)
+            print(f"🔥 {name}: {args.concurrency} workers x {args.duration}s")
+            try:
+                if args.warmup:
+                    run_closed_loop(make_worker, args.concurrency, args.warmup)
+                results[name] = run_closed_loop(make_worker, args.concurrency, args.duration, args.requests)
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+            result = results[name]
+            if 'latency_ms' in result:
+                latency = result['latency_ms']
+                print(f"   {result['throughput_rps']} req/s  p50 {latency['p50']}ms  p99 {latency['p99']}ms  "
+                      f"errors {result['errors']}/{result['requests']}")
+            else:
+                print(f"   ❌ {result['error']}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        groq.shutdown()
+        twilio.shutdown()
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'stand_ins': {'groq_latency_s': args.groq_latency, 'twilio_latency_s': args.twilio_latency,
+                      'mongo': args.mongo, 'twilio_messages_sent': stubs.FakeTwilioHandler.sent},
+        'scenarios': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📊 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"⚠️ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
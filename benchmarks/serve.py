@@ -0,0 +1,130 @@
+"""
+Benchmark App Launcher
+======================
+
+Starts one of the Flask services with its external dependencies replaced by
+local stand-ins. The benchmark runner starts this in a subprocess:
+
+    python -m benchmarks.serve backend --port 5101
+    python -m benchmarks.serve back --port 5102 --twilio-url http://127.0.0.1:9002 --mongo mongomock
+
+``backend`` is the AI service (farming_expert_app_ai). Its Groq calls go to
+``GROQ_BASE_URL``, which the runner points at the mock Groq server.
+``back`` is the auth/chat/alerts API (main.py). It runs on ``mongomock``, or
+on a local mongod when ``--mongo`` is a MongoDB URI. Its Twilio client is
+replaced by one that posts to the fake Twilio endpoint. The database is
+seeded with an admin account and WhatsApp-enabled farmers for the
+bulk-alert scenario.
+"""
+
+import argparse
+import os
+import sys
+import types
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_EMAIL = 'bench-admin@agriguru.local'
+ADMIN_PASSWORD = 'Bench-Admin-1'
+
+
+class FakeTwilioClient:
+    """Drop-in for twilio.rest.Client that posts to the fake Twilio server"""
+
+    base_url = None
+
+    def __init__(self, account_sid, auth_token, *args, **kwargs):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.messages = self
+
+    def create(self, body=None, from_=None, to=None, **kwargs):
+        response = requests.post(
+            f"{self.base_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            json={'Body': body, 'From': from_, 'To': to}, timeout=10
+        )
+        response.raise_for_status()
+        data = response.json()
+        return types.SimpleNamespace(sid=data['sid'], status=data['status'])
+
+
+def _install_fake_twilio(base_url: str):
+    FakeTwilioClient.base_url = base_url.rstrip('/')
+    twilio = sys.modules.get('twilio') or types.ModuleType('twilio')
+    rest = types.ModuleType('twilio.rest')
+    rest.Client = FakeTwilioClient
+    twilio.rest = rest
+    sys.modules['twilio'] = twilio
+    sys.modules['twilio.rest'] = rest
+    os.environ.setdefault('TWILIO_ACCOUNT_SID', 'ACbench')
+    os.environ.setdefault('TWILIO_AUTH_TOKEN', 'bench')
+    os.environ.setdefault('TWILIO_WHATSAPP_NUMBER', '+10000000000')
+
+
+def _seed_back(main, farmers: int):
+    from datetime import datetime
+    from werkzeug.security import generate_password_hash
+
+    users = main.users_collection
+    users.delete_many({'email': {'$regex': r'@agriguru\.local$'}})
+    users.insert_one({
+        'email': ADMIN_EMAIL, 'full_name': 'Bench Admin', 'is_admin': True, 'is_active': True,
+        'password_hash': generate_password_hash(ADMIN_PASSWORD), 'created_at': datetime.utcnow()
+    })
+    users.insert_many([{
+        'email': f"farmer{index}@agriguru.local", 'full_name': f"Farmer {index}", 'is_active': True,
+        'password_hash': '!', 'created_at': datetime.utcnow(),
+        'whatsapp': {'number': f"+9190000{index:05d}", 'verified': True, 'enabled': True,
+                     'alert_preferences': {'weather': True, 'market_prices': True, 'crop_diseases': True}}
+    } for index in range(farmers)])
+
+
+def serve_backend(host: str, port: int):
+    sys.path.insert(0, os.path.join(ROOT, 'backend'))
+    os.chdir(os.path.join(ROOT, 'backend'))
+    import farming_expert_app_ai as app_module
+    from werkzeug.serving import make_server
+
+    make_server(host, port, app_module.app, threaded=True).serve_forever()
+
+
+def serve_back(host: str, port: int, twilio_url: str, mongo: str, farmers: int):
+    if mongo == 'mongomock':
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    else:
+        os.environ['MONGO_URI'] = mongo
+    _install_fake_twilio(twilio_url)
+
+    sys.path.insert(0, os.path.join(ROOT, 'back'))
+    os.chdir(os.path.join(ROOT, 'back'))
+    import main
+
+    if main.users_collection is None:
+        raise SystemExit("❌ MongoDB is not available for the benchmark")
+    _seed_back(main, farmers)
+    main.socketio.run(main.app, host=host, port=port, debug=False, use_reloader=False,
+                      log_output=False, allow_unsafe_werkzeug=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an AgriGuru service against local stand-ins')
+    parser.add_argument('service', choices=('backend', 'back'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--twilio-url', default='http://127.0.0.1:9002')
+    parser.add_argument('--mongo', default='mongomock', help="'mongomock' or a MongoDB URI")
+    parser.add_argument('--farmers', type=int, default=50, help='WhatsApp-enabled users to seed')
+    args = parser.parse_args()
+
+    if args.service == 'backend':
+        serve_backend(args.host, args.port)
+    else:
+        serve_back(args.host, args.port, args.twilio_url, args.mongo, args.farmers)
+
+
+if __name__ == '__main__':
+    main()
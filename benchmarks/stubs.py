@@ -0,0 +1,130 @@
+"""
+Local Stand-ins for External Services
+=====================================
+
+Stand-in services for the benchmark suite, so load tests never touch paid
+APIs or real phones:
+
+- a mock Groq server that speaks the OpenAI-compatible ``/chat/completions``
+  API with configurable latency,
+- a fake Twilio REST endpoint that accepts WhatsApp message creates,
+- a generator of synthetic crop-leaf PNG images (no Pillow needed).
+"""
+
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(body or b'{}')
+        except ValueError:
+            return {}
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockGroqHandler(_QuietHandler):
+    """OpenAI-compatible chat completions with simulated generation time"""
+
+    latency = 0.3
+    jitter = 0.1
+    completion_tokens = 180
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'not found'}})
+        payload = self._read_json()
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        question = (payload.get('messages') or [{}])[-1].get('content', '')
+        self._send_json(200, {
+            'id': f"chatcmpl-{random.getrandbits(48):x}",
+            'object': 'chat.completion',
+            'model': payload.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant',
+                            'content': f"🌾 Mock agronomy answer ({len(question)} chars of context)."}
+            }],
+            'usage': {'prompt_tokens': max(1, len(question) // 4),
+                      'completion_tokens': self.completion_tokens,
+                      'total_tokens': max(1, len(question) // 4) + self.completion_tokens}
+        })
+
+
+class FakeTwilioHandler(_QuietHandler):
+    """Accepts POST /2010-04-01/Accounts/<sid>/Messages.json like Twilio does"""
+
+    latency = 0.05
+    sent = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        if '/Messages' not in self.path:
+            return self._send_json(404, {'message': 'not found'})
+        self._read_json()
+        time.sleep(self.latency)
+        with self._lock:
+            FakeTwilioHandler.sent += 1
+            count = FakeTwilioHandler.sent
+        self._send_json(201, {'sid': f"SM{count:032d}", 'status': 'queued'})
+
+
+def start_server(handler_class, host: str = '127.0.0.1', port: int = 0, **attributes) -> ThreadingHTTPServer:
+    """Serve a handler class on a daemon thread; ``server.url`` is its base URL"""
+    handler = type(handler_class.__name__, (handler_class,), attributes)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name=handler_class.__name__, daemon=True).start()
+    return server
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def synthetic_png(width: int = 224, height: int = 224, seed: int = 0) -> bytes:
+    """A leaf-green RGB PNG with random brown lesions"""
+    rng = random.Random(seed)
+    lesions = [(rng.randrange(width), rng.randrange(height), rng.randrange(4, 20)) for _ in range(rng.randrange(3, 12))]
+    rows = []
+    for y in range(height):
+        row = bytearray(b'\x00')
+        for x in range(width):
+            r, g, b = 40 + rng.randrange(30), 120 + rng.randrange(60), 30 + rng.randrange(30)
+            for lx, ly, radius in lesions:
+                if (x - lx) ** 2 + (y - ly) ** 2 < radius * radius:
+                    r, g, b = 110 + rng.randrange(30), 70 + rng.randrange(20), 30
+                    break
+            row += bytes((r, g, b))
+        rows.append(bytes(row))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + _png_chunk(b'IEND', b''))
+
+
+def synthetic_images(count: int, size: int = 224) -> List[Tuple[str, bytes]]:
+    """``count`` deterministic (filename, PNG bytes) pairs"""
+    return [(f"synthetic_leaf_{index:03d}.png", synthetic_png(size, size, seed=index)) for index in range(count)]
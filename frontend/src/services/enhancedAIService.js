@@ -6,6 +6,16 @@ if (process.env.NODE_ENV !== 'production') {
   console.log('🔍 AI Backend URL:', API_BASE_URL);
 }
 
+// Per-tab chat session id so the backend can keep this conversation's memory
+const getSessionId = () => {
+  let sessionId = sessionStorage.getItem('annapurnaSessionId');
+  if (!sessionId) {
+    sessionId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    sessionStorage.setItem('annapurnaSessionId', sessionId);
+  }
+  return sessionId;
+};
+
 class EnhancedAIService {
   /**
    * Multilingual AI Chat endpoint using Enhanced Annapurna
@@ -25,7 +35,8 @@ class EnhancedAIService {
         body: JSON.stringify({
           message: message,
           context: context,
-          language: context.language || 'en'
+          language: context.language || 'en',
+          session_id: getSessionId()
         }),
         timeout: 20000 // 20 second timeout for AI processing
       });
@@ -298,7 +309,7 @@ class EnhancedAIService {
    */
   async getConversationHistory(limit = 10) {
     try {
-      const response = await fetch(`${API_BASE_URL}/conversation-history?limit=${limit}`, {
+      const response = await fetch(`${API_BASE_URL}/conversation-history?limit=${limit}&session_id=${encodeURIComponent(getSessionId())}`, {
         method: 'GET'
       });
 
@@ -332,6 +343,7 @@ class EnhancedAIService {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-ID': getSessionId()
         }
       });
 